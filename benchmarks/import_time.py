@@ -0,0 +1,107 @@
+"""Cold-start benchmark for `concurrent_openai`.
+
+Every sample runs in a fresh interpreter, so nothing is cached in `sys.modules`:
+
+    python -m benchmarks.import_time --runs 20 --model gpt-4o --output import.json
+
+Reports the median wall-clock time of `import concurrent_openai`, of creating a client, of
+`warmup()` for the given models and of a first token count, and which heavy dependencies the
+bare import pulls in.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any
+
+import concurrent_openai
+
+HEAVY_MODULES = ("openai", "httpx", "pydantic", "tiktoken", "structlog", "dotenv")
+
+# Runs in the child interpreter; prints one JSON object with the stage timings in seconds
+PROBE = """
+import json, sys, time
+
+start = time.perf_counter()
+import concurrent_openai
+imported = time.perf_counter()
+loaded = sorted(m for m in {heavy!r} if m in sys.modules)
+
+client = concurrent_openai.ConcurrentOpenAI(api_key="benchmark")
+constructed = time.perf_counter()
+
+concurrent_openai.warmup({models!r}, cache_dir={cache_dir!r})
+warmed_up = time.perf_counter()
+
+from concurrent_openai.utils import count_message_tokens
+count_message_tokens([{{"role": "user", "content": "Hello!"}}], {models!r}[0])
+counted = time.perf_counter()
+
+print(json.dumps({{
+    "import": imported - start,
+    "client": constructed - imported,
+    "warmup": warmed_up - constructed,
+    "first_count": counted - warmed_up,
+    "modules": loaded,
+}}))
+"""
+
+
+def run_probe(models: list[str], cache_dir: str | None) -> dict[str, Any]:
+    code = PROBE.format(heavy=HEAVY_MODULES, models=models, cache_dir=cache_dir)
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    samples = [run_probe(args.model, args.cache_dir) for _ in range(args.runs)]
+
+    stages = ("import", "client", "warmup", "first_count")
+    report = {
+        "benchmark": "concurrent_openai.import_time",
+        "version": concurrent_openai.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "results": {
+            **{
+                f"{stage}_ms": {
+                    "median": statistics.median(s[stage] for s in samples) * 1000,
+                    "min": min(s[stage] for s in samples) * 1000,
+                }
+                for stage in stages
+            },
+            "modules_loaded_by_import": samples[0]["modules"],
+        },
+    }
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--model", action="append", default=None, help="Model to warm up (repeatable)"
+    )
+    parser.add_argument("--cache-dir", default=None, help="tiktoken cache directory")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+    args.model = args.model or ["gpt-4o"]
+    return args
+
+
+if __name__ == "__main__":
+    main()
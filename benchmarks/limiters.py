@@ -0,0 +1,134 @@
+"""Rate limiter benchmark: token bucket vs. sliding window against a sliding-window quota.
+
+Starts the mock server with a per-window request quota enforced over a sliding window and
+sends the same batch through a client limited by each algorithm:
+
+    python -m benchmarks.limiters --requests 300 --quota 50 --window 5 --output limiters.json
+
+Windows are shortened (the client's limiters are swapped for ones with the same window as
+the server) so a run covers several windows in seconds. Reports the achieved requests per
+window against the quota and how many requests the server rejected with a 429.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from openai import AsyncOpenAI
+
+import concurrent_openai
+from concurrent_openai import ConcurrentOpenAI, MaxBurst, SlidingWindowRateLimiter
+from concurrent_openai.rate_limiter import RateLimiter
+
+from .run import build_messages, fetch_server_stats, log_to_stderr, mock_server_process
+
+
+def build_limiter(algorithm: str, quota: int, window: float, skew: float) -> RateLimiter:
+    """A request limiter for `quota` requests per `window` seconds, as the client builds it."""
+    if algorithm == "token_bucket":
+        return RateLimiter(capacity=quota, fill_rate=quota / window, minimum_spacing=window / quota)
+    if algorithm == "sliding_window":
+        return SlidingWindowRateLimiter(quota, window, skew=skew)
+    if algorithm == "sliding_window_max_burst":
+        return SlidingWindowRateLimiter(
+            quota, window, burst_policy=MaxBurst(0.5, window / 4), skew=skew
+        )
+    raise ValueError(f"Unknown algorithm: {algorithm}")
+
+
+async def run_algorithm(
+    args: argparse.Namespace, algorithm: str, base_url: str, start_stats: dict[str, Any]
+) -> dict[str, Any]:
+    openai_client = AsyncOpenAI(base_url=base_url, api_key="benchmark", max_retries=0)
+    client = ConcurrentOpenAI(client=openai_client, max_concurrent_requests=args.concurrency)
+    client.request_limiter = build_limiter(algorithm, args.quota, args.window, args.skew)
+    messages_list = build_messages(args.requests, prompt_words=10)
+
+    wall_start = time.perf_counter()
+    responses = await client.create_many(messages_list, model="gpt-4o", max_tokens=8, lean=True)
+    wall_elapsed = time.perf_counter() - wall_start
+    await openai_client.close()
+
+    stats = await fetch_server_stats(base_url)
+    succeeded = sum(response.is_success for response in responses)
+    return {
+        "requests": len(responses),
+        "succeeded": succeeded,
+        "rate_limited": stats["rate_limited"] - start_stats["rate_limited"],
+        "wall_seconds": wall_elapsed,
+        "achieved_per_window": succeeded / wall_elapsed * args.window,
+        "quota_per_window": args.quota,
+    }
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, Any]:
+    results = {}
+    for algorithm in args.algorithm:
+        # A fresh server per algorithm, so every run starts with an unused quota
+        server_args = [
+            "--latency",
+            args.latency,
+            "--rpm",
+            str(args.quota),
+            "--window",
+            str(args.window),
+            "--window-mode",
+            "sliding",
+        ]
+        with mock_server_process(*server_args) as base_url:
+            start_stats = await fetch_server_stats(base_url)
+            results[algorithm] = await run_algorithm(args, algorithm, base_url, start_stats)
+
+    return {
+        "benchmark": "concurrent_openai.limiters",
+        "version": concurrent_openai.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "results": results,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--quota", type=int, default=50, help="Requests per window")
+    parser.add_argument("--window", type=float, default=5.0, help="Window in seconds")
+    parser.add_argument("--latency", default="constant:0.05")
+    parser.add_argument("--skew", type=float, default=0.25, help="Sliding window skew in seconds")
+    parser.add_argument(
+        "--algorithm",
+        action="append",
+        default=None,
+        choices=("token_bucket", "sliding_window", "sliding_window_max_burst"),
+        help="Algorithm to run (repeatable, defaults to all)",
+    )
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+    args.algorithm = args.algorithm or [
+        "token_bucket",
+        "sliding_window",
+        "sliding_window_max_burst",
+    ]
+    return args
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    log_to_stderr()
+    report = asyncio.run(main_async(args))
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
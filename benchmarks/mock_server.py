@@ -0,0 +1,314 @@
+"""A local, dependency-free mock of the OpenAI chat completions endpoint.
+
+The server speaks just enough HTTP/1.1 (with keep-alive) for `AsyncOpenAI` to talk to it and
+can inject latency, 429s and per-minute quota enforcement. Run it standalone with
+
+    python -m benchmarks.mock_server --port 8000 --latency lognormal:0.2:0.5 --rpm 500
+
+or embed it with `MockOpenAIServer`. `GET /stats` returns the server-side counters as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
+
+import tiktoken
+
+from concurrent_openai.simulation import LatencyModel, parse_latency
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    completed: int = 0
+    rate_limited: int = 0
+    injected_errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    first_request_at: float | None = None
+    last_request_at: float | None = None
+    # Requests/tokens admitted per fixed minute window, keyed by window start (seconds)
+    requests_per_window: dict[int, int] = field(default_factory=dict)
+    tokens_per_window: dict[int, int] = field(default_factory=dict)
+
+
+class MockOpenAIServer:
+    """Mock chat-completions server with configurable latency, 429s and quotas.
+
+    Attributes:
+        latency: Sampler for the response latency in seconds
+        error_rate: Probability of answering a request with a spurious 429
+        requests_per_minute: Enforced request quota per fixed minute window (optional)
+        tokens_per_minute: Enforced token quota per fixed minute window (optional)
+        completion_tokens: Number of completion tokens returned per request
+        window: Length of the quota window in seconds
+        window_mode: "fixed" resets the quotas at every window boundary; "sliding" counts
+            the requests and tokens admitted over the last `window` seconds
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: LatencyModel | str = "constant:0.05",
+        error_rate: float = 0.0,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        completion_tokens: int = 16,
+        window: float = 60.0,
+        window_mode: str = "fixed",
+        seed: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = parse_latency(latency) if isinstance(latency, str) else latency
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.completion_tokens = completion_tokens
+        if window_mode not in ("fixed", "sliding"):
+            raise ValueError(f"Unknown window mode: {window_mode}")
+        self.window = window
+        self.window_mode = window_mode
+        self.stats = ServerStats()
+        # (admitted at, billed tokens) over the last window, for the sliding mode
+        self._admitted: deque[tuple[float, int]] = deque()
+        self._admitted_tokens = 0
+
+        self._rng = random.Random(seed)
+        self._clock = clock
+        self._started_at = clock()
+        self._encoding = tiktoken.get_encoding("o200k_base")
+        self._server: asyncio.AbstractServer | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "MockOpenAIServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    def count_prompt_tokens(self, messages: list[dict[str, Any]]) -> int:
+        """Count prompt tokens the way the server 'bills' them."""
+        num_tokens = 3
+        for message in messages:
+            num_tokens += 3
+            for value in message.values():
+                if isinstance(value, str):
+                    num_tokens += len(self._encoding.encode(value))
+                elif isinstance(value, list):
+                    for part in value:
+                        if part.get("type") == "text":
+                            num_tokens += len(self._encoding.encode(part["text"]))
+                        else:
+                            num_tokens += 85
+        return num_tokens
+
+    async def handle_chat_completion(self, body: dict[str, Any]) -> tuple[int, dict, dict]:
+        """Return `(status, headers, payload)` for a chat completion request."""
+        now = self._clock()
+        stats = self.stats
+        stats.requests += 1
+        stats.first_request_at = stats.first_request_at or now
+        stats.last_request_at = now
+
+        prompt_tokens = self.count_prompt_tokens(body.get("messages", []))
+        max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+        completion_tokens = min(self.completion_tokens, max_tokens or self.completion_tokens)
+        choices = body.get("n") or 1
+        billed_tokens = prompt_tokens + completion_tokens * choices
+
+        window = int((now - self._started_at) // self.window)
+        if self.window_mode == "sliding":
+            while self._admitted and self._admitted[0][0] <= now - self.window:
+                self._admitted_tokens -= self._admitted.popleft()[1]
+            used_requests, used_tokens = len(self._admitted), self._admitted_tokens
+            reset = self._admitted[0][0] + self.window - now if self._admitted else 0.0
+        else:
+            used_requests = stats.requests_per_window.get(window, 0)
+            used_tokens = stats.tokens_per_window.get(window, 0)
+            reset = self.window - ((now - self._started_at) % self.window)
+        headers = self._rate_limit_headers(used_requests, used_tokens, reset)
+
+        over_quota = (
+            self.requests_per_minute is not None and used_requests + 1 > self.requests_per_minute
+        ) or (
+            self.tokens_per_minute is not None
+            and used_tokens + billed_tokens > self.tokens_per_minute
+        )
+        if over_quota:
+            stats.rate_limited += 1
+            headers["retry-after"] = f"{reset:.3f}"
+            return 429, headers, _error_payload("Rate limit reached", "rate_limit_exceeded")
+
+        if self.error_rate and self._rng.random() < self.error_rate:
+            stats.injected_errors += 1
+            headers["retry-after"] = "1"
+            return 429, headers, _error_payload("Injected rate limit error", "rate_limit_exceeded")
+
+        stats.requests_per_window[window] = stats.requests_per_window.get(window, 0) + 1
+        stats.tokens_per_window[window] = stats.tokens_per_window.get(window, 0) + billed_tokens
+        self._admitted.append((now, billed_tokens))
+        self._admitted_tokens += billed_tokens
+
+        await asyncio.sleep(max(0.0, self.latency(self._rng)))
+
+        stats.completed += 1
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens * choices
+        payload = {
+            "id": f"chatcmpl-mock-{stats.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [
+                {
+                    "index": index,
+                    "finish_reason": "length",
+                    "logprobs": None,
+                    "message": {
+                        "role": "assistant",
+                        "content": " ".join(["mock"] * completion_tokens),
+                    },
+                }
+                for index in range(choices)
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens * choices,
+                "total_tokens": prompt_tokens + completion_tokens * choices,
+            },
+        }
+        return 200, headers, payload
+
+    def _rate_limit_headers(self, used_requests: int, used_tokens: int, reset: float) -> dict:
+        headers = {}
+        if self.requests_per_minute is not None:
+            headers["x-ratelimit-limit-requests"] = str(self.requests_per_minute)
+            headers["x-ratelimit-remaining-requests"] = str(
+                max(0, self.requests_per_minute - used_requests - 1)
+            )
+            headers["x-ratelimit-reset-requests"] = f"{reset:.3f}s"
+        if self.tokens_per_minute is not None:
+            headers["x-ratelimit-limit-tokens"] = str(self.tokens_per_minute)
+            headers["x-ratelimit-remaining-tokens"] = str(
+                max(0, self.tokens_per_minute - used_tokens)
+            )
+            headers["x-ratelimit-reset-tokens"] = f"{reset:.3f}s"
+        return headers
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                content_length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(content_length) if content_length else b""
+
+                if method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+                    status, response_headers, payload = await self.handle_chat_completion(
+                        json.loads(body or b"{}")
+                    )
+                elif method == "GET" and path.rstrip("/").endswith("/stats"):
+                    status, response_headers, payload = 200, {}, asdict(self.stats)
+                else:
+                    status, response_headers, payload = 404, {}, _error_payload("Not found", None)
+
+                self._write_response(writer, status, response_headers, payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_response(
+        writer: asyncio.StreamWriter, status: int, headers: dict[str, str], payload: Any
+    ) -> None:
+        body = json.dumps(payload).encode()
+        reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests"}.get(status, "Error")
+        head = [
+            f"HTTP/1.1 {status} {reason}",
+            "content-type: application/json",
+            f"content-length: {len(body)}",
+            "connection: keep-alive",
+            *(f"{name}: {value}" for name, value in headers.items()),
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+
+def _error_payload(message: str, code: str | None) -> dict:
+    return {"error": {"message": message, "type": "requests", "param": None, "code": code}}
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = MockOpenAIServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        completion_tokens=args.completion_tokens,
+        window=args.window,
+        window_mode=args.window_mode,
+        seed=args.seed,
+    )
+    await server.start()
+    print(server.base_url, flush=True)
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", default="constant:0.05")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=None)
+    parser.add_argument("--tpm", type=int, default=None)
+    parser.add_argument("--completion-tokens", type=int, default=16)
+    parser.add_argument("--window", type=float, default=60.0)
+    parser.add_argument("--window-mode", choices=("fixed", "sliding"), default="fixed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
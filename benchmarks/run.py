@@ -0,0 +1,284 @@
+"""Offline benchmark harness for `ConcurrentOpenAI`.
+
+Starts the mock server in a subprocess (so its CPU time does not pollute the client's), runs
+`create_many` against it and writes a machine-readable JSON report:
+
+    python -m benchmarks.run --requests 2000 --rpm 6000 --tpm 2000000 --output results.json
+
+Reports achieved RPM/TPM vs. configured, client CPU time per request, event-loop lag, memory
+per 100k results and the token-estimate error against the server-side counts.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+
+import concurrent_openai
+from concurrent_openai import ConcurrentOpenAI
+
+SAMPLE_COMPLETION: dict[str, Any] = {
+    "id": "chatcmpl-benchmark",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "logprobs": None,
+            "message": {"role": "assistant", "content": "A short benchmark answer."},
+        }
+    ],
+    "usage": {"prompt_tokens": 42, "completion_tokens": 6, "total_tokens": 48},
+}
+
+
+def sample_completion(index: int) -> dict[str, Any]:
+    """A typical chat completion payload; every index gets its own id and content."""
+    return {
+        **SAMPLE_COMPLETION,
+        "id": f"chatcmpl-benchmark-{index}",
+        "choices": [
+            {
+                **SAMPLE_COMPLETION["choices"][0],
+                "message": {"role": "assistant", "content": f"A short benchmark answer {index}."},
+            }
+        ],
+    }
+
+
+def log_to_stderr() -> None:
+    """Send the client's logs to stderr, so stdout carries only the JSON report."""
+    import structlog
+
+    structlog.configure(logger_factory=structlog.PrintLoggerFactory(sys.stderr))
+
+
+@contextmanager
+def mock_server_process(*server_args: str) -> Iterator[str]:
+    """Run `benchmarks.mock_server` in a subprocess and yield its base URL."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_server", *server_args],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stdout is not None
+        yield process.stdout.readline().strip()
+    finally:
+        process.terminate()
+        process.wait()
+
+
+class EventLoopLagMonitor:
+    """Samples how late the event loop wakes up a task sleeping for `interval` seconds."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.lags: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def __enter__(self) -> "EventLoopLagMonitor":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def summary(self) -> dict[str, float]:
+        if not self.lags:
+            return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+        lags = sorted(self.lags)
+        return {
+            "p50": lags[len(lags) // 2],
+            "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+            "max": lags[-1],
+        }
+
+
+def build_messages(count: int, prompt_words: int) -> list[list[dict[str, Any]]]:
+    return [
+        [
+            {"role": "system", "content": "You are a helpful benchmarking assistant."},
+            {
+                "role": "user",
+                "content": f"Request {i}: " + " ".join(f"word{j}" for j in range(prompt_words)),
+            },
+        ]
+        for i in range(count)
+    ]
+
+
+async def fetch_server_stats(base_url: str) -> dict[str, Any]:
+    openai_client = AsyncOpenAI(base_url=base_url, api_key="benchmark")
+    response = await openai_client.get("/stats", cast_to=object)
+    await openai_client.close()
+    return response  # type: ignore[return-value]
+
+
+async def run_throughput(args: argparse.Namespace, base_url: str) -> dict[str, Any]:
+    """Run `create_many` against the mock server and measure throughput and overhead."""
+    openai_client = AsyncOpenAI(base_url=base_url, api_key="benchmark", max_retries=0)
+    client = ConcurrentOpenAI(
+        client=openai_client,
+        max_concurrent_requests=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+    )
+    messages_list = build_messages(args.requests, args.prompt_words)
+
+    with EventLoopLagMonitor() as lag_monitor:
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        responses = await client.create_many(
+            messages_list, model=args.model, max_tokens=args.completion_tokens, lean=True
+        )
+        cpu_elapsed = time.process_time() - cpu_start
+        wall_elapsed = time.perf_counter() - wall_start
+
+    await openai_client.close()
+
+    succeeded = [r for r in responses if r.is_success]
+    total_tokens = sum(r.prompt_tokens + r.completion_tokens for r in succeeded)
+    estimate_errors = [
+        (r.estimated_total_tokens - client.token_safety_margin - r.prompt_tokens) / r.prompt_tokens
+        for r in succeeded
+        if r.prompt_tokens
+    ]
+    http_latencies = [r.timings.http for r in succeeded if r.timings]
+
+    return {
+        "requests": len(responses),
+        "succeeded": len(succeeded),
+        "failed": len(responses) - len(succeeded),
+        "wall_seconds": wall_elapsed,
+        "achieved_rpm": len(succeeded) / wall_elapsed * 60,
+        "configured_rpm": args.rpm,
+        "achieved_tpm": total_tokens / wall_elapsed * 60,
+        "configured_tpm": args.tpm,
+        "client_cpu_seconds": cpu_elapsed,
+        "client_cpu_us_per_request": cpu_elapsed / len(responses) * 1e6,
+        "event_loop_lag_seconds": lag_monitor.summary(),
+        "http_latency_p50_seconds": statistics.median(http_latencies) if http_latencies else 0.0,
+        "token_estimate_error": {
+            "mean": statistics.fmean(estimate_errors) if estimate_errors else 0.0,
+            "mean_abs": (
+                statistics.fmean(abs(e) for e in estimate_errors) if estimate_errors else 0.0
+            ),
+            "max_abs": max((abs(e) for e in estimate_errors), default=0.0),
+        },
+        "server": await fetch_server_stats(base_url),
+    }
+
+
+def measure_result_memory(count: int = 100_000) -> dict[str, int]:
+    """Measure the memory held by `count` full and lean results, scaled to 100k results.
+
+    Both variants parse a fresh `ChatCompletion` per row with its own content string, as
+    `create_many` would, and only what the results keep alive is counted.
+    """
+    results: dict[str, int] = {}
+
+    for lean in (False, True):
+        gc.collect()
+        tracemalloc.start()
+        responses = [
+            ConcurrentOpenAI._build_response(
+                ChatCompletion.model_validate(sample_completion(i)),
+                estimated_total_tokens=48,
+                input_cost=1e-4,
+                output_cost=6e-5,
+                lean=lean,
+            )
+            for i in range(count)
+        ]
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results["lean_bytes" if lean else "full_bytes"] = current * 100_000 // count
+        del responses
+
+    return results
+
+
+async def main_async(args: argparse.Namespace) -> dict[str, Any]:
+    server_args = [
+        "--latency",
+        args.latency,
+        "--error-rate",
+        str(args.error_rate),
+        "--completion-tokens",
+        str(args.completion_tokens),
+    ]
+    if args.server_rpm:
+        server_args += ["--rpm", str(args.server_rpm)]
+    if args.server_tpm:
+        server_args += ["--tpm", str(args.server_tpm)]
+
+    with mock_server_process(*server_args) as base_url:
+        throughput = await run_throughput(args, base_url)
+
+    return {
+        "benchmark": "concurrent_openai",
+        "version": concurrent_openai.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "results": {
+            "throughput": throughput,
+            "memory_per_100k_results": measure_result_memory(args.memory_results),
+        },
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rpm", type=int, default=None, help="Client-side RPM limit")
+    parser.add_argument("--tpm", type=int, default=None, help="Client-side TPM limit")
+    parser.add_argument("--server-rpm", type=int, default=None, help="Server-enforced RPM")
+    parser.add_argument("--server-tpm", type=int, default=None, help="Server-enforced TPM")
+    parser.add_argument("--latency", default="lognormal:0.05:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--prompt-words", type=int, default=50)
+    parser.add_argument("--completion-tokens", type=int, default=16)
+    parser.add_argument("--memory-results", type=int, default=100_000)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    log_to_stderr()
+    report = asyncio.run(main_async(args))
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,88 @@
 # __init__.py
+from .agent import AgentResult, AgentRunner
+from .batching import EmbeddingBatcher
+from .budget import Budget
+from .circuit_breaker import CircuitBreaker
 from .client import ConcurrentOpenAI
-from .models import ConcurrentCompletionResponse
+from .clock import Clock, VirtualClock
+from .concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimiter
+from .datasets import (
+    DatasetSummary,
+    JsonlSink,
+    ParquetSink,
+    process_dataset,
+    read_arrow,
+    read_jsonl,
+    read_parquet,
+)
+from .exceptions import (
+    BudgetExceededError,
+    CircuitOpenError,
+    ConcurrentOpenAIError,
+    ContextWindowExceededError,
+    DeadlineExceededError,
+    LoadShedError,
+    UnknownPricingError,
+)
+from .executor import ShardedExecutor
+from .models import (
+    ConcurrentCompletionResponse,
+    ConcurrentEmbeddingResponse,
+    ConcurrentResponse,
+    LeanCompletionResponse,
+    RequestTimings,
+    UsageTable,
+)
+from .rate_limiter import (
+    BurstPolicy,
+    MaxBurst,
+    QuantizedBurst,
+    SlidingWindowRateLimiter,
+)
+from .simulation import SimulatedUpstream, SimulationReport, simulate
+from .sync import SyncConcurrentOpenAI
+from .utils import warmup
 
-__all__ = ["ConcurrentOpenAI", "ConcurrentCompletionResponse"]
+__all__ = [
+    "AdaptiveConcurrencyLimiter",
+    "AgentResult",
+    "AgentRunner",
+    "Budget",
+    "BurstPolicy",
+    "BudgetExceededError",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "Clock",
+    "ConcurrencyLimiter",
+    "ConcurrentOpenAIError",
+    "ContextWindowExceededError",
+    "DatasetSummary",
+    "ConcurrentOpenAI",
+    "ConcurrentCompletionResponse",
+    "ConcurrentEmbeddingResponse",
+    "ConcurrentResponse",
+    "DeadlineExceededError",
+    "EmbeddingBatcher",
+    "JsonlSink",
+    "LeanCompletionResponse",
+    "LoadShedError",
+    "MaxBurst",
+    "ParquetSink",
+    "QuantizedBurst",
+    "RequestTimings",
+    "ShardedExecutor",
+    "SimulatedUpstream",
+    "SimulationReport",
+    "SlidingWindowRateLimiter",
+    "SyncConcurrentOpenAI",
+    "UnknownPricingError",
+    "UsageTable",
+    "VirtualClock",
+    "process_dataset",
+    "read_arrow",
+    "read_jsonl",
+    "read_parquet",
+    "simulate",
+    "warmup",
+]
 __version__ = "1.0.1"
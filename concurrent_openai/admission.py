@@ -0,0 +1,103 @@
+import asyncio
+from typing import Any
+
+from .clock import SYSTEM_CLOCK, Clock
+from .concurrency import ConcurrencyLimiter
+from .exceptions import DeadlineExceededError, LoadShedError
+
+
+class AdmissionQueue:
+    """A bounded waiting line in front of the client's concurrency limit.
+
+    Without a bound, every `create` call beyond `max_concurrent_requests` parks a coroutine on
+    the semaphore, so a degraded upstream makes the backlog (and memory) grow without limit.
+    With `max_waiters`, calls arriving when the line is full are shed immediately with a
+    `LoadShedError`; with `max_wait`, calls that could not start within that many seconds are
+    shed too.
+
+    Attributes:
+        max_waiters: Maximum number of calls waiting for a slot (optional, unbounded if None)
+        max_wait: Maximum time in seconds a call waits for a slot (optional)
+    """
+
+    def __init__(
+        self,
+        slots: ConcurrencyLimiter | asyncio.Semaphore,
+        *,
+        max_waiters: int | None = None,
+        max_wait: float | None = None,
+        clock: Clock | None = None,
+    ) -> None:
+        """
+        Initialize an admission queue.
+
+        Args:
+            slots: The concurrency limit being guarded
+            max_waiters: Maximum number of calls waiting for a slot (optional)
+            max_wait: Maximum time in seconds a call waits for a slot (optional)
+            clock: Time source for deadlines (optional, defaults to the system clock)
+        """
+        if max_waiters is not None and max_waiters < 0:
+            raise ValueError("max_waiters cannot be negative")
+        if max_wait is not None and max_wait < 0:
+            raise ValueError("max_wait cannot be negative")
+
+        self.slots = slots
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+        self.clock = clock or SYSTEM_CLOCK
+        self._waiters = 0
+
+    @property
+    def waiters(self) -> int:
+        """Number of calls currently waiting for a slot."""
+        return self._waiters
+
+    async def acquire(self, *, deadline: float | None = None) -> None:
+        """Wait for a slot, or raise `LoadShedError` if the call is shed.
+
+        Raises `DeadlineExceededError` instead if `deadline` (a timestamp on `clock`)
+        passes first.
+        """
+        if not self.slots.locked() and not self._waiters:
+            await self.slots.acquire()
+            return
+
+        if self.max_waiters is not None and self._waiters >= self.max_waiters:
+            raise LoadShedError(f"Admission queue is full ({self._waiters} waiting)")
+
+        max_wait = self.max_wait
+        deadline_bound = False
+        if deadline is not None:
+            remaining = max(0.0, deadline - self.clock.monotonic())
+            if max_wait is None or remaining < max_wait:
+                max_wait, deadline_bound = remaining, True
+
+        self._waiters += 1
+        try:
+            if max_wait is None:
+                await self.slots.acquire()
+                return
+            try:
+                async with asyncio.timeout(max_wait):
+                    await self.slots.acquire()
+            except TimeoutError:
+                if deadline_bound:
+                    raise DeadlineExceededError(
+                        "Deadline passed while waiting for a concurrency slot"
+                    ) from None
+                raise LoadShedError(
+                    f"No concurrency slot became free within {self.max_wait}s"
+                ) from None
+        finally:
+            self._waiters -= 1
+
+    def release(self) -> None:
+        self.slots.release()
+
+    async def __aenter__(self) -> "AdmissionQueue":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
@@ -0,0 +1,260 @@
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import json
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Literal, Mapping
+
+from .budget import Budget
+from .log import get_logger
+from .models import CompletionResponse, ConcurrentCompletionResponse, EncodedMessage
+from .utils import count_function_tokens, encode_messages
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageToolCall
+
+    from .client import ConcurrentOpenAI
+
+LOGGER = get_logger(__name__)
+
+StopReason = Literal["completed", "max_turns", "stopped", "error"]
+
+
+@dataclass(slots=True)
+class AgentResult:
+    """
+    Outcome of an `AgentRunner.run`.
+
+    `stop_reason` is "completed" when the model answered without calling tools, "max_turns"
+    when the turn limit was hit, "stopped" when the `stop` condition ended the run and
+    "error" when a completion failed (see `error`).
+    """
+
+    messages: list[dict[str, Any]] = field(default_factory=list)
+    responses: list[CompletionResponse] = field(default_factory=list)
+    stop_reason: StopReason = "completed"
+    tool_calls: int = 0
+    tool_errors: int = 0
+
+    @property
+    def content(self) -> str | None:
+        """Content of the last completion."""
+        return self.responses[-1].content if self.responses else None
+
+    @property
+    def error(self) -> str | None:
+        return self.responses[-1].error if self.responses else None
+
+    @property
+    def turns(self) -> int:
+        return len(self.responses)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(response.prompt_tokens for response in self.responses)
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(response.completion_tokens for response in self.responses)
+
+    @property
+    def total_cost(self) -> float:
+        return sum(response.total_cost for response in self.responses)
+
+
+class AgentRunner:
+    """Runs a tool-calling conversation on a `ConcurrentOpenAI` client until it is done.
+
+    Every turn sends the conversation through the client's concurrency limit, rate limiters
+    and budgets, runs the tool calls of the reply concurrently, appends their results and
+    continues until the model answers without calling a tool, `stop` returns True or
+    `max_turns` completions were made.
+
+    Async tool functions run on the event loop; plain functions run in `executor` (the
+    loop's default thread pool if None). A tool that raises, times out or does not exist
+    gets its error sent back as the tool result, so the model can react to it.
+
+    Token estimates are kept incrementally: each message is encoded once, when it joins the
+    conversation, and the tools are counted once per runner.
+
+    Attributes:
+        client: The client the completions go through
+        tools: The tool definitions sent to the model
+        functions: The callables implementing the tools, by function name
+        model: The model to use
+        max_turns: Maximum number of completions per run
+    """
+
+    def __init__(
+        self,
+        client: "ConcurrentOpenAI",
+        tools: list[dict[str, Any]],
+        functions: Mapping[str, Callable[..., Any]],
+        *,
+        model: str = "gpt-3.5-turbo",
+        max_turns: int = 10,
+        max_concurrent_tools: int | None = None,
+        tool_timeout: float | None = None,
+        executor: concurrent.futures.Executor | None = None,
+        stop: Callable[[CompletionResponse], bool] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize an agent runner.
+
+        Args:
+            client: The client the completions go through
+            tools: The tool definitions sent to the model
+            functions: The callables implementing the tools, by function name; they are
+                called with the tool call's arguments as keyword arguments
+            model: The model to use
+            max_turns: Maximum number of completions per run
+            max_concurrent_tools: Maximum number of tools running at once, across runs
+                (optional, unbounded if None)
+            tool_timeout: Maximum time in seconds a tool call may take (optional). A thread
+                running a plain function is not interrupted, only no longer waited for
+            executor: Executor for plain (non-async) functions (optional)
+            stop: Called with every completion before its tool calls run; returning True
+                ends the run (optional)
+            **kwargs: Additional arguments passed to `create` on every turn
+        """
+        if max_turns < 1:
+            raise ValueError("max_turns must be at least 1")
+        if max_concurrent_tools is not None and max_concurrent_tools < 1:
+            raise ValueError("max_concurrent_tools must be at least 1")
+
+        self.client = client
+        self.tools = tools
+        self.functions = functions
+        self.model = model
+        self.max_turns = max_turns
+        self.tool_timeout = tool_timeout
+        self.executor = executor
+        self.stop = stop
+        self.kwargs = kwargs
+        self._tool_slots = (
+            asyncio.Semaphore(max_concurrent_tools) if max_concurrent_tools is not None else None
+        )
+        self._tool_tokens = count_function_tokens(tools, model)
+
+    async def run(
+        self,
+        messages: list[dict[str, Any]],
+        *,
+        budget: Budget | None = None,
+        deadline: float | None = None,
+    ) -> AgentResult:
+        """
+        Run the conversation starting with `messages` until it is done.
+
+        Args:
+            messages: The initial messages; they are not modified
+            budget: Per-run budget shared by all turns, in addition to the client-wide one
+            deadline: `client.clock.monotonic()` timestamp by which every completion must be done
+
+        Returns:
+            AgentResult: The full conversation, every completion and why the run ended
+        """
+        result = AgentResult(messages=list(messages))
+        encoded = encode_messages(result.messages, self.model)
+
+        for _ in range(self.max_turns):
+            response = await self.client._create(
+                list(result.messages),
+                self.tools or None,
+                self.model,
+                budget=budget,
+                deadline=deadline,
+                encoded=encoded,
+                tool_tokens=self._tool_tokens,
+                **self.kwargs,
+            )
+            result.responses.append(response)
+            if not response.is_success:
+                result.stop_reason = "error"
+                return result
+
+            tool_calls = _tool_calls(response)
+            reply: dict[str, Any] = {"role": "assistant", "content": response.content}
+            if tool_calls:
+                reply["tool_calls"] = [call.model_dump(exclude_none=True) for call in tool_calls]
+            if reply["content"] is None:
+                del reply["content"]
+            self._append(result.messages, encoded, [reply])
+
+            if not tool_calls:
+                result.stop_reason = "completed"
+                return result
+            if self.stop is not None and self.stop(response):
+                result.stop_reason = "stopped"
+                return result
+
+            outputs = await asyncio.gather(*(self._call_tool(call) for call in tool_calls))
+            result.tool_calls += len(outputs)
+            result.tool_errors += sum(failed for _, failed in outputs)
+            self._append(
+                result.messages,
+                encoded,
+                [
+                    {"role": "tool", "tool_call_id": call.id, "content": content}
+                    for call, (content, _) in zip(tool_calls, outputs)
+                ],
+            )
+
+        result.stop_reason = "max_turns"
+        return result
+
+    def _append(
+        self,
+        messages: list[dict[str, Any]],
+        encoded: list[EncodedMessage],
+        new_messages: list[dict[str, Any]],
+    ) -> None:
+        messages.extend(new_messages)
+        encoded.extend(encode_messages(new_messages, self.model))
+
+    async def _call_tool(self, call: "ChatCompletionMessageToolCall") -> tuple[str, bool]:
+        """Run a tool call and return its result as text, and whether it failed."""
+        name = call.function.name
+        function = self.functions.get(name)
+        if function is None:
+            return f"Error: unknown tool '{name}'", True
+
+        try:
+            arguments = json.loads(call.function.arguments or "{}")
+        except ValueError as e:
+            return f"Error: invalid JSON arguments: {e}", True
+
+        try:
+            if self._tool_slots is None:
+                output = await self._invoke(function, arguments)
+            else:
+                async with self._tool_slots:
+                    output = await self._invoke(function, arguments)
+        except TimeoutError:
+            LOGGER.warning("Tool call timed out", tool=name, timeout=self.tool_timeout)
+            return f"Error: tool '{name}' timed out after {self.tool_timeout}s", True
+        except Exception as e:
+            LOGGER.warning("Tool call failed", tool=name, error=str(e), error_type=type(e).__name__)
+            return f"Error: {type(e).__name__}: {e}", True
+
+        return (output if isinstance(output, str) else json.dumps(output, default=str)), False
+
+    async def _invoke(self, function: Callable[..., Any], arguments: dict[str, Any]) -> Any:
+        async with asyncio.timeout(self.tool_timeout):
+            if inspect.iscoroutinefunction(function):
+                return await function(**arguments)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(function, **arguments)
+            )
+
+
+def _tool_calls(response: CompletionResponse) -> "list[ChatCompletionMessageToolCall]":
+    if isinstance(response, ConcurrentCompletionResponse):
+        completion = response.openai_response
+        if completion is None or not completion.choices:
+            return []
+        return completion.choices[0].message.tool_calls or []
+    return response.tool_calls or []
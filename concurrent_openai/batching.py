@@ -0,0 +1,434 @@
+import asyncio
+import json
+from typing import TYPE_CHECKING, Any
+
+from .budget import Budget
+from .log import get_logger
+from .models import (
+    CompletionResponse,
+    ConcurrentCompletionResponse,
+    ConcurrentEmbeddingResponse,
+)
+from .utils import get_encoding
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+    from .client import ConcurrentOpenAI
+
+LOGGER = get_logger(__name__)
+
+# Maximum number of tokens in a single embedding input for OpenAI's embedding models
+MAX_EMBEDDING_INPUT_TOKENS = 8192
+
+
+class EmbeddingBatcher:
+    """Packs many single-text embedding calls into array inputs.
+
+    Texts passed to `embed` are held for at most `max_wait` seconds and sent together as one
+    `embeddings.create` call (through the client's limiters) once the batch reaches
+    `max_items` inputs or `max_tokens` tokens, or the window expires. The embeddings are then
+    split back out to the individual callers, each charged its share of the batch's usage.
+
+    Batches never exceed the client's tokens-per-minute bucket. Empty or over-long texts are
+    rejected up front, and a batch the API rejects as invalid is bisected so that only the
+    offending input fails.
+
+    Attributes:
+        max_items: Maximum number of inputs per request (OpenAI allows 2048)
+        max_tokens: Maximum total tokens per request (OpenAI allows 300k)
+        max_wait: Maximum time in seconds a text waits for its batch to fill up
+    """
+
+    def __init__(
+        self,
+        client: "ConcurrentOpenAI",
+        model: str = "text-embedding-3-small",
+        *,
+        max_items: int = 2048,
+        max_tokens: int = 300_000,
+        max_wait: float = 0.005,
+        **kwargs: Any,
+    ) -> None:
+        """
+        Initialize an embedding batcher.
+
+        Args:
+            client: The client whose limiters and budget the batches go through
+            model: Embedding model
+            max_items: Maximum number of inputs per request
+            max_tokens: Maximum total tokens per request
+            max_wait: Maximum time in seconds a text waits for its batch to fill up
+            **kwargs: Additional options passed to `embeddings.create` (e.g. `dimensions`)
+        """
+        if max_items < 1 or max_tokens < 1:
+            raise ValueError("max_items and max_tokens must be positive")
+
+        self.client = client
+        self.model = model
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_wait = max_wait
+        self.kwargs = kwargs
+
+        self._encoding = get_encoding(model)
+        self._pending: list[tuple[str, int, asyncio.Future[ConcurrentEmbeddingResponse]]] = []
+        self._pending_tokens = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> ConcurrentEmbeddingResponse:
+        """Embed a single text, batched together with other concurrent calls."""
+        tokens = len(self._encoding.encode(text))
+        if not text or tokens > MAX_EMBEDDING_INPUT_TOKENS:
+            return ConcurrentEmbeddingResponse(
+                estimated_total_tokens=tokens,
+                error=(
+                    "Cannot embed an empty string"
+                    if not text
+                    else f"Input has {tokens} tokens, more than the model's limit of "
+                    f"{MAX_EMBEDDING_INPUT_TOKENS}"
+                ),
+                error_type="InvalidInput",
+            )
+
+        max_tokens = self._batch_token_limit()
+        if self._pending and (
+            len(self._pending) >= self.max_items or self._pending_tokens + tokens > max_tokens
+        ):
+            self._dispatch()
+
+        future: asyncio.Future[ConcurrentEmbeddingResponse] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending.append((text, tokens, future))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_items or self._pending_tokens >= max_tokens:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._dispatch)
+
+        return await future
+
+    def _batch_token_limit(self) -> int:
+        """`max_tokens`, clamped so a batch always fits in the client's token bucket."""
+        token_limiter = self.client.token_limiter
+        if token_limiter is None:
+            return self.max_tokens
+        bucket_limit = int(token_limiter.capacity) - self.client.token_safety_margin
+        return max(1, min(self.max_tokens, bucket_limit))
+
+    async def embed_many(self, texts: list[str]) -> list[ConcurrentEmbeddingResponse]:
+        """Embed several texts; results are returned in input order."""
+        return await asyncio.gather(*(self.embed(text) for text in texts))
+
+    async def flush(self) -> None:
+        """Send any pending texts now and wait for all in-flight batches."""
+        self._dispatch()
+        if self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def __aenter__(self) -> "EmbeddingBatcher":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.flush()
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(
+        self, batch: list[tuple[str, int, asyncio.Future[ConcurrentEmbeddingResponse]]]
+    ) -> None:
+        texts = [text for text, _, _ in batch]
+        batch_tokens = sum(tokens for _, tokens, _ in batch)
+        error: Exception | None = None
+        try:
+            response = await self.client.create_embedding(
+                texts, self.model, estimated_input_tokens=batch_tokens, **self.kwargs
+            )
+            if response.error_type == "BadRequestError" and len(batch) > 1:
+                # Isolate the invalid input(s) instead of failing every caller
+                middle = len(batch) // 2
+                await asyncio.gather(self._send(batch[:middle]), self._send(batch[middle:]))
+                return
+
+            if response.is_success and len(response.embeddings) != len(batch):
+                response = ConcurrentEmbeddingResponse(
+                    openai_response=response.openai_response,
+                    prompt_tokens=response.prompt_tokens,
+                    estimated_total_tokens=response.estimated_total_tokens,
+                    input_cost=response.input_cost,
+                    error=f"Expected {len(batch)} embeddings, got {len(response.embeddings)}",
+                    error_type="MismatchedEmbeddings",
+                    timings=response.timings,
+                )
+
+            for index, (_, tokens, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(self._split(response, index, tokens, batch_tokens))
+        except Exception as e:
+            LOGGER.error("Error processing embedding batch", error=str(e), size=len(batch))
+            error = e
+        finally:
+            # Never leave a caller waiting, whatever happened above
+            for _, _, future in batch:
+                if future.done():
+                    continue
+                if error is None:
+                    future.cancel()
+                else:
+                    future.set_result(
+                        ConcurrentEmbeddingResponse(
+                            error=str(error), error_type=type(error).__name__
+                        )
+                    )
+
+    def _split(
+        self, response: ConcurrentEmbeddingResponse, index: int, tokens: int, batch_tokens: int
+    ) -> ConcurrentEmbeddingResponse:
+        """Carve one input's embedding and share of usage and cost out of a batch response."""
+        share = tokens / batch_tokens if batch_tokens else 0.0
+        return ConcurrentEmbeddingResponse(
+            embeddings=[response.embeddings[index]] if response.is_success else [],
+            prompt_tokens=round(response.prompt_tokens * share),
+            estimated_total_tokens=tokens,
+            input_cost=response.input_cost * share,
+            error=response.error,
+            error_type=response.error_type,
+            timings=response.timings,
+        )
+
+
+class RequestCoalescer:
+    """Merges identical concurrent chat completion requests into a single `n=k` request.
+
+    Calls with the same model, messages, tools and parameters that arrive within `window`
+    seconds of each other are sent as one request asking for `k` choices; each caller then
+    receives one of the choices. The prompt is tokenized, rate-limited and billed once, and
+    usage and cost are split between the callers. Useful for self-consistency sampling,
+    where many calls share a prompt and differ only by sampling.
+
+    Calls with a `deadline` or `timeout` are sent on their own: a merged request could not
+    honor each caller's deadline.
+
+    Attributes:
+        window: Time in seconds to hold a request while waiting for identical ones
+        max_choices: Maximum number of requests merged into one (`n` of the merged request)
+    """
+
+    def __init__(self, window: float = 0.005, max_choices: int = 8) -> None:
+        if window < 0:
+            raise ValueError("window cannot be negative")
+        if max_choices < 1:
+            raise ValueError("max_choices must be positive")
+
+        self.window = window
+        self.max_choices = max_choices
+        self._groups: dict[str, list[asyncio.Future[ConcurrentCompletionResponse]]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        # The loop only keeps weak references to tasks; an unreferenced merged request
+        # could be garbage-collected mid-flight, leaving every caller waiting forever
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def can_coalesce(kwargs: dict[str, Any]) -> bool:
+        """Whether a request with these parameters can be merged with others."""
+        return kwargs.get("n") in (None, 1) and not kwargs.get("stream")
+
+    async def submit(
+        self,
+        client: "ConcurrentOpenAI",
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+        model: str,
+        *,
+        lean: bool,
+        budget: Budget | None,
+        **kwargs: Any,
+    ) -> CompletionResponse:
+        """Queue a request and return its share of the merged response."""
+        kwargs.pop("n", None)
+        key = json.dumps(
+            [model, messages, tools, kwargs, id(budget) if budget else None],
+            sort_keys=True,
+            default=str,
+        )
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[ConcurrentCompletionResponse] = loop.create_future()
+        group = self._groups.setdefault(key, [])
+        group.append(future)
+
+        def dispatch() -> None:
+            self._dispatch(key, client, messages, tools, model, budget, kwargs)
+
+        if len(group) >= self.max_choices:
+            dispatch()
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, dispatch)
+
+        response = await future
+        if not lean:
+            return response
+        return client._build_response(
+            response.openai_response,
+            estimated_total_tokens=response.estimated_total_tokens,
+            input_cost=response.input_cost,
+            output_cost=response.output_cost,
+            error=response.error,
+            error_type=response.error_type,
+            timings=response.timings,
+            lean=True,
+        )
+
+    def _dispatch(
+        self,
+        key: str,
+        client: "ConcurrentOpenAI",
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+        model: str,
+        budget: Budget | None,
+        kwargs: dict[str, Any],
+    ) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, [])
+        if group:
+            task = asyncio.create_task(
+                self._send(group, client, messages, tools, model, budget, kwargs)
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(
+        self,
+        group: list[asyncio.Future[ConcurrentCompletionResponse]],
+        client: "ConcurrentOpenAI",
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+        model: str,
+        budget: Budget | None,
+        kwargs: dict[str, Any],
+    ) -> None:
+        choices = len(group)
+        try:
+            response = await client._create_direct(
+                messages,
+                tools,
+                model,
+                budget=budget,
+                **kwargs,
+                **({"n": choices} if choices > 1 else {}),
+            )
+            assert isinstance(response, ConcurrentCompletionResponse)
+            results = _split_choices(response, choices)
+        except Exception as e:
+            LOGGER.error("Error processing coalesced request", error=str(e), size=choices)
+            results = [
+                ConcurrentCompletionResponse(error=str(e), error_type=type(e).__name__)
+            ] * choices
+
+        for future, result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _split_choices(
+    response: ConcurrentCompletionResponse, choices: int
+) -> list[ConcurrentCompletionResponse]:
+    """Fan a `n=k` response out into `k` single-choice responses.
+
+    The prompt is billed once, so prompt tokens and input cost are split evenly; completion
+    tokens and output cost are split in proportion to each choice's content length.
+    """
+    from openai.types.completion_usage import CompletionUsage, PromptTokensDetails
+
+    completion = response.openai_response
+    if choices == 1:
+        return [response]
+    if completion is None or not response.is_success:
+        return [
+            ConcurrentCompletionResponse(
+                openai_response=completion,
+                estimated_total_tokens=response.estimated_total_tokens // choices,
+                error=response.error,
+                error_type=response.error_type,
+                timings=response.timings,
+            )
+            for _ in range(choices)
+        ]
+
+    ordered_choices = sorted(completion.choices, key=lambda c: c.index)
+    lengths = [len(choice.message.content or "") for choice in ordered_choices]
+    total_length = sum(lengths)
+    weights = [
+        length / total_length if total_length else 1 / len(ordered_choices) for length in lengths
+    ]
+
+    usage = completion.usage
+    prompt_shares = _split_evenly(usage.prompt_tokens if usage else 0, choices)
+    completion_shares = _split_weighted(usage.completion_tokens if usage else 0, weights)
+    details = usage.prompt_tokens_details if usage else None
+    cached_shares = _split_evenly((details.cached_tokens or 0) if details else 0, choices)
+
+    results = []
+    for i in range(choices):
+        if i >= len(ordered_choices):
+            results.append(
+                ConcurrentCompletionResponse(
+                    error="Missing choice in coalesced response", error_type="MissingChoice"
+                )
+            )
+            continue
+
+        split_usage = None
+        if usage is not None:
+            split_usage = CompletionUsage(
+                prompt_tokens=prompt_shares[i],
+                completion_tokens=completion_shares[i],
+                total_tokens=prompt_shares[i] + completion_shares[i],
+                prompt_tokens_details=(
+                    PromptTokensDetails(cached_tokens=cached_shares[i]) if details else None
+                ),
+            )
+        split_completion: "ChatCompletion" = completion.model_copy(
+            update={
+                "choices": [ordered_choices[i].model_copy(update={"index": 0})],
+                "usage": split_usage,
+            }
+        )
+        results.append(
+            ConcurrentCompletionResponse(
+                openai_response=split_completion,
+                estimated_total_tokens=response.estimated_total_tokens // choices,
+                input_cost=response.input_cost / choices,
+                output_cost=response.output_cost * weights[i],
+                timings=response.timings,
+            )
+        )
+    return results
+
+
+def _split_evenly(total: int, parts: int) -> list[int]:
+    base, remainder = divmod(total, parts)
+    return [base + (1 if i < remainder else 0) for i in range(parts)]
+
+
+def _split_weighted(total: int, weights: list[float]) -> list[int]:
+    shares = [int(total * weight) for weight in weights]
+    for i in range(total - sum(shares)):
+        shares[i % len(shares)] += 1
+    return shares
@@ -0,0 +1,113 @@
+import asyncio
+from typing import Literal
+
+from .exceptions import BudgetExceededError
+from .log import get_logger
+
+LOGGER = get_logger(__name__)
+
+
+class Budget:
+    """A hard USD spending cap shared by every request that uses it.
+
+    Requests reserve their worst-case cost before they are sent and reconcile it against
+    the actual cost once the response arrives. A single budget can be attached to a client,
+    or passed per request to cap a tenant or a job.
+
+    Attributes:
+        limit: Maximum amount in USD that may be spent
+        name: Label used in logs and error messages
+        on_exhausted: "raise" refuses requests that do not fit, "wait" queues them until
+            reconciled or released reservations free enough room
+        default_max_completion_tokens: Completion tokens assumed for the worst case when a
+            request sets neither `max_completion_tokens` nor `max_tokens`
+    """
+
+    def __init__(
+        self,
+        limit: float,
+        *,
+        name: str = "budget",
+        on_exhausted: Literal["raise", "wait"] = "raise",
+        default_max_completion_tokens: int = 4096,
+    ) -> None:
+        if limit <= 0:
+            raise ValueError("Budget limit must be positive")
+        if on_exhausted not in ("raise", "wait"):
+            raise ValueError("on_exhausted must be either 'raise' or 'wait'")
+
+        self.limit = limit
+        self.name = name
+        self.on_exhausted = on_exhausted
+        self.default_max_completion_tokens = default_max_completion_tokens
+
+        self._spent = 0.0
+        self._reserved = 0.0
+        self._waiters: list[asyncio.Future[None]] = []
+
+    @property
+    def spent(self) -> float:
+        """Actual cost of all reconciled requests."""
+        return self._spent
+
+    @property
+    def reserved(self) -> float:
+        """Worst-case cost of requests that are admitted but not reconciled yet."""
+        return self._reserved
+
+    @property
+    def remaining(self) -> float:
+        """Amount that can still be reserved."""
+        return self.limit - self._spent - self._reserved
+
+    async def reserve(self, amount: float) -> None:
+        """Reserve `amount` USD, waiting or raising if the budget cannot cover it.
+
+        Raises:
+            BudgetExceededError: If the amount does not fit and the budget does not wait,
+                or if it can never fit because too much has already been spent
+        """
+        while amount > self.remaining:
+            if self.on_exhausted == "raise" or amount > self.limit - self._spent:
+                LOGGER.warning(
+                    "Budget exhausted",
+                    budget=self.name,
+                    requested=amount,
+                    remaining=self.remaining,
+                )
+                raise BudgetExceededError(
+                    f"Budget '{self.name}' exhausted: request needs up to ${amount:.6f}, "
+                    f"${max(self.remaining, 0.0):.6f} of ${self.limit:.6f} remaining"
+                )
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        self._reserved += amount
+
+    def reconcile(self, reserved: float, actual: float) -> None:
+        """Replace a reservation with the actual cost of the request."""
+        self._reserved = max(0.0, self._reserved - reserved)
+        self._spent += actual
+        self._wake_waiters()
+
+    def release(self, reserved: float) -> None:
+        """Drop a reservation for a request that was not billed."""
+        self.reconcile(reserved, 0.0)
+
+    def _wake_waiters(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def __repr__(self) -> str:
+        return (
+            f"Budget(name={self.name!r}, limit={self.limit}, "
+            f"spent={self._spent:.6f}, reserved={self._reserved:.6f})"
+        )
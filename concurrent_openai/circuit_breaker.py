@@ -0,0 +1,183 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Hashable, Literal
+
+from .clock import SYSTEM_CLOCK, Clock
+from .exceptions import CircuitOpenError, ConcurrentOpenAIError
+from .log import get_logger
+
+LOGGER = get_logger(__name__)
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+@dataclass
+class _Circuit:
+    outcomes: deque[bool] = field(default_factory=deque)
+    state: CircuitState = "closed"
+    opened_at: float = 0.0
+    probes_in_flight: int = 0
+
+
+class CircuitBreaker:
+    """Fails requests fast while the upstream for an (endpoint, model) pair is degraded.
+
+    Every key (e.g. `("chat.completions", "gpt-4o")`) has its own circuit. A circuit opens
+    when, over its last `window_size` requests (and at least `minimum_requests`), the share of
+    failed or slow calls reaches `failure_rate_threshold`. While open, requests are rejected
+    with a `CircuitOpenError` without queueing. After `open_duration` seconds the circuit is
+    half-open: up to `half_open_max_requests` probes are let through, closing the circuit
+    again if they succeed and re-opening it if one fails.
+
+    Attributes:
+        failure_rate_threshold: Share of failed or slow calls (0-1) that opens the circuit
+        latency_threshold: Calls slower than this many seconds count as failures (optional)
+        window_size: Number of recent calls the failure rate is computed over
+        minimum_requests: Minimum number of recorded calls before the circuit can open
+        open_duration: Time in seconds the circuit stays open before probing
+        half_open_max_requests: Number of concurrent probes allowed while half-open
+        clock: Time source for `open_duration`
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_rate_threshold: float = 0.5,
+        latency_threshold: float | None = None,
+        window_size: int = 20,
+        minimum_requests: int = 10,
+        open_duration: float = 30.0,
+        half_open_max_requests: int = 1,
+        clock: Clock | None = None,
+    ) -> None:
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError("failure_rate_threshold must be in (0, 1]")
+        if minimum_requests < 1 or window_size < minimum_requests:
+            raise ValueError(
+                "window_size must be at least minimum_requests, which must be positive"
+            )
+        if open_duration < 0:
+            raise ValueError("open_duration cannot be negative")
+        if half_open_max_requests < 1:
+            raise ValueError("half_open_max_requests must be positive")
+
+        self.failure_rate_threshold = failure_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.window_size = window_size
+        self.minimum_requests = minimum_requests
+        self.open_duration = open_duration
+        self.half_open_max_requests = half_open_max_requests
+        self.clock = clock or SYSTEM_CLOCK
+        self._circuits: dict[Hashable, _Circuit] = {}
+
+    def state(self, key: Hashable) -> CircuitState:
+        """Current state of the circuit for `key`."""
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            return "closed"
+        if circuit.state == "open" and self._open_expired(circuit):
+            return "half_open"
+        return circuit.state
+
+    def acquire(self, key: Hashable) -> bool:
+        """Admit a request for `key`, or raise `CircuitOpenError`.
+
+        Returns True if the request is a half-open probe. Every admitted request must be
+        followed by exactly one call to `record_success`, `record_failure` or `release`.
+        """
+        circuit = self._circuit(key)
+        if circuit.state == "open":
+            if not self._open_expired(circuit):
+                raise CircuitOpenError(
+                    f"Circuit open for {key}, retry in "
+                    f"{circuit.opened_at + self.open_duration - self.clock.monotonic():.1f}s"
+                )
+            circuit.state = "half_open"
+            circuit.probes_in_flight = 0
+
+        if circuit.state == "half_open":
+            if circuit.probes_in_flight >= self.half_open_max_requests:
+                raise CircuitOpenError(f"Circuit half-open for {key}, probe in progress")
+            circuit.probes_in_flight += 1
+            return True
+        return False
+
+    def check(self, key: Hashable, probe: bool = False) -> None:
+        """Raise `CircuitOpenError` if the circuit opened since the request was admitted."""
+        if not probe and self._circuit(key).state != "closed":
+            raise CircuitOpenError(f"Circuit opened for {key} while the request was queued")
+
+    def record_success(self, key: Hashable, latency: float, probe: bool = False) -> None:
+        """Record a completed call; calls slower than `latency_threshold` count as failures."""
+        if self.latency_threshold is not None and latency > self.latency_threshold:
+            self._record(key, failed=True, probe=probe)
+        else:
+            self._record(key, failed=False, probe=probe)
+
+    def record_failure(self, key: Hashable, probe: bool = False) -> None:
+        """Record a call that failed because of the upstream."""
+        self._record(key, failed=True, probe=probe)
+
+    def release(self, key: Hashable, probe: bool = False) -> None:
+        """Finish an admitted request that never reached the upstream."""
+        circuit = self._circuit(key)
+        if probe and circuit.state == "half_open":
+            circuit.probes_in_flight -= 1
+
+    def _record(self, key: Hashable, *, failed: bool, probe: bool) -> None:
+        circuit = self._circuit(key)
+
+        if circuit.state == "half_open":
+            if not probe:
+                return
+            circuit.probes_in_flight -= 1
+            if failed:
+                self._open(key, circuit)
+            elif circuit.probes_in_flight == 0:
+                circuit.state = "closed"
+                circuit.outcomes.clear()
+                LOGGER.info("Circuit closed", key=key)
+            return
+
+        if circuit.state == "open":
+            # Late results of requests sent before the circuit opened
+            return
+
+        circuit.outcomes.append(failed)
+        if len(circuit.outcomes) < self.minimum_requests:
+            return
+        failure_rate = sum(circuit.outcomes) / len(circuit.outcomes)
+        if failure_rate >= self.failure_rate_threshold:
+            self._open(key, circuit, failure_rate=failure_rate)
+
+    def _open(self, key: Hashable, circuit: _Circuit, failure_rate: float | None = None) -> None:
+        circuit.state = "open"
+        circuit.opened_at = self.clock.monotonic()
+        circuit.outcomes.clear()
+        LOGGER.warning(
+            "Circuit opened",
+            key=key,
+            failure_rate=failure_rate,
+            open_duration=self.open_duration,
+        )
+
+    def _open_expired(self, circuit: _Circuit) -> bool:
+        return self.clock.monotonic() - circuit.opened_at >= self.open_duration
+
+    def _circuit(self, key: Hashable) -> _Circuit:
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = _Circuit(outcomes=deque(maxlen=self.window_size))
+        return circuit
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Whether an error from the API call says something about the upstream's health.
+
+    Connection errors, timeouts, 429s and 5xx count; other 4xx errors are the caller's fault,
+    and so are the library's own errors such as a missed request deadline.
+    """
+    if isinstance(error, ConcurrentOpenAIError):
+        return False
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
@@ -1,32 +1,105 @@
 import asyncio
 import os
-from typing import Any
+from contextlib import asynccontextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Literal,
+    TypeVar,
+)
 
-import structlog
-from dotenv import load_dotenv
-from openai import AsyncOpenAI
+from .admission import AdmissionQueue
+from .batching import RequestCoalescer
+from .budget import Budget
+from .circuit_breaker import CircuitBreaker, is_upstream_failure
+from .clock import SYSTEM_CLOCK, Clock
+from .concurrency import ConcurrencyLimiter, is_overload
+from .context import ContextPolicy, fit_messages
+from .exceptions import (
+    ConcurrentOpenAIError,
+    DeadlineExceededError,
+    UnknownPricingError,
+)
+from .instrumentation import (
+    ACTUAL_TOKENS,
+    COST,
+    CREATE_SPAN,
+    ERRORS,
+    ESTIMATED_TOKENS,
+    IN_FLIGHT,
+    REQUEST_LATENCY,
+    REQUESTS,
+    Instrumentation,
+)
+from .log import get_logger
+from .models import (
+    CompletionResponse,
+    ConcurrentCompletionResponse,
+    ConcurrentEmbeddingResponse,
+    ConcurrentResponse,
+    EncodedMessage,
+    LeanCompletionResponse,
+    RequestTimings,
+)
+from .pricing import ModelPricing, get_model_pricing
+from .rate_limiter import (
+    BurstPolicy,
+    RateLimiter,
+    SlidingWindowRateLimiter,
+    limiter_state_file,
+)
+from .scheduling import prefix_key, prefix_order
+from .stats import LatencyStats
+from .utils import (
+    count_embedding_tokens,
+    count_function_tokens,
+    count_message_tokens,
+    count_response_input_tokens,
+    count_total_tokens,
+    encode_messages,
+)
 
-from .models import ConcurrentCompletionResponse
-from .rate_limiter import RateLimiter
-from .utils import count_total_tokens
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from openai.types import CreateEmbeddingResponse
+    from openai.types.chat import ChatCompletion
+    from openai.types.responses import Response
 
-LOGGER = structlog.get_logger(__name__)
+LOGGER = get_logger(__name__)
 
-load_dotenv()
+T = TypeVar("T")
+R = TypeVar("R")
 
 
 class ConcurrentOpenAI:
     def __init__(
         self,
         *,
-        client: AsyncOpenAI | None = None,
+        client: "AsyncOpenAI | None" = None,
         api_key: str | None = None,
-        max_concurrent_requests: int = 100,
+        max_concurrent_requests: int | ConcurrencyLimiter = 100,
         token_safety_margin: int = 100,
         requests_per_minute: int | None = None,
         tokens_per_minute: int | None = None,
         input_token_cost: float | None = None,
         output_token_cost: float | None = None,
+        instrumentation: Instrumentation | None = None,
+        budget: Budget | None = None,
+        coalesce_window: float | None = None,
+        max_coalesced_choices: int = 8,
+        circuit_breaker: CircuitBreaker | None = None,
+        max_queued_requests: int | None = None,
+        max_queue_time: float | None = None,
+        context_policy: ContextPolicy | None = "reject",
+        load_env: bool = False,
+        rate_limit_initial_fill: float = 1.0,
+        rate_limit_state_dir: str | os.PathLike[str] | None = None,
+        rate_limit_algorithm: Literal["token_bucket", "sliding_window"] = "token_bucket",
+        burst_policy: BurstPolicy | None = None,
+        clock: Clock | None = None,
         **client_options: Any,
     ):
         """
@@ -34,14 +107,55 @@ class ConcurrentOpenAI:
 
         Args:
             api_key: OpenAI API key
-            max_concurrent_requests: Maximum number of concurrent requests
+            max_concurrent_requests: Maximum number of concurrent requests, or a
+                `ConcurrencyLimiter` such as `AdaptiveConcurrencyLimiter` to tune it at runtime
             token_safety_margin: Safety margin for token estimation
             requests_per_minute: Maximum requests per minute (optional)
             tokens_per_minute: Maximum tokens per minute (optional)
-            input_token_cost: Cost per input token (optional)
-            output_token_cost: Cost per output token (optional)
+            input_token_cost: Cost per input token (optional, defaults to the built-in
+                price table)
+            output_token_cost: Cost per output token (optional, defaults to the built-in
+                price table)
+            instrumentation: Metrics and tracing exporter (optional, defaults to a no-op)
+            budget: Hard USD spending cap for every request of this client (optional)
+            coalesce_window: Merge identical chat completion requests arriving within this
+                many seconds into a single `n=k` request (optional, disabled by default).
+                Requests with a `deadline` or `timeout` are never merged
+            max_coalesced_choices: Maximum number of requests merged into one
+            circuit_breaker: Fails requests fast per (endpoint, model) while the upstream is
+                degraded (optional)
+            max_queued_requests: Maximum number of requests waiting for a concurrency slot;
+                further requests are shed with a `LoadShedError` (optional, unbounded)
+            max_queue_time: Maximum time in seconds a request waits for a concurrency slot
+                before it is shed (optional)
+            context_policy: What to do with chat prompts that do not fit the model's context
+                window: "reject" them locally with a `ContextWindowExceededError`,
+                "drop_oldest" turns or "truncate_longest" text (None to send them as is)
+            rate_limit_initial_fill: Share of the RPM/TPM buckets (0-1) available at start;
+                lower it so a restarted process does not burst a full minute's quota on top
+                of what the previous one spent
+            rate_limit_state_dir: Directory the RPM/TPM bucket state is saved to (every
+                30 seconds and at exit) and restored from at start, overriding
+                `rate_limit_initial_fill` (optional)
+            rate_limit_algorithm: "token_bucket" refills the RPM/TPM buckets continuously
+                and spaces requests evenly; "sliding_window" tracks the spend over the last
+                minute, like the API does, and allows bursts when the quota is idle
+            burst_policy: Caps bursts of the "sliding_window" algorithm (optional, defaults
+                to allowing the whole quota at once)
+            clock: Time source for timings, deadlines and the RPM/TPM limiters (optional,
+                defaults to the system clock; see `concurrent_openai.simulation`)
+            load_env: Load environment variables (e.g. OPENAI_API_KEY) from a `.env` file
+                before reading them
             **client_options: Additional options passed to AsyncOpenAI client
         """
+        if not 0 <= rate_limit_initial_fill <= 1:
+            raise ValueError("rate_limit_initial_fill must be between 0 and 1")
+
+        if load_env:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+
         if not client:
             # Default to AsyncOpenAI if none provided
             if not api_key:
@@ -50,99 +164,814 @@ class ConcurrentOpenAI:
             if not api_key:
                 raise ValueError("OPENAI_API_KEY is not set")
 
-            client = AsyncOpenAI(api_key=api_key, **client_options)
+            client = _async_openai()(api_key=api_key, **client_options)
 
         self.client = client
+        self.clock = clock or SYSTEM_CLOCK
         self.token_safety_margin = token_safety_margin
-        self.semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.instrumentation = instrumentation or Instrumentation()
+        self.semaphore = (
+            max_concurrent_requests
+            if isinstance(max_concurrent_requests, ConcurrencyLimiter)
+            else ConcurrencyLimiter(max_concurrent_requests, instrumentation=self.instrumentation)
+        )
+        self.admission = AdmissionQueue(
+            self.semaphore,
+            max_waiters=max_queued_requests,
+            max_wait=max_queue_time,
+            clock=self.clock,
+        )
+        self.circuit_breaker = circuit_breaker
+        self.context_policy = context_policy
         self.input_token_cost = input_token_cost
         self.output_token_cost = output_token_cost
+        self.budget = budget
+        self.coalescer = (
+            RequestCoalescer(window=coalesce_window, max_choices=max_coalesced_choices)
+            if coalesce_window is not None
+            else None
+        )
+        self.latency_stats = LatencyStats()
+        self._in_flight = 0
 
+        limiter_options: dict[str, Any] = {
+            "instrumentation": self.instrumentation,
+            "initial_fill": rate_limit_initial_fill,
+            "state_dir": rate_limit_state_dir,
+            "algorithm": rate_limit_algorithm,
+            "burst_policy": burst_policy,
+            "clock": self.clock,
+        }
         self.request_limiter = (
-            RateLimiter(
-                capacity=requests_per_minute,
-                fill_rate=requests_per_minute / 60,
-                minimum_spacing=1 / (requests_per_minute / 60),
-            )
+            _build_rate_limiter("requests", requests_per_minute, **limiter_options)
             if requests_per_minute
             else None
         )
-
         self.token_limiter = (
-            RateLimiter(
-                capacity=tokens_per_minute,
-                fill_rate=tokens_per_minute / 60,
-                minimum_spacing=1 / (tokens_per_minute / 60),
-            )
+            _build_rate_limiter("tokens", tokens_per_minute, **limiter_options)
             if tokens_per_minute
             else None
         )
 
+    def save_rate_limit_state(self) -> None:
+        """Save the RPM/TPM bucket state to `rate_limit_state_dir` now, e.g. on shutdown."""
+        for limiter in (self.request_limiter, self.token_limiter):
+            if limiter is not None and limiter.state_file is not None:
+                limiter.save()
+
     async def create(
         self,
         messages: list[dict[str, Any]],
         tools: list[dict[str, Any]] | None = None,
         model: str = "gpt-3.5-turbo",
+        *,
+        lean: bool = False,
+        budget: Budget | None = None,
+        deadline: float | None = None,
+        timeout: float | None = None,
+        context_policy: ContextPolicy | None = None,
         **kwargs: Any,
-    ) -> ConcurrentCompletionResponse:
+    ) -> CompletionResponse:
         """
         Create a completion with rate limiting and concurrency control.
         Accepts all OpenAI chat completion parameters.
+
+        When `lean` is True a compact `LeanCompletionResponse` is returned instead of the
+        full `ConcurrentCompletionResponse`. A `budget` caps the spend of this request in
+        addition to the client-wide budget, e.g. for a tenant or a job.
+
+        `timeout` (seconds from now) or `deadline` (a `clock.monotonic()` timestamp) bound
+        the whole call, including the time spent waiting for a concurrency slot, the budget
+        and the rate limiters. A request that cannot be sent in time fails with a
+        `DeadlineExceededError` without consuming any quota.
+
+        Prompts that do not fit the model's context window are handled before anything is
+        sent, according to `context_policy` (defaults to the client's).
         """
-        async with self.semaphore:
-            # Calculate token estimation
-            estimated_total_tokens = (
-                count_total_tokens(messages, tools, model) + self.token_safety_margin
-            )
+        return await self._create(
+            messages,
+            tools,
+            model,
+            lean=lean,
+            budget=budget,
+            deadline=deadline,
+            timeout=timeout,
+            context_policy=context_policy,
+            **kwargs,
+        )
 
-            # Apply rate limiting if enabled
-            if self.request_limiter:
-                await self.request_limiter.acquire(1)
+    async def _create(
+        self,
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None = None,
+        model: str = "gpt-3.5-turbo",
+        *,
+        lean: bool = False,
+        budget: Budget | None = None,
+        deadline: float | None = None,
+        timeout: float | None = None,
+        context_policy: ContextPolicy | None = None,
+        encoded: list[EncodedMessage] | None = None,
+        tool_tokens: int | None = None,
+        **kwargs: Any,
+    ) -> CompletionResponse:
+        """`create`, reusing the messages' encoding and the tools' token count if known."""
+        deadline = _resolve_deadline(deadline, timeout, self.clock)
+        context_policy = context_policy or self.context_policy
+        if self.coalescer is not None and deadline is None and self.coalescer.can_coalesce(kwargs):
+            return await self.coalescer.submit(
+                self,
+                messages,
+                tools,
+                model,
+                lean=lean,
+                budget=budget,
+                context_policy=context_policy,
+                **kwargs,
+            )
+        return await self._create_direct(
+            messages,
+            tools,
+            model,
+            lean=lean,
+            budget=budget,
+            deadline=deadline,
+            context_policy=context_policy,
+            encoded=encoded,
+            tool_tokens=tool_tokens,
+            **kwargs,
+        )
 
-            if self.token_limiter:
-                await self.token_limiter.acquire(estimated_total_tokens)
+    async def _create_direct(
+        self,
+        messages: list[dict[str, Any]],
+        tools: list[dict[str, Any]] | None,
+        model: str,
+        *,
+        lean: bool = False,
+        budget: Budget | None = None,
+        deadline: float | None = None,
+        context_policy: ContextPolicy | None = None,
+        encoded: list[EncodedMessage] | None = None,
+        tool_tokens: int | None = None,
+        **kwargs: Any,
+    ) -> CompletionResponse:
+        """Send a chat completion request, bypassing the coalescer."""
+        if tools is not None:
+            kwargs["tools"] = tools
+        max_output_tokens = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens")
 
-            try:
-                response = await self.client.chat.completions.create(
-                    messages=messages, model=model, **kwargs  # type: ignore
-                )
+        def count_tokens() -> int:
+            nonlocal messages
+            if context_policy is None:
+                if encoded is None and tool_tokens is None:
+                    return count_total_tokens(messages, tools, model)
+                if encoded is None:
+                    message_tokens = count_message_tokens(messages, model)
+                else:
+                    # Reply priming, as in `count_message_tokens`
+                    message_tokens = sum(message.num_tokens for message in encoded) + 3
+                if tool_tokens is None:
+                    return message_tokens + count_function_tokens(tools, model)
+                return message_tokens + tool_tokens
+            messages, prompt_tokens = fit_messages(
+                messages,
+                tools,
+                model,
+                policy=context_policy,
+                max_output_tokens=max_output_tokens,
+                encoded=encoded,
+                tool_tokens=tool_tokens,
+            )
+            return prompt_tokens
 
-                if response.usage is None:
-                    LOGGER.error("Missing usage information in response", response=response)
-                    return ConcurrentCompletionResponse(
-                        openai_response=response,
+        def on_success(
+            response: "ChatCompletion",
+            estimated_total_tokens: int,
+            timings: RequestTimings,
+            pricing: ModelPricing | None,
+        ) -> tuple[CompletionResponse, float | None]:
+            if response.usage is None:
+                LOGGER.error("Missing usage information in response", response=response)
+                return (
+                    self._build_response(
+                        response,
                         estimated_total_tokens=estimated_total_tokens,
                         error="Missing usage information in response",
-                    )
+                        error_type="MissingUsage",
+                        timings=timings,
+                        lean=lean,
+                    ),
+                    None,
+                )
+
+            input_cost = output_cost = 0.0
 
-                input_cost = output_cost = total_cost = 0.0
+            # Calculate costs if token costs are known
+            if pricing:
+                details = response.usage.prompt_tokens_details
+                input_cost = pricing.input_cost(
+                    response.usage.prompt_tokens,
+                    (details.cached_tokens or 0) if details else 0,
+                )
+                output_cost = response.usage.completion_tokens * pricing.output
+
+            result = self._build_response(
+                response,
+                estimated_total_tokens=estimated_total_tokens,
+                input_cost=input_cost,
+                output_cost=output_cost,
+                timings=timings,
+                lean=lean,
+            )
+            return result, input_cost + output_cost
+
+        def on_error(
+            estimated_total_tokens: int, error: str, error_type: str, timings: RequestTimings
+        ) -> CompletionResponse:
+            return self._build_response(
+                None,
+                estimated_total_tokens=estimated_total_tokens,
+                error=error,
+                error_type=error_type,
+                timings=timings,
+                lean=lean,
+            )
+
+        return await self._execute(
+            endpoint="chat.completions",
+            model=model,
+            count_tokens=count_tokens,
+            send=lambda: self.client.chat.completions.create(
+                messages=messages, model=model, **kwargs  # type: ignore
+            ),
+            on_success=on_success,
+            on_error=on_error,
+            max_output_tokens=max_output_tokens,
+            choices=kwargs.get("n") or 1,
+            budget=budget,
+            deadline=deadline,
+        )
+
+    async def create_embedding(
+        self,
+        input: str | list[str] | list[int] | list[list[int]],
+        model: str = "text-embedding-3-small",
+        *,
+        budget: Budget | None = None,
+        estimated_input_tokens: int | None = None,
+        deadline: float | None = None,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> ConcurrentEmbeddingResponse:
+        """
+        Create embeddings with rate limiting and concurrency control.
+        Accepts all OpenAI embeddings parameters.
+
+        `estimated_input_tokens` skips token counting when the caller already knows the
+        input size. To embed many single texts efficiently use `EmbeddingBatcher`, which
+        packs them into array inputs. `deadline`/`timeout` work as in `create`.
+        """
+
+        def on_success(
+            response: "CreateEmbeddingResponse",
+            estimated_total_tokens: int,
+            timings: RequestTimings,
+            pricing: ModelPricing | None,
+        ) -> tuple[ConcurrentEmbeddingResponse, float | None]:
+            prompt_tokens = response.usage.prompt_tokens if response.usage else 0
+            input_cost = prompt_tokens * pricing.input if pricing else 0.0
+            result = ConcurrentEmbeddingResponse(
+                embeddings=[
+                    item.embedding for item in sorted(response.data, key=lambda d: d.index)
+                ],
+                openai_response=response,
+                prompt_tokens=prompt_tokens,
+                estimated_total_tokens=estimated_total_tokens,
+                input_cost=input_cost,
+                timings=timings,
+            )
+            return result, input_cost
+
+        def on_error(
+            estimated_total_tokens: int, error: str, error_type: str, timings: RequestTimings
+        ) -> ConcurrentEmbeddingResponse:
+            return ConcurrentEmbeddingResponse(
+                estimated_total_tokens=estimated_total_tokens,
+                error=error,
+                error_type=error_type,
+                timings=timings,
+            )
 
-                # Calculate costs if token costs are provided
-                if self.input_token_cost and self.output_token_cost:
-                    input_cost = response.usage.prompt_tokens * self.input_token_cost
-                    output_cost = response.usage.completion_tokens * self.output_token_cost
+        return await self._execute(
+            endpoint="embeddings",
+            model=model,
+            count_tokens=lambda: (
+                estimated_input_tokens
+                if estimated_input_tokens is not None
+                else count_embedding_tokens(input, model)
+            ),
+            send=lambda: self.client.embeddings.create(input=input, model=model, **kwargs),
+            on_success=on_success,
+            on_error=on_error,
+            max_output_tokens=0,
+            budget=budget,
+            deadline=_resolve_deadline(deadline, timeout, self.clock),
+        )
 
-                return ConcurrentCompletionResponse(
-                    openai_response=response,
-                    estimated_total_tokens=estimated_total_tokens,
-                    input_cost=input_cost,
-                    output_cost=output_cost,
+    async def create_response(
+        self,
+        input: str | list[dict[str, Any]],
+        model: str = "gpt-4o",
+        *,
+        budget: Budget | None = None,
+        deadline: float | None = None,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> ConcurrentResponse:
+        """
+        Create a Responses API response with rate limiting and concurrency control.
+        Accepts all OpenAI `responses.create` parameters. `deadline`/`timeout` work as in
+        `create`.
+        """
+
+        def on_success(
+            response: "Response",
+            estimated_total_tokens: int,
+            timings: RequestTimings,
+            pricing: ModelPricing | None,
+        ) -> tuple[ConcurrentResponse, float | None]:
+            input_cost = output_cost = 0.0
+            if pricing and response.usage:
+                details = response.usage.input_tokens_details
+                input_cost = pricing.input_cost(
+                    response.usage.input_tokens,
+                    (details.cached_tokens or 0) if details else 0,
                 )
+                output_cost = response.usage.output_tokens * pricing.output
+
+            result = ConcurrentResponse(
+                openai_response=response,
+                estimated_total_tokens=estimated_total_tokens,
+                input_cost=input_cost,
+                output_cost=output_cost,
+                timings=timings,
+            )
+            return result, input_cost + output_cost
+
+        def on_error(
+            estimated_total_tokens: int, error: str, error_type: str, timings: RequestTimings
+        ) -> ConcurrentResponse:
+            return ConcurrentResponse(
+                estimated_total_tokens=estimated_total_tokens,
+                error=error,
+                error_type=error_type,
+                timings=timings,
+            )
+
+        return await self._execute(
+            endpoint="responses",
+            model=model,
+            count_tokens=lambda: count_response_input_tokens(
+                input, model, kwargs.get("instructions")
+            ),
+            send=lambda: self.client.responses.create(input=input, model=model, **kwargs),
+            on_success=on_success,
+            on_error=on_error,
+            max_output_tokens=kwargs.get("max_output_tokens"),
+            budget=budget,
+            deadline=_resolve_deadline(deadline, timeout, self.clock),
+        )
+
+    async def _execute(
+        self,
+        *,
+        endpoint: str,
+        model: str,
+        count_tokens: Callable[[], int],
+        send: Callable[[], Awaitable[T]],
+        on_success: Callable[[T, int, RequestTimings, ModelPricing | None], tuple[R, float | None]],
+        on_error: Callable[[int, str, str, RequestTimings], R],
+        max_output_tokens: int | None,
+        choices: int = 1,
+        budget: Budget | None = None,
+        deadline: float | None = None,
+    ) -> R:
+        """Run a request through the concurrency, budget and rate-limiting pipeline.
+
+        Args:
+            endpoint: Name of the API endpoint, used for tracing
+            model: Model the request is sent to
+            count_tokens: Estimates the request's input tokens; may raise a
+                `ConcurrentOpenAIError` to reject the request before it is sent
+            send: Performs the API call
+            on_success: Builds the result and its actual cost (None if unknown) from the
+                API response
+            on_error: Builds an error result
+            max_output_tokens: Maximum output tokens for the budget's worst case (None to
+                use the budget's default)
+            choices: Number of choices requested, multiplying the output worst case
+            budget: Per-request budget, in addition to the client-wide one
+            deadline: `clock.monotonic()` timestamp by which the request must complete
+        """
+        with self.instrumentation.span(CREATE_SPAN, model=model, endpoint=endpoint):
+            result = await self._run_pipeline(
+                endpoint=endpoint,
+                model=model,
+                count_tokens=count_tokens,
+                send=send,
+                on_success=on_success,
+                on_error=on_error,
+                max_output_tokens=max_output_tokens,
+                choices=choices,
+                budget=budget,
+                deadline=deadline,
+            )
+
+        self._record_metrics(model, result)
+        return result
+
+    async def _run_pipeline(
+        self,
+        *,
+        endpoint: str,
+        model: str,
+        count_tokens: Callable[[], int],
+        send: Callable[[], Awaitable[T]],
+        on_success: Callable[[T, int, RequestTimings, ModelPricing | None], tuple[R, float | None]],
+        on_error: Callable[[int, str, str, RequestTimings], R],
+        max_output_tokens: int | None,
+        choices: int,
+        budget: Budget | None,
+        deadline: float | None,
+    ) -> R:
+        timings = RequestTimings(started=self.clock.monotonic())
+        breaker = self.circuit_breaker
+        breaker_key = (endpoint, model)
+        probe = False
+
+        # Fail fast while the upstream is degraded, and shed load instead of queueing it
+        try:
+            if deadline is not None and timings.started >= deadline:
+                raise DeadlineExceededError("Deadline passed before the request started")
+            if breaker is not None:
+                probe = breaker.acquire(breaker_key)
+            try:
+                await self.admission.acquire(deadline=deadline)
+            except BaseException:
+                if breaker is not None:
+                    breaker.release(breaker_key, probe)
+                raise
+        except ConcurrentOpenAIError as e:
+            return on_error(0, str(e), type(e).__name__, timings)
+
+        outcome_recorded = False
+        # Limiter tokens taken for a request that has not been sent yet, refunded if it
+        # never is (deadline, open circuit or cancellation)
+        refunds: list[tuple[RateLimiter, float]] = []
+        try:
+            timings.semaphore_acquired = self.clock.monotonic()
+
+            # Calculate token estimation
+            try:
+                estimated_total_tokens = count_tokens() + self.token_safety_margin
+            except ConcurrentOpenAIError as e:
+                return on_error(0, str(e), type(e).__name__, timings)
+            timings.tokens_counted = self.clock.monotonic()
+
+            pricing = self.get_pricing(model)
+            budgets = [b for b in (self.budget, budget) if b is not None]
+            reservations: list[tuple[Budget, float]] = []
+            actual_cost: float | None = None
+            try:
+                try:
+                    if budgets:
+                        async with _time_left(deadline, "waiting for the budget", self.clock):
+                            reservations = await self._reserve_budgets(
+                                budgets,
+                                pricing,
+                                model,
+                                estimated_total_tokens,
+                                max_output_tokens,
+                                choices,
+                            )
+                    timings.budget_admitted = self.clock.monotonic()
+
+                    # Apply rate limiting if enabled
+                    if self.request_limiter:
+                        await self.request_limiter.acquire(1, deadline=deadline)
+                        refunds.append((self.request_limiter, 1))
+                    timings.request_limiter_acquired = self.clock.monotonic()
+
+                    if self.token_limiter:
+                        await self.token_limiter.acquire(estimated_total_tokens, deadline=deadline)
+                        refunds.append((self.token_limiter, estimated_total_tokens))
+                    timings.token_limiter_acquired = self.clock.monotonic()
+
+                    if breaker is not None:
+                        # The circuit may have opened while this request was waiting
+                        breaker.check(breaker_key, probe)
+                except ConcurrentOpenAIError as e:
+                    return on_error(estimated_total_tokens, str(e), type(e).__name__, timings)
+
+                self._set_in_flight(self._in_flight + 1)
+                refunds.clear()
+                try:
+                    async with _time_left(deadline, "waiting for the response", self.clock):
+                        response = await send()
+                    timings.response_received = self.clock.monotonic()
+                    self.semaphore.record(timings.http)
+                    if breaker is not None:
+                        breaker.record_success(breaker_key, timings.http, probe)
+                        outcome_recorded = True
+                    result, actual_cost = on_success(
+                        response, estimated_total_tokens, timings, pricing
+                    )
+                    return result
+
+                except Exception as e:
+                    timings.response_received = self.clock.monotonic()
+                    if is_overload(e):
+                        self.semaphore.record(timings.http, overloaded=True)
+                    if breaker is not None and is_upstream_failure(e):
+                        breaker.record_failure(breaker_key, probe)
+                        outcome_recorded = True
+                    LOGGER.error(
+                        "Error processing completion request",
+                        error=str(e),
+                        error_type=type(e).__name__,
+                    )
+                    return on_error(estimated_total_tokens, str(e), type(e).__name__, timings)
+
+                finally:
+                    self._set_in_flight(self._in_flight - 1)
+
+            finally:
+                for reserved_budget, reserved in reservations:
+                    if actual_cost is None:
+                        reserved_budget.release(reserved)
+                    else:
+                        reserved_budget.reconcile(reserved, actual_cost)
+
+        finally:
+            for limiter, tokens in refunds:
+                limiter.release(tokens)
+            self.admission.release()
+            if breaker is not None and not outcome_recorded:
+                breaker.release(breaker_key, probe)
+
+    def get_pricing(self, model: str) -> ModelPricing | None:
+        """Return the per-token pricing used for `model`.
+
+        Explicit `input_token_cost`/`output_token_cost` take precedence over the built-in
+        price table; either one may be given on its own for a model in the table. For any
+        other model both are needed, otherwise its pricing is unknown (None).
+        """
+        if self.input_token_cost is not None and self.output_token_cost is not None:
+            return ModelPricing(input=self.input_token_cost, output=self.output_token_cost)
 
-            except Exception as e:
-                LOGGER.error(
-                    "Error processing completion request",
-                    error=str(e),
-                    error_type=type(e).__name__,
+        pricing = get_model_pricing(model)
+        if pricing is None:
+            # Pricing only one side would make the other free, and uncapped by budgets
+            return None
+
+        if self.input_token_cost is not None:
+            # The table's cached-input price does not apply to a custom input price
+            return ModelPricing(input=self.input_token_cost, output=pricing.output)
+        return ModelPricing(
+            input=pricing.input,
+            output=(
+                self.output_token_cost if self.output_token_cost is not None else pricing.output
+            ),
+            cached_input=pricing.cached_input,
+        )
+
+    @staticmethod
+    async def _reserve_budgets(
+        budgets: list[Budget],
+        pricing: ModelPricing | None,
+        model: str,
+        estimated_total_tokens: int,
+        max_output_tokens: int | None,
+        choices: int,
+    ) -> list[tuple[Budget, float]]:
+        """Reserve the request's worst-case cost (input plus max output) on every budget."""
+        if pricing is None:
+            raise UnknownPricingError(
+                f"Cannot enforce a budget: no pricing known for model '{model}'. "
+                "Pass input_token_cost/output_token_cost to the client."
+            )
+
+        reservations: list[tuple[Budget, float]] = []
+        try:
+            for budget in budgets:
+                output_tokens = (
+                    max_output_tokens
+                    if max_output_tokens is not None
+                    else budget.default_max_completion_tokens
                 )
-                return ConcurrentCompletionResponse(
-                    estimated_total_tokens=estimated_total_tokens, error=str(e)
+                worst_case_cost = (
+                    estimated_total_tokens * pricing.input
+                    + output_tokens * choices * pricing.output
                 )
+                await budget.reserve(worst_case_cost)
+                reservations.append((budget, worst_case_cost))
+        except BaseException:
+            for budget, reserved in reservations:
+                budget.release(reserved)
+            raise
+
+        return reservations
 
     async def create_many(
-        self, messages_list: list[list[dict[str, Any]]], **kwargs: Any
-    ) -> list[ConcurrentCompletionResponse]:
-        """Create multiple completions concurrently."""
-        return await asyncio.gather(
-            *(self.create(messages=messages, **kwargs) for messages in messages_list)
+        self,
+        messages_list: list[list[dict[str, Any]]],
+        *,
+        order: Literal["input", "prefix"] = "input",
+        **kwargs: Any,
+    ) -> list[CompletionResponse]:
+        """
+        Create multiple completions concurrently.
+
+        Results are returned in the order of `messages_list`. By default requests are also
+        sent in that order. With `order="prefix"`, prompts that start with the same
+        `PREFIX_CACHE_TOKENS` tokens (tools included) are sent back-to-back, so they hit
+        OpenAI's prompt cache while it is warm (see `cached_tokens` on the results). The
+        prompts are tokenized upfront for this; only a short key per prompt is kept, so
+        each prompt is tokenized again when it is sent.
+
+        Args:
+            messages_list: The prompts to send
+            order: "input" or "prefix"
+            **kwargs: Arguments passed to `create` for every prompt
+        """
+        if order == "input":
+            return await asyncio.gather(
+                *(self.create(messages=messages, **kwargs) for messages in messages_list)
+            )
+        if order != "prefix":
+            raise ValueError(f"Unknown order: {order}")
+
+        model = kwargs.get("model", "gpt-3.5-turbo")
+        tools = kwargs.get("tools")
+        tool_tokens = count_function_tokens(tools, model) if tools else None
+        # Keeping every prompt's encoding until it is sent would hold the whole batch's
+        # tokens in memory
+        schedule = prefix_order(
+            prefix_key(encode_messages(messages, model), tools=tools, tool_tokens=tool_tokens or 0)
+            for messages in messages_list
+        )
+        # Tasks start in argument order, so they take concurrency slots in schedule order
+        responses = await asyncio.gather(
+            *(
+                self._create(messages_list[index], tool_tokens=tool_tokens, **kwargs)
+                for index in schedule
+            )
+        )
+
+        results: list[CompletionResponse] = [None] * len(responses)  # type: ignore[list-item]
+        for index, response in zip(schedule, responses):
+            results[index] = response
+        return results
+
+    def _set_in_flight(self, in_flight: int) -> None:
+        self._in_flight = in_flight
+        self.instrumentation.set_gauge(IN_FLIGHT, in_flight)
+
+    def _record_metrics(
+        self,
+        model: str,
+        result: CompletionResponse | ConcurrentEmbeddingResponse | ConcurrentResponse,
+    ) -> None:
+        """Feed the latency histograms and the instrumentation with a finished request."""
+        instrumentation = self.instrumentation
+        instrumentation.increment(
+            REQUESTS, model=model, status="success" if result.is_success else "error"
+        )
+        instrumentation.increment(ESTIMATED_TOKENS, result.estimated_total_tokens, model=model)
+        instrumentation.increment(
+            ACTUAL_TOKENS, result.prompt_tokens + result.completion_tokens, model=model
+        )
+        instrumentation.increment(COST, result.total_cost, model=model)
+        if not result.is_success:
+            instrumentation.increment(
+                ERRORS, model=model, error_type=result.error_type or "Unknown"
+            )
+
+        if result.timings is not None:
+            self.latency_stats.record(model, result.timings)
+            for stage, duration in result.timings.completed_stages().items():
+                instrumentation.observe(REQUEST_LATENCY, duration, model=model, stage=stage)
+
+    @staticmethod
+    def _build_response(
+        response: "ChatCompletion | None",
+        *,
+        estimated_total_tokens: int,
+        input_cost: float = 0.0,
+        output_cost: float = 0.0,
+        error: str | None = None,
+        error_type: str | None = None,
+        timings: RequestTimings | None = None,
+        lean: bool = False,
+    ) -> CompletionResponse:
+        if not lean:
+            return ConcurrentCompletionResponse(
+                openai_response=response,
+                estimated_total_tokens=estimated_total_tokens,
+                input_cost=input_cost,
+                output_cost=output_cost,
+                error=error,
+                error_type=error_type,
+                timings=timings,
+            )
+
+        if response is None:
+            return LeanCompletionResponse(
+                estimated_total_tokens=estimated_total_tokens,
+                error=error,
+                error_type=error_type,
+                timings=timings,
+            )
+
+        return LeanCompletionResponse.from_completion(
+            response,
+            estimated_total_tokens=estimated_total_tokens,
+            input_cost=input_cost,
+            output_cost=output_cost,
+            error=error,
+            error_type=error_type,
+            timings=timings,
+        )
+
+
+def __getattr__(name: str) -> Any:
+    # `openai` takes a large share of the import time, so `AsyncOpenAI` is only imported
+    # when a client is created without one
+    if name == "AsyncOpenAI":
+        from openai import AsyncOpenAI
+
+        return AsyncOpenAI
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _async_openai() -> type["AsyncOpenAI"]:
+    # A module global (e.g. patched in tests) takes precedence over the lazy import
+    return globals().get("AsyncOpenAI") or __getattr__("AsyncOpenAI")
+
+
+def _build_rate_limiter(
+    name: str,
+    per_minute: int,
+    *,
+    instrumentation: Instrumentation,
+    initial_fill: float,
+    state_dir: str | os.PathLike[str] | None,
+    algorithm: Literal["token_bucket", "sliding_window"],
+    burst_policy: BurstPolicy | None,
+    clock: Clock,
+) -> RateLimiter:
+    options: dict[str, Any] = {
+        "name": name,
+        "instrumentation": instrumentation,
+        "clock": clock,
+        "initial_tokens": per_minute * initial_fill,
+        "state_file": limiter_state_file(state_dir, name),
+    }
+    if algorithm == "sliding_window":
+        # Keep spend a second past the minute: the server's window starts when a request
+        # arrives, which can be well after admission on a fresh connection
+        return SlidingWindowRateLimiter(
+            per_minute, 60.0, burst_policy=burst_policy, skew=1.0, **options
         )
+    if algorithm != "token_bucket":
+        raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+    return RateLimiter(
+        capacity=per_minute,
+        fill_rate=per_minute / 60,
+        minimum_spacing=1 / (per_minute / 60),
+        **options,
+    )
+
+
+def _resolve_deadline(deadline: float | None, timeout: float | None, clock: Clock) -> float | None:
+    """Combine an absolute `deadline` and a relative `timeout` into the earlier deadline."""
+    if timeout is None:
+        return deadline
+    timeout_deadline = clock.monotonic() + timeout
+    return timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+
+
+@asynccontextmanager
+async def _time_left(deadline: float | None, stage: str, clock: Clock) -> AsyncIterator[None]:
+    """Cancel the block when `deadline` passes, raising `DeadlineExceededError`."""
+    if deadline is None:
+        yield
+        return
+    try:
+        async with asyncio.timeout(max(0.0, deadline - clock.monotonic())) as scope:
+            yield
+    except TimeoutError:
+        if not scope.expired():
+            raise
+        raise DeadlineExceededError(f"Deadline passed while {stage}") from None
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+
+class Clock:
+    """The time source of the client and its limiters.
+
+    Reads the system's monotonic and wall clocks and sleeps on the running event loop.
+    Pass a `VirtualClock` instead to run on simulated time (see `concurrent_openai.simulation`).
+    """
+
+    def monotonic(self) -> float:
+        """Seconds on a clock that never goes back, for intervals and deadlines."""
+        return time.monotonic()
+
+    def time(self) -> float:
+        """Wall-clock time as a Unix timestamp, for state shared across processes."""
+        return time.time()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+SYSTEM_CLOCK = Clock()
+
+
+class VirtualClock(Clock):
+    """A clock that only moves when advanced.
+
+    Run under a `VirtualEventLoop`, which advances it to the next scheduled timer whenever
+    every task is waiting, so sleeps and timeouts take no real time.
+
+    Attributes:
+        epoch: Wall-clock timestamp that virtual time 0 corresponds to
+        resolution: Shortest sleep in seconds
+    """
+
+    def __init__(self, start: float = 0.0, epoch: float = 0.0, resolution: float = 1e-6) -> None:
+        """
+        Initialize a virtual clock.
+
+        Args:
+            start: Initial monotonic time in seconds
+            epoch: Wall-clock timestamp that monotonic time 0 corresponds to
+            resolution: Shortest sleep in seconds. Like on a real clock, every sleep takes
+                some time, so a wait computed as a tiny float still ends
+        """
+        self._now = start
+        self.epoch = epoch
+        self.resolution = resolution
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def time(self) -> float:
+        return self.epoch + self._now
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(max(seconds, self.resolution))
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward by `seconds`."""
+        if seconds < 0:
+            raise ValueError("A clock cannot go back")
+        self._now += seconds
+
+    def __repr__(self) -> str:
+        return f"VirtualClock(now={self._now:.3f})"
@@ -0,0 +1,249 @@
+import asyncio
+from collections import deque
+from typing import Any
+
+from .clock import SYSTEM_CLOCK, Clock
+from .instrumentation import CONCURRENCY_LIMIT, Instrumentation
+from .log import get_logger
+
+LOGGER = get_logger(__name__)
+
+
+class ConcurrencyLimiter:
+    """Limits the number of requests in flight, like an `asyncio.Semaphore` that can be resized.
+
+    Attributes:
+        name: Label used for logs and metrics
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        *,
+        name: str = "concurrency",
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
+        """Initialize the concurrency limiter.
+
+        Args:
+            limit: Maximum number of requests in flight
+            name: Label used for logs and metrics
+            instrumentation: Receives the current limit as a gauge (optional)
+        """
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1")
+
+        self.name = name
+        self._limit = float(limit)
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._instrumentation = instrumentation or Instrumentation()
+
+    @property
+    def limit(self) -> int:
+        """Current maximum number of requests in flight."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of slots currently held."""
+        return self._in_flight
+
+    @property
+    def waiters(self) -> int:
+        """Number of callers waiting for a slot."""
+        return len(self._waiters)
+
+    def locked(self) -> bool:
+        """Whether `acquire` would have to wait."""
+        return bool(self._waiters) or self._in_flight >= self.limit
+
+    async def acquire(self) -> None:
+        """Wait for a free slot and take it."""
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            return
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._waiters.remove(future)
+            else:
+                # The slot was handed over just before the cancellation
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Free a slot taken by `acquire`."""
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def resize(self, limit: int) -> None:
+        """Change the maximum number of requests in flight.
+
+        Shrinking takes effect as requests complete; requests already in flight are not
+        interrupted.
+        """
+        if limit < 1:
+            raise ValueError("Concurrency limit must be at least 1")
+        self._set_limit(float(limit))
+
+    def record(self, latency: float, *, overloaded: bool = False) -> None:
+        """Feed back the outcome of a request; fixed limiters ignore it.
+
+        Args:
+            latency: Duration of the API call in seconds
+            overloaded: Whether the upstream pushed back (429 or 503)
+        """
+
+    def _set_limit(self, limit: float) -> None:
+        previous = self.limit
+        self._limit = limit
+        if self.limit != previous:
+            self._instrumentation.set_gauge(CONCURRENCY_LIMIT, self.limit, limiter=self.name)
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self._in_flight += 1
+                future.set_result(None)
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(limit={self.limit}, in_flight={self._in_flight}, "
+            f"waiters={len(self._waiters)})"
+        )
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """A concurrency limit tuned at runtime with AIMD (additive increase, multiplicative decrease).
+
+    While the limit is in use and latency stays close to its recent baseline, the limit grows
+    by about `increase` per limit's worth of completed requests. When the upstream pushes
+    back (429/503) or latency rises above `latency_tolerance` times the baseline, the limit is
+    multiplied by `backoff`, at most once per round trip, so a burst of failures from
+    requests sent under the old limit only backs off once.
+
+    The baseline is the lowest latency over the last `window` requests, so it follows
+    lasting shifts in upstream latency (e.g. a slower model or time of day).
+
+    Attributes:
+        min_limit: Lower bound for the limit
+        max_limit: Upper bound for the limit
+        increase: Additive increase per limit's worth of successful requests
+        backoff: Factor the limit is multiplied by on overload
+        latency_tolerance: Latency above this multiple of the baseline counts as overload
+        window: Number of recent requests the latency baseline is taken over
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        *,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        increase: float = 1.0,
+        backoff: float = 0.7,
+        latency_tolerance: float = 2.0,
+        window: int = 100,
+        name: str = "concurrency",
+        instrumentation: Instrumentation | None = None,
+        clock: Clock | None = None,
+    ) -> None:
+        """Initialize the adaptive concurrency limiter.
+
+        Args:
+            initial_limit: Starting limit
+            min_limit: Lower bound for the limit
+            max_limit: Upper bound for the limit
+            increase: Additive increase per limit's worth of successful requests
+            backoff: Factor the limit is multiplied by on overload (between 0 and 1)
+            latency_tolerance: Latency above this multiple of the baseline counts as overload
+            window: Number of recent requests the latency baseline is taken over
+            name: Label used for logs and metrics
+            instrumentation: Receives the current limit as a gauge (optional)
+            clock: Time source for spacing decreases (optional, defaults to the system clock)
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        if latency_tolerance <= 1:
+            raise ValueError("latency_tolerance must be greater than 1")
+
+        super().__init__(initial_limit, name=name, instrumentation=instrumentation)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.window = window
+        self.clock = clock or SYSTEM_CLOCK
+
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._baseline: float | None = None
+        self._samples_since_baseline = 0
+        # Any clock may start near 0, so the first overload must always count
+        self._last_decrease = float("-inf")
+
+    @property
+    def baseline_latency(self) -> float | None:
+        """Lowest recent latency, the reference for detecting a latency rise."""
+        return self._baseline
+
+    def resize(self, limit: int) -> None:
+        """Set the limit, e.g. to a known-good value; it keeps adapting from there."""
+        if not self.min_limit <= limit <= self.max_limit:
+            raise ValueError(f"limit must be between {self.min_limit} and {self.max_limit}")
+        super().resize(limit)
+
+    def record(self, latency: float, *, overloaded: bool = False) -> None:
+        if not overloaded:
+            self._update_baseline(latency)
+
+        if overloaded or latency > self._baseline * self.latency_tolerance:  # type: ignore
+            now = self.clock.monotonic()
+            # Requests sent before the last decrease saw the old limit
+            if now - latency >= self._last_decrease:
+                self._last_decrease = now
+                self._set_limit(max(float(self.min_limit), self._limit * self.backoff))
+                LOGGER.info(
+                    "Concurrency limit decreased",
+                    limiter=self.name,
+                    limit=self.limit,
+                    latency=latency,
+                    baseline=self._baseline,
+                    overloaded=overloaded,
+                )
+            return
+
+        # Only grow while the current limit is actually being used
+        if self._in_flight >= self._limit / 2:
+            self._set_limit(min(float(self.max_limit), self._limit + self.increase / self._limit))
+
+    def _update_baseline(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._samples_since_baseline += 1
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        elif self._samples_since_baseline >= self.window:
+            # Let the baseline drift up if latency has shifted for good
+            self._baseline = min(self._latencies)
+            self._samples_since_baseline = 0
+
+
+def is_overload(error: Exception) -> bool:
+    """Whether an API error means the upstream is pushing back on load."""
+    return getattr(error, "status_code", None) in (429, 503)
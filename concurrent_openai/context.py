@@ -0,0 +1,191 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Literal
+
+from .exceptions import ContextWindowExceededError
+from .log import get_logger
+from .models import EncodedMessage
+from .utils import count_function_tokens, encode_messages, get_encoding
+
+if TYPE_CHECKING:
+    import tiktoken
+
+LOGGER = get_logger(__name__)
+
+ContextPolicy = Literal["reject", "drop_oldest", "truncate_longest"]
+
+# Context window sizes in tokens (prompt and completion together).
+# A key matches the model name itself or any name continuing it with "-" (e.g. a dated
+# snapshot); the longest matching key wins. Models without a match are not checked.
+CONTEXT_WINDOWS: dict[str, int] = {
+    "gpt-3.5-turbo": 16_385,
+    "gpt-35-turbo": 16_385,
+    "gpt-4": 8_192,
+    "gpt-4-32k": 32_768,
+    "gpt-4-0125": 128_000,
+    "gpt-4-1106": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4-vision": 128_000,
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4.1-mini": 1_047_576,
+    "gpt-4.1-nano": 1_047_576,
+    "gpt-4.5": 128_000,
+    "o1": 200_000,
+    "o1-mini": 128_000,
+    "o1-preview": 128_000,
+    "o3": 200_000,
+    "o3-mini": 200_000,
+    "o4-mini": 200_000,
+}
+
+_SYSTEM_ROLES = ("system", "developer")
+
+
+@lru_cache(maxsize=None)
+def get_context_window(model: str) -> int | None:
+    """Get the context window of a model, or None if it is unknown.
+
+    Results are cached, so `CONTEXT_WINDOWS` should be updated before the first lookup.
+    """
+    best_key = ""
+    for key in CONTEXT_WINDOWS:
+        if (model == key or model.startswith(key + "-")) and len(key) > len(best_key):
+            best_key = key
+
+    if not best_key:
+        LOGGER.debug("Model context window not found.", model=model)
+        return None
+    return CONTEXT_WINDOWS[best_key]
+
+
+def fit_messages(
+    messages: list[dict[str, Any]],
+    tools: list[dict[str, Any]] | None,
+    model: str,
+    *,
+    policy: ContextPolicy = "reject",
+    max_output_tokens: int | None = None,
+    encoded: list[EncodedMessage] | None = None,
+    tool_tokens: int | None = None,
+) -> tuple[list[dict[str, Any]], int]:
+    """
+    Make a chat prompt fit the model's context window.
+
+    Every message is encoded once; trimming works on those token ids, so the returned
+    count is the estimate for the messages actually sent. The caller's messages are never
+    modified.
+
+    Args:
+        messages: List of message dictionaries with role and content
+        tools: Tools sent with the messages (optional)
+        model: The model the prompt is sent to
+        policy: What to do with a prompt that does not fit: "reject" raises a
+            `ContextWindowExceededError`, "drop_oldest" drops the oldest conversation
+            turns (system and developer messages and the last message are kept), and
+            "truncate_longest" cuts the longest text content, token by token
+        max_output_tokens: Tokens reserved for the completion (optional)
+        encoded: The messages already encoded with `encode_messages` (optional)
+        tool_tokens: The tools' token count, from `count_function_tokens` (optional)
+
+    Returns:
+        tuple[list[dict[str, Any]], int]: The messages to send and their estimated prompt
+            tokens, including tools
+    """
+    if encoded is None:
+        encoded = encode_messages(messages, model)
+    if tool_tokens is None:
+        tool_tokens = count_function_tokens(tools, model)
+    fixed_tokens = tool_tokens + 3  # reply priming, as in counting
+    prompt_tokens = fixed_tokens + sum(message.num_tokens for message in encoded)
+
+    context_window = get_context_window(model)
+    if context_window is None:
+        return messages, prompt_tokens
+
+    limit = context_window - (max_output_tokens or 0)
+    overflow = prompt_tokens - limit
+    if overflow <= 0:
+        return messages, prompt_tokens
+
+    fitted: list[EncodedMessage] | None = None
+    if policy == "drop_oldest":
+        fitted = _drop_oldest(encoded, overflow)
+    elif policy == "truncate_longest":
+        fitted = _truncate_longest(encoded, overflow, get_encoding(model))
+    elif policy != "reject":
+        raise ValueError(f"Unknown context policy: {policy}")
+
+    if fitted is None:
+        reserved = (
+            f" with {max_output_tokens} tokens reserved for output" if max_output_tokens else ""
+        )
+        raise ContextWindowExceededError(
+            f"Prompt of {prompt_tokens} tokens does not fit the {context_window}-token context "
+            f"window of {model}{reserved}"
+        )
+
+    fitted_tokens = fixed_tokens + sum(message.num_tokens for message in fitted)
+    LOGGER.info(
+        "Prompt trimmed to fit the context window",
+        model=model,
+        policy=policy,
+        prompt_tokens=prompt_tokens,
+        fitted_tokens=fitted_tokens,
+        dropped_messages=len(encoded) - len(fitted),
+    )
+    return [message.message for message in fitted], fitted_tokens
+
+
+def _drop_oldest(encoded: list[EncodedMessage], overflow: int) -> list[EncodedMessage] | None:
+    kept = list(encoded)
+    while overflow > 0:
+        index = next(
+            (i for i, m in enumerate(kept[:-1]) if m.message.get("role") not in _SYSTEM_ROLES),
+            None,
+        )
+        if index is None:
+            return None
+        overflow -= kept.pop(index).num_tokens
+        # Tool results cannot be sent without the assistant message that called the tools
+        while index < len(kept) and kept[index].message.get("role") == "tool":
+            overflow -= kept.pop(index).num_tokens
+
+    if all(m.message.get("role") in _SYSTEM_ROLES for m in kept):
+        return None
+    return kept
+
+
+def _truncate_longest(
+    encoded: list[EncodedMessage], overflow: int, encoding: "tiktoken.Encoding"
+) -> list[EncodedMessage] | None:
+    fitted = list(encoded)
+    while overflow > 0:
+        candidates = [
+            (len(tokens), index, position)
+            for index, message in enumerate(fitted)
+            for position, tokens in message.texts.items()
+            if tokens
+        ]
+        if not candidates:
+            return None
+
+        length, index, position = max(candidates, key=lambda candidate: candidate[0])
+        cut = min(length, overflow)
+        message = fitted[index]
+        tokens = message.texts[position][: length - cut]
+        fitted[index] = EncodedMessage(
+            _replace_text(message.message, position, encoding.decode(tokens)),
+            message.num_tokens - cut,
+            {**message.texts, position: tokens},
+        )
+        overflow -= cut
+    return fitted
+
+
+def _replace_text(message: dict[str, Any], position: int | None, text: str) -> dict[str, Any]:
+    if position is None:
+        return {**message, "content": text}
+    parts = list(message["content"])
+    parts[position] = {**parts[position], "text": text}
+    return {**message, "content": parts}
@@ -0,0 +1,333 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Protocol, Sequence
+
+from .log import get_logger
+from .models import STAGES, CompletionResponse, LeanCompletionResponse
+
+if TYPE_CHECKING:
+    import pyarrow
+
+    from .client import ConcurrentOpenAI
+
+LOGGER = get_logger(__name__)
+
+
+class DatasetSink(Protocol):
+    """Receives result rows in groups of at most `row_group_size`, in completion order."""
+
+    def write(self, rows: list[dict[str, Any]]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+@dataclass(slots=True)
+class DatasetSummary:
+    """Totals over a processed dataset."""
+
+    rows: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    total_cost: float = 0.0
+
+
+async def process_dataset(
+    client: "ConcurrentOpenAI",
+    rows: Iterable[dict[str, Any]],
+    sink: DatasetSink,
+    *,
+    messages_column: str = "messages",
+    passthrough_columns: Sequence[str] = (),
+    max_in_flight: int = 1000,
+    row_group_size: int = 10_000,
+    **kwargs: Any,
+) -> DatasetSummary:
+    """
+    Run a chat completion for every row of a dataset and stream the results to a sink.
+
+    Rows are pulled from `rows` only while fewer than `max_in_flight` requests are pending,
+    and results are handed to `sink` in groups of `row_group_size` as they finish, so at
+    most `max_in_flight + row_group_size` rows are held in memory however large the dataset
+    is. Results arrive in completion order; the `row`
+    column holds the position of the input row.
+
+    Args:
+        client: The client whose limiters and budgets the requests go through
+        rows: Input rows, e.g. from `read_jsonl`, `read_parquet` or `read_arrow`
+        sink: Receives the result rows, e.g. a `JsonlSink` or `ParquetSink`
+        messages_column: Column holding the chat messages (a list of messages or its JSON)
+        passthrough_columns: Input columns copied to the output, e.g. an id
+        max_in_flight: Maximum number of requests pending at once
+        row_group_size: Number of result rows per write
+        **kwargs: Arguments passed to `create` for every row (e.g. `model`)
+
+    Returns:
+        DatasetSummary: Row counts, token usage and cost
+    """
+    if max_in_flight < 1 or row_group_size < 1:
+        raise ValueError("max_in_flight and row_group_size must be at least 1")
+    # Results are flattened into rows, for which the lean response always suffices
+    kwargs.pop("lean", None)
+
+    summary = DatasetSummary()
+    buffer: list[dict[str, Any]] = []
+    pending: set[asyncio.Task[dict[str, Any]]] = set()
+
+    async def run(index: int, row: dict[str, Any]) -> dict[str, Any]:
+        messages = row.get(messages_column)
+        if isinstance(messages, str):
+            try:
+                messages = json.loads(messages)
+            except ValueError:
+                messages = None
+        if not isinstance(messages, list):
+            response: CompletionResponse = LeanCompletionResponse(
+                error=f"Row has no list of messages in column '{messages_column}'",
+                error_type="InvalidRow",
+            )
+        else:
+            try:
+                # Struct columns give every message every field, None where it is missing
+                messages = [
+                    {key: value for key, value in message.items() if value is not None}
+                    for message in messages
+                ]
+                response = await client.create(messages, lean=True, **kwargs)
+            except Exception as e:
+                # e.g. a malformed message failing token counting: fail the row, not the job
+                response = LeanCompletionResponse(error=str(e), error_type=type(e).__name__)
+        return {
+            **{column: row.get(column) for column in passthrough_columns},
+            **result_row(index, response),
+        }
+
+    def collect(done: Iterable[asyncio.Task[dict[str, Any]]]) -> None:
+        for task in done:
+            result = task.result()
+            _add_to_summary(summary, result)
+            buffer.append(result)
+            if len(buffer) >= row_group_size:
+                sink.write(buffer[:])
+                buffer.clear()
+
+    try:
+        for index, row in enumerate(rows):
+            if len(pending) >= max_in_flight:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+            pending.add(asyncio.create_task(run(index, row)))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if buffer:
+        sink.write(buffer)
+    LOGGER.info("Dataset processed", rows=summary.rows, failed=summary.failed)
+    return summary
+
+
+def result_row(index: int, response: CompletionResponse) -> dict[str, Any]:
+    """Flatten a response into an output row, with a `<stage>_seconds` column per stage."""
+    if isinstance(response, LeanCompletionResponse):
+        content, finish_reason = response.content, response.finish_reason
+    else:
+        completion = response.openai_response
+        choice = completion.choices[0] if completion and completion.choices else None
+        content = choice.message.content if choice else None
+        finish_reason = choice.finish_reason if choice else None
+
+    breakdown = response.timings.completed_stages() if response.timings else {}
+    return {
+        "row": index,
+        "content": content,
+        "finish_reason": finish_reason,
+        "prompt_tokens": response.prompt_tokens,
+        "completion_tokens": response.completion_tokens,
+        "cached_tokens": response.cached_tokens,
+        "estimated_total_tokens": response.estimated_total_tokens,
+        "input_cost": response.input_cost,
+        "output_cost": response.output_cost,
+        "error": response.error,
+        "error_type": response.error_type,
+        **{f"{stage}_seconds": breakdown.get(stage) for stage in STAGES},
+    }
+
+
+def _add_to_summary(summary: DatasetSummary, result: dict[str, Any]) -> None:
+    summary.rows += 1
+    if result["error"] is None:
+        summary.succeeded += 1
+    else:
+        summary.failed += 1
+    summary.prompt_tokens += result["prompt_tokens"]
+    summary.completion_tokens += result["completion_tokens"]
+    summary.cached_tokens += result["cached_tokens"]
+    summary.total_cost += result["input_cost"] + result["output_cost"]
+
+
+def read_jsonl(path: str | os.PathLike[str]) -> Iterator[dict[str, Any]]:
+    """Yield the rows of a JSON Lines file one at a time; blank lines are skipped."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_parquet(
+    path: str | os.PathLike[str], columns: Sequence[str] | None = None, batch_size: int = 1024
+) -> Iterator[dict[str, Any]]:
+    """Yield the rows of a Parquet file, reading `batch_size` rows at a time.
+
+    Requires `pyarrow`. `columns` limits the columns read (optional, defaults to all).
+    """
+    parquet = _import_pyarrow("parquet")
+    parquet_file = parquet.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield from batch.to_pylist()
+
+
+def read_arrow(
+    data: "pyarrow.Table | pyarrow.RecordBatchReader | Iterable[pyarrow.RecordBatch]",
+    batch_size: int = 1024,
+) -> Iterator[dict[str, Any]]:
+    """Yield the rows of an Arrow table, record batch reader or iterable of record batches.
+
+    Requires `pyarrow`. Tables are converted `batch_size` rows at a time.
+    """
+    pyarrow = _import_pyarrow()
+    batches = data.to_batches(max_chunksize=batch_size) if isinstance(data, pyarrow.Table) else data
+    for batch in batches:
+        yield from batch.to_pylist()
+
+
+class JsonlSink:
+    """Writes result rows to a JSON Lines file, one object per line."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        self._file.writelines(json.dumps(row) + "\n" for row in rows)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "JsonlSink":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class ParquetSink:
+    """Writes result rows to a Parquet file, one row group per write.
+
+    Requires `pyarrow`. The schema is fixed for the result columns. Passthrough columns take
+    the types in `schema` if given, otherwise the types inferred from the first write; a
+    column that was all None so far is widened once it gets values, by rewriting the rows
+    written before.
+    """
+
+    def __init__(
+        self, path: str | os.PathLike[str], schema: "pyarrow.Schema | None" = None
+    ) -> None:
+        """
+        Initialize a Parquet sink.
+
+        Args:
+            path: File to write
+            schema: Types of the passthrough columns (optional, inferred from the rows)
+        """
+        self.path = path
+        self._pyarrow = _import_pyarrow()
+        self._parquet = _import_pyarrow("parquet")
+        self._passthrough_schema = schema
+        self._writer: Any = None
+        self._schema: "pyarrow.Schema | None" = None
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        if self._writer is None:
+            self._schema = self._build_schema(rows)
+            self._writer = self._parquet.ParquetWriter(self.path, self._schema)
+        else:
+            self._widen_null_columns(rows)
+        self._writer.write_table(self._pyarrow.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self) -> None:
+        if self._writer is None:
+            # Nothing was written: still leave a valid, empty file behind
+            self._schema = self._build_schema([])
+            self._writer = self._parquet.ParquetWriter(self.path, self._schema)
+        self._writer.close()
+
+    def _widen_null_columns(self, rows: list[dict[str, Any]]) -> None:
+        """Give null-typed columns the type of their first values, rewriting earlier rows."""
+        pa = self._pyarrow
+        assert self._schema is not None
+        null_columns = [field.name for field in self._schema if pa.types.is_null(field.type)]
+        if not null_columns:
+            return
+        inferred = pa.Table.from_pylist([{c: row.get(c) for c in null_columns} for row in rows])
+        widened = [field for field in inferred.schema if not pa.types.is_null(field.type)]
+        if not widened:
+            return
+
+        schema = self._schema
+        for field in widened:
+            schema = schema.set(schema.get_field_index(field.name), field)
+        self._writer.close()
+        written = self._parquet.read_table(self.path).cast(schema)
+        self._schema = schema
+        self._writer = self._parquet.ParquetWriter(self.path, schema)
+        self._writer.write_table(written)
+
+    def _build_schema(self, rows: list[dict[str, Any]]) -> "pyarrow.Schema":
+        pa = self._pyarrow
+        result_fields = [
+            pa.field("row", pa.int64()),
+            pa.field("content", pa.string()),
+            pa.field("finish_reason", pa.string()),
+            pa.field("prompt_tokens", pa.int64()),
+            pa.field("completion_tokens", pa.int64()),
+            pa.field("cached_tokens", pa.int64()),
+            pa.field("estimated_total_tokens", pa.int64()),
+            pa.field("input_cost", pa.float64()),
+            pa.field("output_cost", pa.float64()),
+            pa.field("error", pa.string()),
+            pa.field("error_type", pa.string()),
+            *(pa.field(f"{stage}_seconds", pa.float64()) for stage in STAGES),
+        ]
+        if self._passthrough_schema is not None:
+            return pa.schema([*self._passthrough_schema, *result_fields])
+        names = {field.name for field in result_fields}
+        extra = [column for column in (rows[0] if rows else {}) if column not in names]
+        passthrough = pa.Table.from_pylist([{c: row.get(c) for c in extra} for row in rows])
+        return pa.schema([*passthrough.schema, *result_fields])
+
+    def __enter__(self) -> "ParquetSink":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _import_pyarrow(submodule: str | None = None) -> Any:
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Arrow and Parquet datasets require `pyarrow`. Install it with `pip install pyarrow`."
+        ) from e
+    return pyarrow.parquet if submodule == "parquet" else pyarrow
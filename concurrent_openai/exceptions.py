@@ -0,0 +1,26 @@
+class ConcurrentOpenAIError(Exception):
+    """Base class for errors raised by concurrent-openai itself (not by the OpenAI API)."""
+
+
+class BudgetExceededError(ConcurrentOpenAIError):
+    """Raised when a request's worst-case cost does not fit in the remaining budget."""
+
+
+class UnknownPricingError(ConcurrentOpenAIError):
+    """Raised when a budget is enforced for a model whose per-token price is unknown."""
+
+
+class CircuitOpenError(ConcurrentOpenAIError):
+    """Raised when a request is rejected because the upstream's circuit breaker is open."""
+
+
+class LoadShedError(ConcurrentOpenAIError):
+    """Raised when a request is shed because the admission queue is full or too slow."""
+
+
+class DeadlineExceededError(ConcurrentOpenAIError):
+    """Raised when a request cannot complete before its deadline."""
+
+
+class ContextWindowExceededError(ConcurrentOpenAIError):
+    """Raised when a prompt does not fit the model's context window."""
@@ -0,0 +1,361 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable
+
+from .client import ConcurrentOpenAI
+from .log import get_logger
+from .models import (
+    CompletionResponse,
+    ConcurrentCompletionResponse,
+    LeanCompletionResponse,
+)
+from .rate_limiter import SharedRateLimiter, limiter_state_file
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+LOGGER = get_logger(__name__)
+
+_STOP = None
+
+
+@dataclass
+class WorkerConfig:
+    """Everything a worker process needs to build its own `ConcurrentOpenAI` client.
+
+    Must be picklable: `client_factory`, if given, has to be a module-level callable.
+    """
+
+    client_factory: Callable[[], "AsyncOpenAI"] | None = None
+    api_key: str | None = None
+    max_concurrent_requests: int = 100
+    token_safety_margin: int = 100
+    input_token_cost: float | None = None
+    output_token_cost: float | None = None
+    client_options: dict[str, Any] = field(default_factory=dict)
+
+
+class ShardedExecutor:
+    """Runs `create_many` across several worker processes under one global RPM/TPM budget.
+
+    Above a few thousand requests per second a single event loop becomes CPU-bound on token
+    counting, response parsing and logging. Each worker process runs its own event loop and
+    `AsyncOpenAI` client, while the requests-per-minute and tokens-per-minute buckets live in
+    shared memory (`SharedRateLimiter`) so the quota is enforced across all workers.
+
+    Workers are started lazily and reused until `close()` is called, which keeps their HTTP
+    connection pools warm between batches. Client-wide budgets are not shared between
+    processes.
+    """
+
+    def __init__(
+        self,
+        *,
+        processes: int = os.cpu_count() or 1,
+        client_factory: Callable[[], "AsyncOpenAI"] | None = None,
+        api_key: str | None = None,
+        max_concurrent_requests: int = 100,
+        token_safety_margin: int = 100,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        input_token_cost: float | None = None,
+        output_token_cost: float | None = None,
+        mp_context: Any = None,
+        rate_limit_initial_fill: float = 1.0,
+        rate_limit_state_dir: str | os.PathLike[str] | None = None,
+        **client_options: Any,
+    ) -> None:
+        """
+        Initialize a sharded executor.
+
+        Args:
+            processes: Number of worker processes
+            client_factory: Module-level callable returning the `AsyncOpenAI` client used by
+                each worker (optional, defaults to `AsyncOpenAI(api_key=..., **client_options)`)
+            api_key: OpenAI API key (optional, defaults to OPENAI_API_KEY in the workers)
+            max_concurrent_requests: Maximum number of concurrent requests per worker
+            token_safety_margin: Safety margin for token estimation
+            requests_per_minute: Global maximum requests per minute (optional)
+            tokens_per_minute: Global maximum tokens per minute (optional)
+            input_token_cost: Cost per input token (optional)
+            output_token_cost: Cost per output token (optional)
+            mp_context: `multiprocessing` context (optional, defaults to "spawn")
+            rate_limit_initial_fill: Share of the global RPM/TPM buckets (0-1) available
+                at start
+            rate_limit_state_dir: Directory the global RPM/TPM bucket state is persisted to
+                and restored from (optional)
+            **client_options: Additional options passed to each worker's AsyncOpenAI client
+        """
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+        for option in ("budget", "instrumentation"):
+            # Each worker would get its own copy, e.g. `processes` times the budget
+            if option in client_options:
+                raise ValueError(f"{option} cannot be shared across worker processes")
+
+        self.processes = processes
+        self._context = mp_context or multiprocessing.get_context("spawn")
+        self._config = WorkerConfig(
+            client_factory=client_factory,
+            api_key=api_key,
+            max_concurrent_requests=max_concurrent_requests,
+            token_safety_margin=token_safety_margin,
+            input_token_cost=input_token_cost,
+            output_token_cost=output_token_cost,
+            client_options=client_options,
+        )
+
+        self.request_limiter = (
+            SharedRateLimiter(
+                capacity=requests_per_minute,
+                fill_rate=requests_per_minute / 60,
+                minimum_spacing=1 / (requests_per_minute / 60),
+                name="requests",
+                mp_context=self._context,
+                initial_tokens=requests_per_minute * rate_limit_initial_fill,
+                state_file=limiter_state_file(rate_limit_state_dir, "requests"),
+            )
+            if requests_per_minute
+            else None
+        )
+        self.token_limiter = (
+            SharedRateLimiter(
+                capacity=tokens_per_minute,
+                fill_rate=tokens_per_minute / 60,
+                minimum_spacing=1 / (tokens_per_minute / 60),
+                name="tokens",
+                mp_context=self._context,
+                initial_tokens=tokens_per_minute * rate_limit_initial_fill,
+                state_file=limiter_state_file(rate_limit_state_dir, "tokens"),
+            )
+            if tokens_per_minute
+            else None
+        )
+
+        self._workers: list[Any] = []
+        self._task_queue: Any = None
+        self._result_queue: Any = None
+        self._job_ids = itertools.count()
+        self._lock = asyncio.Lock()
+
+    def start(self) -> None:
+        """Start the worker processes (done automatically on first use)."""
+        if self._workers:
+            return
+
+        self._task_queue = self._context.Queue(maxsize=self.processes * 1000)
+        self._result_queue = self._context.Queue()
+        for _ in range(self.processes):
+            worker = self._context.Process(
+                target=_worker_main,
+                args=(
+                    self._config,
+                    self._task_queue,
+                    self._result_queue,
+                    self.request_limiter,
+                    self.token_limiter,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def close(self) -> None:
+        """Stop the worker processes and save the rate limiter state (if persisted)."""
+        if self._workers:
+            for _ in self._workers:
+                self._task_queue.put(_STOP)
+            for worker in self._workers:
+                worker.join()
+            self._reset()
+
+        for limiter in (self.request_limiter, self.token_limiter):
+            if limiter is not None and limiter.state_file is not None:
+                limiter.save()
+
+    def terminate(self) -> None:
+        """Kill the worker processes without waiting for in-flight requests."""
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in self._workers:
+            worker.join()
+        self._reset()
+
+    def _reset(self) -> None:
+        for q in (self._task_queue, self._result_queue):
+            if q is not None:
+                q.close()
+                q.cancel_join_thread()
+        self._workers = []
+        self._task_queue = self._result_queue = None
+
+    async def __aenter__(self) -> "ShardedExecutor":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def stream(
+        self, messages_list: list[list[dict[str, Any]]], *, ordered: bool = False, **kwargs: Any
+    ) -> AsyncIterator[tuple[int, CompletionResponse]]:
+        """Yield `(index, response)` pairs as the workers complete them.
+
+        With `ordered=True` results are yielded in input order, buffering the ones that
+        finish early. Accepts the same keyword arguments as `ConcurrentOpenAI.create`.
+
+        If iteration stops early (break, `aclose` or cancellation), requests that have not
+        been picked up by a worker yet are dropped; those already running still complete.
+        """
+        # One batch at a time: results are routed through a single shared queue
+        async with self._lock:
+            self.start()
+            loop = asyncio.get_running_loop()
+            job_id = next(self._job_ids)
+            total = len(messages_list)
+
+            task_queue = self._task_queue
+            stop = threading.Event()
+
+            def feed() -> None:
+                for index, messages in enumerate(messages_list):
+                    while True:
+                        if stop.is_set() or self._task_queue is not task_queue:
+                            return  # Abandoned, or the workers were torn down
+                        try:
+                            task_queue.put((job_id, index, messages, kwargs), timeout=1.0)
+                            break
+                        except queue.Full:
+                            continue
+
+            feeder = loop.run_in_executor(None, feed)
+            try:
+                pending: dict[int, CompletionResponse] = {}
+                next_index = received = 0
+                while received < total:
+                    result_job_id, index, response = await loop.run_in_executor(
+                        None, self._get_result
+                    )
+                    if result_job_id != job_id:
+                        # Left over from an earlier stream that was abandoned
+                        continue
+                    received += 1
+
+                    if not ordered:
+                        yield index, response
+                        continue
+
+                    pending[index] = response
+                    while next_index in pending:
+                        yield next_index, pending.pop(next_index)
+                        next_index += 1
+            finally:
+                stop.set()
+                await feeder
+                if received < total and self._task_queue is task_queue:
+                    # Queued tasks would still spend quota on results nobody reads
+                    dropped = await loop.run_in_executor(None, _drain, task_queue)
+                    LOGGER.info("Stream abandoned", job_id=job_id, dropped=dropped)
+
+    async def create_many(
+        self, messages_list: list[list[dict[str, Any]]], **kwargs: Any
+    ) -> list[CompletionResponse]:
+        """Create multiple completions across the worker processes, in input order."""
+        results: list[CompletionResponse | None] = [None] * len(messages_list)
+        async for index, response in self.stream(messages_list, **kwargs):
+            results[index] = response
+        return results  # type: ignore[return-value]
+
+    def _get_result(self) -> tuple[int, int, CompletionResponse]:
+        while True:
+            try:
+                return self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                dead = [worker for worker in self._workers if not worker.is_alive()]
+                if dead:
+                    exit_codes = [worker.exitcode for worker in dead]
+                    # The queues may hold tasks of the dead worker; start over on next use
+                    self.terminate()
+                    raise RuntimeError(
+                        f"{len(dead)} worker process(es) exited unexpectedly "
+                        f"(exit codes: {exit_codes})"
+                    )
+
+
+def _drain(task_queue: Any) -> int:
+    """Take the tasks no worker has picked up yet off the queue, and return their count."""
+    dropped = 0
+    while True:
+        try:
+            task = task_queue.get_nowait()
+        except queue.Empty:
+            return dropped
+        if task is _STOP:
+            task_queue.put(_STOP)  # `close()` is shutting a worker down
+            return dropped
+        dropped += 1
+
+
+def _worker_main(
+    config: WorkerConfig,
+    task_queue: Any,
+    result_queue: Any,
+    request_limiter: SharedRateLimiter | None,
+    token_limiter: SharedRateLimiter | None,
+) -> None:
+    asyncio.run(_worker_loop(config, task_queue, result_queue, request_limiter, token_limiter))
+
+
+async def _worker_loop(
+    config: WorkerConfig,
+    task_queue: Any,
+    result_queue: Any,
+    request_limiter: SharedRateLimiter | None,
+    token_limiter: SharedRateLimiter | None,
+) -> None:
+    client = ConcurrentOpenAI(
+        client=config.client_factory() if config.client_factory else None,
+        api_key=config.api_key,
+        max_concurrent_requests=config.max_concurrent_requests,
+        token_safety_margin=config.token_safety_margin,
+        input_token_cost=config.input_token_cost,
+        output_token_cost=config.output_token_cost,
+        **config.client_options,
+    )
+    client.request_limiter = request_limiter
+    client.token_limiter = token_limiter
+
+    loop = asyncio.get_running_loop()
+    # Only pull as many tasks as this worker can run, so the others get their share
+    slots = asyncio.Semaphore(config.max_concurrent_requests)
+    in_flight: set[asyncio.Task] = set()
+
+    async def run(job_id: int, index: int, messages: list[dict[str, Any]], kwargs: dict) -> None:
+        try:
+            response = await client.create(messages=messages, **kwargs)
+        except Exception as e:
+            LOGGER.error("Worker failed to process request", error=str(e), index=index)
+            response_class = (
+                LeanCompletionResponse if kwargs.get("lean") else ConcurrentCompletionResponse
+            )
+            response = response_class(error=str(e), error_type=type(e).__name__)
+        finally:
+            slots.release()
+        result_queue.put((job_id, index, response))
+
+    while True:
+        await slots.acquire()
+        task = await loop.run_in_executor(None, task_queue.get)
+        if task is _STOP:
+            break
+        in_flight.add(asyncio.create_task(run(*task)))
+        in_flight = {t for t in in_flight if not t.done()}
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import Any, Iterator
+
+# Metric names emitted by the client and the rate limiters.
+REQUESTS = "requests"  # counter; labels: model, status
+ERRORS = "errors"  # counter; labels: model, error_type
+ESTIMATED_TOKENS = "estimated_tokens"  # counter; labels: model
+ACTUAL_TOKENS = "actual_tokens"  # counter; labels: model
+COST = "cost_usd"  # counter; labels: model
+IN_FLIGHT = "in_flight_requests"  # gauge
+CONCURRENCY_LIMIT = "concurrency_limit"  # gauge; labels: limiter
+LIMITER_TOKENS = "limiter_tokens"  # gauge; labels: limiter
+LIMITER_WAITERS = "limiter_waiters"  # gauge; labels: limiter
+LIMITER_WAIT = "limiter_wait_seconds"  # histogram; labels: limiter
+REQUEST_LATENCY = "request_latency_seconds"  # histogram; labels: model, stage
+
+CREATE_SPAN = "concurrent_openai.create"
+
+
+class Instrumentation:
+    """Instrumentation surface for the client and rate limiters.
+
+    The base class is a no-op; subclass it (or use one of the exporters below) to forward
+    counters, gauges, histograms and spans to a metrics backend.
+    """
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """Add `value` to a monotonically increasing counter."""
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """Set a gauge to `value`."""
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record a sample into a histogram."""
+
+    def span(self, name: str, **attributes: Any) -> AbstractContextManager[Any]:
+        """Return a context manager that traces the enclosed block."""
+        return nullcontext()
+
+
+class InMemoryInstrumentation(Instrumentation):
+    """Keeps every metric in memory. Handy for tests, benchmarks and debugging."""
+
+    def __init__(self) -> None:
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = defaultdict(float)
+        self.gauges: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self.observations: dict[tuple[str, tuple[tuple[str, str], ...]], list[float]] = defaultdict(
+            list
+        )
+        self.spans: list[tuple[str, dict[str, Any]]] = []
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        self.counters[name, tuple(sorted(labels.items()))] += value
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self.gauges[name, tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self.observations[name, tuple(sorted(labels.items()))].append(value)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[None]:
+        self.spans.append((name, attributes))
+        yield
+
+    def counter(self, name: str, **labels: str) -> float:
+        """Return the current value of a counter."""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def gauge(self, name: str, **labels: str) -> float | None:
+        """Return the last value of a gauge."""
+        return self.gauges.get((name, tuple(sorted(labels.items()))))
+
+
+class PrometheusInstrumentation(Instrumentation):
+    """Exports metrics through `prometheus_client`.
+
+    Metric objects are created lazily on first use, with label names taken from that call.
+    Spans are not supported by Prometheus and are ignored.
+    """
+
+    def __init__(self, registry: Any = None, namespace: str = "concurrent_openai") -> None:
+        try:
+            import prometheus_client
+        except ImportError as e:
+            raise ImportError(
+                "PrometheusInstrumentation requires `prometheus-client`. "
+                "Install it with `pip install prometheus-client`."
+            ) from e
+
+        self._prometheus = prometheus_client
+        self._registry = registry if registry is not None else prometheus_client.REGISTRY
+        self._namespace = namespace
+        self._metrics: dict[str, Any] = {}
+
+    def _metric(self, kind: str, name: str, labels: dict[str, str]) -> Any:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric_class = getattr(self._prometheus, kind)
+            metric = self._metrics[name] = metric_class(
+                name,
+                name.replace("_", " "),
+                labelnames=sorted(labels),
+                namespace=self._namespace,
+                registry=self._registry,
+            )
+        return metric.labels(**labels) if labels else metric
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        self._metric("Counter", name, labels).inc(value)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self._metric("Gauge", name, labels).set(value)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self._metric("Histogram", name, labels).observe(value)
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """Exports metrics and spans through the OpenTelemetry API.
+
+    Uses the global meter and tracer providers unless explicit `meter`/`tracer` are given.
+    """
+
+    def __init__(self, meter: Any = None, tracer: Any = None) -> None:
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryInstrumentation requires `opentelemetry-api`. "
+                "Install it with `pip install opentelemetry-api`."
+            ) from e
+
+        self._meter = meter if meter is not None else metrics.get_meter(__name__)
+        self._tracer = tracer if tracer is not None else trace.get_tracer(__name__)
+        self._instruments: dict[str, Any] = {}
+
+    def _instrument(self, factory: str, name: str) -> Any:
+        instrument = self._instruments.get(name)
+        if instrument is None:
+            instrument = self._instruments[name] = getattr(self._meter, factory)(name)
+        return instrument
+
+    def increment(self, name: str, value: float = 1.0, **labels: str) -> None:
+        self._instrument("create_counter", name).add(value, attributes=labels)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self._instrument("create_gauge", name).set(value, attributes=labels)
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self._instrument("create_histogram", name).record(value, attributes=labels)
+
+    def span(self, name: str, **attributes: Any) -> AbstractContextManager[Any]:
+        return self._tracer.start_as_current_span(name, attributes=attributes)
@@ -0,0 +1,24 @@
+from typing import Any
+
+
+class LazyLogger:
+    """A structlog logger that imports structlog on first use.
+
+    Keeps `import concurrent_openai` cheap; structlog is only loaded once something is logged.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._logger: Any = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._logger is None:
+            import structlog
+
+            self._logger = structlog.get_logger(self._name)
+        return getattr(self._logger, attr)
+
+
+def get_logger(name: str) -> LazyLogger:
+    """Return a logger for `name`, like `structlog.get_logger`."""
+    return LazyLogger(name)
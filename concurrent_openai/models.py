@@ -1,15 +1,134 @@
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable
 
-from openai.types.chat import ChatCompletion
+if TYPE_CHECKING:
+    from openai.types import CreateEmbeddingResponse
+    from openai.types.chat import ChatCompletion, ChatCompletionMessageToolCall
+    from openai.types.responses import Response
 
+STAGES = (
+    "semaphore",
+    "token_counting",
+    "budget",
+    "request_limiter",
+    "token_limiter",
+    "http",
+    "total",
+)
 
-@dataclass
+
+@dataclass(slots=True)
+class RequestTimings:
+    """
+    Monotonic timestamps recorded at each stage of a `create` call.
+
+    A timestamp of None means the stage was never reached (e.g. the request failed earlier).
+    0.0 is a valid timestamp, e.g. the start of a `VirtualClock`.
+    """
+
+    started: float | None = None
+    semaphore_acquired: float | None = None
+    tokens_counted: float | None = None
+    budget_admitted: float | None = None
+    request_limiter_acquired: float | None = None
+    token_limiter_acquired: float | None = None
+    response_received: float | None = None
+
+    @property
+    def semaphore_wait(self) -> float:
+        """Time spent waiting for a concurrency slot."""
+        return _elapsed(self.started, self.semaphore_acquired)
+
+    @property
+    def token_counting(self) -> float:
+        """Time spent estimating the request's tokens."""
+        return _elapsed(self.semaphore_acquired, self.tokens_counted)
+
+    @property
+    def budget_wait(self) -> float:
+        """Time spent waiting for budget admission."""
+        return _elapsed(self.tokens_counted, self.budget_admitted)
+
+    @property
+    def request_limiter_wait(self) -> float:
+        """Time spent waiting on the requests-per-minute limiter."""
+        return _elapsed(self.budget_admitted, self.request_limiter_acquired)
+
+    @property
+    def token_limiter_wait(self) -> float:
+        """Time spent waiting on the tokens-per-minute limiter."""
+        return _elapsed(self.request_limiter_acquired, self.token_limiter_acquired)
+
+    @property
+    def http(self) -> float:
+        """Time spent in the API call itself."""
+        return _elapsed(self.token_limiter_acquired, self.response_received)
+
+    @property
+    def total(self) -> float:
+        """Total time from entering `create` to the last recorded stage."""
+        reached = [
+            timestamp
+            for timestamp in (
+                self.semaphore_acquired,
+                self.tokens_counted,
+                self.budget_admitted,
+                self.request_limiter_acquired,
+                self.token_limiter_acquired,
+                self.response_received,
+            )
+            if timestamp is not None
+        ]
+        return _elapsed(self.started, max(reached, default=None))
+
+    def breakdown(self) -> dict[str, float]:
+        """Return the duration of every stage in seconds, keyed by stage name."""
+        return {
+            "semaphore": self.semaphore_wait,
+            "token_counting": self.token_counting,
+            "budget": self.budget_wait,
+            "request_limiter": self.request_limiter_wait,
+            "token_limiter": self.token_limiter_wait,
+            "http": self.http,
+            "total": self.total,
+        }
+
+    def completed_stages(self) -> dict[str, float]:
+        """Like `breakdown()`, but only for the stages the request actually got through.
+
+        Stages that were never reached are left out rather than reported as 0.0, so a request
+        that failed early does not drag the percentiles of later stages toward zero.
+        """
+        ends = {
+            "semaphore": self.semaphore_acquired,
+            "token_counting": self.tokens_counted,
+            "budget": self.budget_admitted,
+            "request_limiter": self.request_limiter_acquired,
+            "token_limiter": self.token_limiter_acquired,
+            "http": self.response_received,
+            "total": self.started,
+        }
+        return {
+            stage: duration
+            for stage, duration in self.breakdown().items()
+            if ends[stage] is not None
+        }
+
+
+def _elapsed(start: float | None, end: float | None) -> float:
+    if start is None or end is None:
+        return 0.0
+    return max(0.0, end - start)
+
+
+@dataclass(slots=True)
 class ConcurrentCompletionResponse:
     """
     Wrapper around OpenAI's response with concurrent-specific information.
     """
 
-    openai_response: ChatCompletion | None = None
+    openai_response: "ChatCompletion | None" = None
 
     # Library-specific metrics
     estimated_total_tokens: int = 0
@@ -17,6 +136,9 @@ class ConcurrentCompletionResponse:
     output_cost: float = 0.0
     # Error handling
     error: str | None = None
+    error_type: str | None = None
+    # Per-stage latency breakdown
+    timings: RequestTimings | None = None
 
     @property
     def content(self) -> str | None:
@@ -25,6 +147,212 @@ class ConcurrentCompletionResponse:
             return self.openai_response.choices[0].message.content
         return None
 
+    @property
+    def prompt_tokens(self) -> int:
+        """Number of prompt tokens reported by the API (0 if unavailable)."""
+        if self.openai_response and self.openai_response.usage:
+            return self.openai_response.usage.prompt_tokens
+        return 0
+
+    @property
+    def completion_tokens(self) -> int:
+        """Number of completion tokens reported by the API (0 if unavailable)."""
+        if self.openai_response and self.openai_response.usage:
+            return self.openai_response.usage.completion_tokens
+        return 0
+
+    @property
+    def cached_tokens(self) -> int:
+        """Number of prompt tokens served from the prompt cache (0 if unavailable)."""
+        if self.openai_response and self.openai_response.usage:
+            details = self.openai_response.usage.prompt_tokens_details
+            return (details.cached_tokens or 0) if details else 0
+        return 0
+
+    @property
+    def is_success(self) -> bool:
+        """Convenience accessor for request success."""
+        return self.error is None
+
+    @property
+    def total_cost(self) -> float:
+        return self.input_cost + self.output_cost
+
+
+@dataclass(slots=True)
+class LeanCompletionResponse:
+    """
+    Compact result returned in `lean` mode.
+
+    Keeps only the first choice's content, finish reason and tool calls together with usage
+    and cost, dropping the full `ChatCompletion` so large batches stay small in memory.
+    """
+
+    content: str | None = None
+    finish_reason: str | None = None
+    tool_calls: "list[ChatCompletionMessageToolCall] | None" = None
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    # Library-specific metrics
+    estimated_total_tokens: int = 0
+    input_cost: float = 0.0
+    output_cost: float = 0.0
+    # Error handling
+    error: str | None = None
+    error_type: str | None = None
+    # Per-stage latency breakdown
+    timings: RequestTimings | None = None
+
+    @classmethod
+    def from_completion(
+        cls,
+        completion: "ChatCompletion",
+        *,
+        estimated_total_tokens: int = 0,
+        input_cost: float = 0.0,
+        output_cost: float = 0.0,
+        error: str | None = None,
+        error_type: str | None = None,
+        timings: RequestTimings | None = None,
+    ) -> "LeanCompletionResponse":
+        """Build a lean response from a full `ChatCompletion`."""
+        content = finish_reason = tool_calls = None
+        if completion.choices:
+            choice = completion.choices[0]
+            content = choice.message.content
+            finish_reason = choice.finish_reason
+            tool_calls = choice.message.tool_calls
+
+        prompt_tokens = completion_tokens = cached_tokens = 0
+        if completion.usage:
+            prompt_tokens = completion.usage.prompt_tokens
+            completion_tokens = completion.usage.completion_tokens
+            details = completion.usage.prompt_tokens_details
+            cached_tokens = (details.cached_tokens or 0) if details else 0
+
+        return cls(
+            content=content,
+            finish_reason=finish_reason,
+            tool_calls=tool_calls,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+            estimated_total_tokens=estimated_total_tokens,
+            input_cost=input_cost,
+            output_cost=output_cost,
+            error=error,
+            error_type=error_type,
+            timings=timings,
+        )
+
+    @property
+    def is_success(self) -> bool:
+        """Convenience accessor for request success."""
+        return self.error is None
+
+    @property
+    def total_cost(self) -> float:
+        return self.input_cost + self.output_cost
+
+
+CompletionResponse = ConcurrentCompletionResponse | LeanCompletionResponse
+
+
+@dataclass(slots=True)
+class ConcurrentEmbeddingResponse:
+    """
+    Embeddings for one or more inputs with concurrent-specific information.
+
+    `embeddings` is in input order. Responses fanned out by the `EmbeddingBatcher` hold a
+    single embedding and a share of the batch's usage and cost, so `openai_response` is None.
+    """
+
+    embeddings: list[list[float]] = field(default_factory=list)
+    openai_response: "CreateEmbeddingResponse | None" = None
+    prompt_tokens: int = 0
+
+    # Library-specific metrics
+    estimated_total_tokens: int = 0
+    input_cost: float = 0.0
+    # Error handling
+    error: str | None = None
+    error_type: str | None = None
+    # Per-stage latency breakdown
+    timings: RequestTimings | None = None
+
+    @property
+    def embedding(self) -> list[float] | None:
+        """Convenience accessor for the first (or only) embedding."""
+        return self.embeddings[0] if self.embeddings else None
+
+    @property
+    def completion_tokens(self) -> int:
+        return 0
+
+    @property
+    def output_cost(self) -> float:
+        return 0.0
+
+    @property
+    def is_success(self) -> bool:
+        """Convenience accessor for request success."""
+        return self.error is None
+
+    @property
+    def total_cost(self) -> float:
+        return self.input_cost
+
+
+@dataclass(slots=True)
+class ConcurrentResponse:
+    """
+    Wrapper around a Responses API `Response` with concurrent-specific information.
+    """
+
+    openai_response: "Response | None" = None
+
+    # Library-specific metrics
+    estimated_total_tokens: int = 0
+    input_cost: float = 0.0
+    output_cost: float = 0.0
+    # Error handling
+    error: str | None = None
+    error_type: str | None = None
+    # Per-stage latency breakdown
+    timings: RequestTimings | None = None
+
+    @property
+    def content(self) -> str | None:
+        """Convenience accessor for the aggregated output text."""
+        if self.openai_response:
+            return self.openai_response.output_text
+        return None
+
+    @property
+    def prompt_tokens(self) -> int:
+        """Number of input tokens reported by the API (0 if unavailable)."""
+        if self.openai_response and self.openai_response.usage:
+            return self.openai_response.usage.input_tokens
+        return 0
+
+    @property
+    def completion_tokens(self) -> int:
+        """Number of output tokens reported by the API (0 if unavailable)."""
+        if self.openai_response and self.openai_response.usage:
+            return self.openai_response.usage.output_tokens
+        return 0
+
+    @property
+    def cached_tokens(self) -> int:
+        """Number of input tokens served from the prompt cache (0 if unavailable)."""
+        if self.openai_response and self.openai_response.usage:
+            details = self.openai_response.usage.input_tokens_details
+            return (details.cached_tokens or 0) if details else 0
+        return 0
+
     @property
     def is_success(self) -> bool:
         """Convenience accessor for request success."""
@@ -35,6 +363,82 @@ class ConcurrentCompletionResponse:
         return self.input_cost + self.output_cost
 
 
+class UsageTable:
+    """Columnar, `array`-backed usage and cost table for whole-batch aggregation.
+
+    Each row corresponds to one completion response. Storing the numbers in typed arrays
+    costs a few bytes per row instead of a Python object per value.
+    """
+
+    __slots__ = (
+        "prompt_tokens",
+        "completion_tokens",
+        "cached_tokens",
+        "estimated_total_tokens",
+        "input_cost",
+        "output_cost",
+        "success",
+    )
+
+    def __init__(self) -> None:
+        self.prompt_tokens = array("q")
+        self.completion_tokens = array("q")
+        self.cached_tokens = array("q")
+        self.estimated_total_tokens = array("q")
+        self.input_cost = array("d")
+        self.output_cost = array("d")
+        self.success = array("b")
+
+    @classmethod
+    def from_responses(cls, responses: Iterable[CompletionResponse]) -> "UsageTable":
+        """Pack the usage of the given responses into a new table."""
+        table = cls()
+        table.extend(responses)
+        return table
+
+    def append(self, response: CompletionResponse) -> None:
+        """Append the usage of a single response."""
+        self.prompt_tokens.append(response.prompt_tokens)
+        self.completion_tokens.append(response.completion_tokens)
+        self.cached_tokens.append(response.cached_tokens)
+        self.estimated_total_tokens.append(response.estimated_total_tokens)
+        self.input_cost.append(response.input_cost)
+        self.output_cost.append(response.output_cost)
+        self.success.append(response.is_success)
+
+    def extend(self, responses: Iterable[CompletionResponse]) -> None:
+        """Append the usage of several responses."""
+        for response in responses:
+            self.append(response)
+
+    def __len__(self) -> int:
+        return len(self.prompt_tokens)
+
+    @property
+    def total_prompt_tokens(self) -> int:
+        return sum(self.prompt_tokens)
+
+    @property
+    def total_completion_tokens(self) -> int:
+        return sum(self.completion_tokens)
+
+    @property
+    def total_cached_tokens(self) -> int:
+        return sum(self.cached_tokens)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.total_prompt_tokens + self.total_completion_tokens
+
+    @property
+    def total_cost(self) -> float:
+        return sum(self.input_cost) + sum(self.output_cost)
+
+    @property
+    def error_count(self) -> int:
+        return len(self.success) - sum(self.success)
+
+
 @dataclass
 class ModelTokenSettings:
     # Message-related settings
@@ -48,3 +452,16 @@ class ModelTokenSettings:
     tokens_per_enum_start: int
     tokens_per_enum_item: int
     tokens_per_function_end: int
+
+
+@dataclass(slots=True)
+class EncodedMessage:
+    """A chat message with its token count and the token ids of its text content.
+
+    `texts` maps the position of each text in `content` (None for a string content, else the
+    index of the part) to its token ids, so the prompt can be trimmed without re-encoding it.
+    """
+
+    message: dict[str, Any]
+    num_tokens: int
+    texts: dict[int | None, list[int]] = field(default_factory=dict)
@@ -0,0 +1,96 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .log import get_logger
+
+LOGGER = get_logger(__name__)
+
+_PER_MILLION = 1 / 1_000_000
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    """USD cost per token for a model."""
+
+    input: float
+    output: float = 0.0
+    cached_input: float | None = None
+
+    def input_cost(self, input_tokens: int, cached_tokens: int = 0) -> float:
+        """Cost of `input_tokens`, of which `cached_tokens` were served from the prompt cache."""
+        cached_price = self.cached_input if self.cached_input is not None else self.input
+        return (input_tokens - cached_tokens) * self.input + cached_tokens * cached_price
+
+
+# Prices in USD per 1M tokens, see https://openai.com/api/pricing/.
+# Keys are model names; dated snapshots of a model (e.g. "gpt-4o-2024-08-06") share its price.
+MODEL_PRICING: dict[str, ModelPricing] = {
+    "gpt-3.5-turbo": ModelPricing(input=0.50 * _PER_MILLION, output=1.50 * _PER_MILLION),
+    "gpt-35-turbo": ModelPricing(input=0.50 * _PER_MILLION, output=1.50 * _PER_MILLION),
+    "gpt-3.5-turbo-16k": ModelPricing(input=3.00 * _PER_MILLION, output=4.00 * _PER_MILLION),
+    "gpt-4": ModelPricing(input=30.00 * _PER_MILLION, output=60.00 * _PER_MILLION),
+    "gpt-4-32k": ModelPricing(input=60.00 * _PER_MILLION, output=120.00 * _PER_MILLION),
+    "gpt-4-turbo": ModelPricing(input=10.00 * _PER_MILLION, output=30.00 * _PER_MILLION),
+    "gpt-4-turbo-preview": ModelPricing(input=10.00 * _PER_MILLION, output=30.00 * _PER_MILLION),
+    "gpt-4.5-preview": ModelPricing(
+        input=75.00 * _PER_MILLION, output=150.00 * _PER_MILLION, cached_input=37.50 * _PER_MILLION
+    ),
+    "gpt-4o": ModelPricing(
+        input=2.50 * _PER_MILLION, output=10.00 * _PER_MILLION, cached_input=1.25 * _PER_MILLION
+    ),
+    "chatgpt-4o-latest": ModelPricing(input=5.00 * _PER_MILLION, output=15.00 * _PER_MILLION),
+    "gpt-4o-mini": ModelPricing(
+        input=0.15 * _PER_MILLION, output=0.60 * _PER_MILLION, cached_input=0.075 * _PER_MILLION
+    ),
+    "gpt-4.1": ModelPricing(
+        input=2.00 * _PER_MILLION, output=8.00 * _PER_MILLION, cached_input=0.50 * _PER_MILLION
+    ),
+    "gpt-4.1-mini": ModelPricing(
+        input=0.40 * _PER_MILLION, output=1.60 * _PER_MILLION, cached_input=0.10 * _PER_MILLION
+    ),
+    "gpt-4.1-nano": ModelPricing(
+        input=0.10 * _PER_MILLION, output=0.40 * _PER_MILLION, cached_input=0.025 * _PER_MILLION
+    ),
+    "o1": ModelPricing(
+        input=15.00 * _PER_MILLION, output=60.00 * _PER_MILLION, cached_input=7.50 * _PER_MILLION
+    ),
+    "o1-preview": ModelPricing(
+        input=15.00 * _PER_MILLION, output=60.00 * _PER_MILLION, cached_input=7.50 * _PER_MILLION
+    ),
+    "o1-pro": ModelPricing(input=150.00 * _PER_MILLION, output=600.00 * _PER_MILLION),
+    "o1-mini": ModelPricing(
+        input=1.10 * _PER_MILLION, output=4.40 * _PER_MILLION, cached_input=0.55 * _PER_MILLION
+    ),
+    "o3": ModelPricing(
+        input=2.00 * _PER_MILLION, output=8.00 * _PER_MILLION, cached_input=0.50 * _PER_MILLION
+    ),
+    "o3-pro": ModelPricing(input=20.00 * _PER_MILLION, output=80.00 * _PER_MILLION),
+    "o3-mini": ModelPricing(
+        input=1.10 * _PER_MILLION, output=4.40 * _PER_MILLION, cached_input=0.55 * _PER_MILLION
+    ),
+    "o4-mini": ModelPricing(
+        input=1.10 * _PER_MILLION, output=4.40 * _PER_MILLION, cached_input=0.275 * _PER_MILLION
+    ),
+    "text-embedding-3-small": ModelPricing(input=0.02 * _PER_MILLION),
+    "text-embedding-3-large": ModelPricing(input=0.13 * _PER_MILLION),
+    "text-embedding-ada-002": ModelPricing(input=0.10 * _PER_MILLION),
+}
+
+
+# A dated snapshot of a model: "-2024-08-06", or "-0613" for older models
+_SNAPSHOT_SUFFIX = re.compile(r"-(\d{4}-\d{2}-\d{2}|\d{4})$")
+
+
+@lru_cache(maxsize=None)
+def get_model_pricing(model: str) -> ModelPricing | None:
+    """Get the pricing for a given model, by its exact name or that of its dated snapshot.
+
+    Anything else is unknown, rather than priced like a model it merely starts with: variants
+    such as "-pro" or "-32k" cost many times their base model. Results are cached, so
+    `MODEL_PRICING` should be updated before the first lookup.
+    """
+    pricing = MODEL_PRICING.get(model) or MODEL_PRICING.get(_SNAPSHOT_SUFFIX.sub("", model))
+    if pricing is None:
+        LOGGER.warning("Model pricing not found.", model=model)
+    return pricing
@@ -1,10 +1,25 @@
 import asyncio
-import time
-from typing import Optional
+import atexit
+import json
+import math
+import multiprocessing
+import os
+import weakref
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterable, Optional
 
-import structlog
+from .clock import SYSTEM_CLOCK, Clock
+from .exceptions import DeadlineExceededError
+from .instrumentation import (
+    LIMITER_TOKENS,
+    LIMITER_WAIT,
+    LIMITER_WAITERS,
+    Instrumentation,
+)
+from .log import get_logger
 
-LOGGER = structlog.get_logger(__name__)
+LOGGER = get_logger(__name__)
 
 
 class RateLimiter:
@@ -17,6 +32,7 @@ class RateLimiter:
         capacity: Maximum number of tokens that can accumulate (burst limit)
         fill_rate: Number of tokens added per second (steady-state rate)
         minimum_spacing: Minimal time in seconds between requests
+        name: Label used for logs and metrics
     """
 
     def __init__(
@@ -24,6 +40,14 @@ class RateLimiter:
         capacity: float,
         fill_rate: float,
         minimum_spacing: float = 0.0,
+        *,
+        name: str = "rate_limiter",
+        instrumentation: Instrumentation | None = None,
+        low_tokens_warning_interval: float = 10.0,
+        initial_tokens: float | None = None,
+        state_file: str | os.PathLike[str] | None = None,
+        save_interval: float = 30.0,
+        clock: Clock | None = None,
     ) -> None:
         """Initialize the rate limiter.
 
@@ -32,9 +56,22 @@ class RateLimiter:
             fill_rate: Number of tokens added per second (steady-state rate)
             minimum_spacing: Minimal time in seconds between requests.
                            Set to 0.0 (default) to allow bursting up to capacity.
+            name: Label used for logs and metrics
+            instrumentation: Receives bucket level, waiter and wait-time metrics (optional)
+            low_tokens_warning_interval: Minimum time in seconds between two
+                           "Token bucket running low" warnings
+            initial_tokens: Tokens in the bucket at start (defaults to a full bucket). A
+                           lower value (e.g. 0) avoids a burst of a full bucket on top of
+                           what a previous process already spent
+            state_file: JSON file the bucket state is restored from at start (if it
+                           exists) and saved to every `save_interval` seconds and at exit
+            save_interval: Minimum time in seconds between two periodic saves
+            clock: Time source for refills and waits (optional, defaults to the system
+                           clock)
 
         Raises:
-            ValueError: If capacity, fill_rate or minimum_spacing are negative
+            ValueError: If capacity, fill_rate or minimum_spacing are negative, or
+                initial_tokens is not between 0 and capacity
         """
         if capacity <= 0:
             raise ValueError("Capacity must be positive")
@@ -42,16 +79,34 @@ class RateLimiter:
             raise ValueError("Fill rate must be positive")
         if minimum_spacing < 0:
             raise ValueError("Minimum spacing cannot be negative")
+        if initial_tokens is not None and not 0 <= initial_tokens <= capacity:
+            raise ValueError("Initial tokens must be between 0 and the capacity")
 
+        self._clock = clock or SYSTEM_CLOCK
         self._capacity = capacity
-        self._tokens = capacity
+        self._tokens = capacity if initial_tokens is None else initial_tokens
         self._fill_rate = fill_rate
         self._minimum_spacing = minimum_spacing
 
-        self._last_refill_time = time.monotonic()
+        self._last_refill_time = self._clock.monotonic()
         self._last_request_time: Optional[float] = None
         self._lock = asyncio.Lock()
 
+        self.name = name
+        self._instrumentation = instrumentation or Instrumentation()
+        self._waiters = 0
+
+        self._low_tokens_warning_interval = low_tokens_warning_interval
+        self._last_low_tokens_warning: Optional[float] = None
+        self._suppressed_low_tokens_warnings = 0
+
+        self._state_file = Path(state_file) if state_file is not None else None
+        self._save_interval = save_interval
+        self._last_saved = self._clock.monotonic()
+        if self._state_file is not None:
+            self._load_state_file()
+            _save_at_exit(self)
+
     @property
     def capacity(self) -> float:
         """Maximum number of tokens that can accumulate."""
@@ -72,23 +127,170 @@ class RateLimiter:
         """Minimum time required between requests."""
         return self._minimum_spacing
 
-    async def acquire(self, tokens: float = 1.0) -> None:
+    @property
+    def state_file(self) -> Path | None:
+        """File the bucket state is persisted to, if any."""
+        return self._state_file
+
+    @property
+    def waiters(self) -> int:
+        """Number of callers currently waiting in `acquire`."""
+        return self._waiters
+
+    async def acquire(self, tokens: float = 1.0, *, deadline: float | None = None) -> None:
+        """Wait until `tokens` are available and take them.
+
+        Args:
+            tokens: Number of tokens to take
+            deadline: Timestamp on the limiter's clock (`time.monotonic()` by default) by
+                which the tokens must be acquired
+                (optional). If the computed wait would end past it, `DeadlineExceededError`
+                is raised right away instead of sleeping.
+
+        Raises:
+            ValueError: If tokens is not positive or exceeds the bucket capacity
+            DeadlineExceededError: If the tokens cannot be acquired before `deadline`
+        """
         if tokens <= 0:
             raise ValueError("Number of tokens must be positive")
         if tokens > self.capacity:
             raise ValueError("Requested tokens cannot exceed the bucket capacity")
 
-        while True:
-            async with self._lock:
-                now = time.monotonic()
-                wait_time = self._calculate_wait_time(now, tokens)
+        started = self._clock.monotonic()
+        waiting = False
+        try:
+            while True:
+                async with self._lock:
+                    now = self._clock.monotonic()
+                    wait_time = self._try_acquire(now, tokens)
+
+                    if wait_time <= 0:
+                        self._instrumentation.set_gauge(
+                            LIMITER_TOKENS, self._tokens, limiter=self.name
+                        )
+                        self._instrumentation.observe(
+                            LIMITER_WAIT, now - started, limiter=self.name
+                        )
+                        if (
+                            self._state_file is not None
+                            and now - self._last_saved >= self._save_interval
+                        ):
+                            self.save()
+                        return
 
-                if wait_time <= 0:
-                    self._tokens -= tokens
-                    self._last_request_time = now
-                    return
+                if deadline is not None and now + wait_time > deadline:
+                    raise DeadlineExceededError(
+                        f"{self.name} limiter needs {wait_time:.2f}s for {tokens:g} tokens, "
+                        f"past the request's deadline"
+                    )
 
-            await asyncio.sleep(wait_time)
+                if not waiting:
+                    waiting = True
+                    self._set_waiters(self._waiters + 1)
+
+                await self._clock.sleep(wait_time)
+        finally:
+            if waiting:
+                self._set_waiters(self._waiters - 1)
+
+    def release(self, tokens: float) -> None:
+        """Return `tokens` taken by `acquire` for a request that was never sent."""
+        if tokens <= 0:
+            raise ValueError("Number of tokens must be positive")
+        self._refund(tokens)
+        self._instrumentation.set_gauge(LIMITER_TOKENS, self._tokens, limiter=self.name)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the bucket state in a JSON-serializable form, for `restore`.
+
+        Timestamps are converted to wall-clock time, so the state can be restored by
+        another process, e.g. after a restart.
+        """
+        now = self._clock.monotonic()
+        wall_now = self._clock.time()
+        last_request = self._last_request_time
+        return {
+            "name": self.name,
+            "capacity": self._capacity,
+            "fill_rate": self._fill_rate,
+            "tokens": self._tokens,
+            "last_refill_at": wall_now - (now - self._last_refill_time),
+            "last_request_at": None if last_request is None else wall_now - (now - last_request),
+            "saved_at": wall_now,
+        }
+
+    def restore(self, state: dict[str, Any]) -> None:
+        """Continue from a state returned by `snapshot`.
+
+        Tokens refilled since the snapshot are added as usual. If the capacity was lowered
+        since, the bucket level is capped at the new capacity.
+        """
+        now = self._clock.monotonic()
+        wall_now = self._clock.time()
+        last_request_at = state.get("last_request_at")
+        self._set_state(
+            tokens=min(self._capacity, max(0.0, float(state["tokens"]))),
+            last_refill_time=now - max(0.0, wall_now - float(state["last_refill_at"])),
+            last_request_time=(
+                None
+                if last_request_at is None
+                else now - max(0.0, wall_now - float(last_request_at))
+            ),
+        )
+        self._refill(now)
+
+    def save(self, path: str | os.PathLike[str] | None = None) -> None:
+        """Write `snapshot()` to `path` (defaults to `state_file`), atomically."""
+        path = Path(path) if path is not None else self._state_file
+        if path is None:
+            raise ValueError("No state file configured")
+
+        temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            temporary.write_text(json.dumps(self.snapshot()))
+            os.replace(temporary, path)
+        except OSError as e:
+            LOGGER.warning("Failed to save rate limiter state", limiter=self.name, error=str(e))
+        self._last_saved = self._clock.monotonic()
+
+    def _load_state_file(self) -> None:
+        assert self._state_file is not None
+        try:
+            state = json.loads(self._state_file.read_text())
+            self.restore(state)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            LOGGER.warning(
+                "Ignoring unreadable rate limiter state",
+                limiter=self.name,
+                path=str(self._state_file),
+                error=str(e),
+            )
+            return
+        LOGGER.info("Rate limiter state restored", limiter=self.name, tokens=self._tokens)
+
+    def _set_state(
+        self, *, tokens: float, last_refill_time: float, last_request_time: Optional[float]
+    ) -> None:
+        self._tokens = tokens
+        self._last_refill_time = last_refill_time
+        self._last_request_time = last_request_time
+
+    def _refund(self, tokens: float) -> None:
+        self._tokens = min(self._capacity, self._tokens + tokens)
+
+    def _try_acquire(self, now: float, tokens: float) -> float:
+        """Take `tokens` if allowed and return 0, otherwise return the time to wait."""
+        wait_time = self._calculate_wait_time(now, tokens)
+        if wait_time <= 0:
+            self._tokens -= tokens
+            self._last_request_time = now
+        return wait_time
+
+    def _set_waiters(self, waiters: int) -> None:
+        self._waiters = waiters
+        self._instrumentation.set_gauge(LIMITER_WAITERS, waiters, limiter=self.name)
 
     def _calculate_wait_time(self, now: float, requested_tokens: float) -> float:
         wait_time = 0.0
@@ -123,12 +325,27 @@ class RateLimiter:
             self._last_refill_time = now
 
             if self._tokens < (self._capacity * 0.05):
-                LOGGER.warning(
-                    "Token bucket running low",
-                    current_tokens=self._tokens,
-                    capacity=self._capacity,
-                    fill_rate=self._fill_rate,
-                )
+                self._warn_low_tokens(now)
+
+    def _warn_low_tokens(self, now: float) -> None:
+        """Log that the bucket is running low, at most once per warning interval."""
+        if (
+            self._last_low_tokens_warning is not None
+            and now - self._last_low_tokens_warning < self._low_tokens_warning_interval
+        ):
+            self._suppressed_low_tokens_warnings += 1
+            return
+
+        LOGGER.warning(
+            "Token bucket running low",
+            limiter=self.name,
+            current_tokens=self._tokens,
+            capacity=self._capacity,
+            fill_rate=self._fill_rate,
+            suppressed_warnings=self._suppressed_low_tokens_warnings,
+        )
+        self._last_low_tokens_warning = now
+        self._suppressed_low_tokens_warnings = 0
 
     def __repr__(self) -> str:
         """Return string representation of the rate limiter."""
@@ -138,3 +355,331 @@ class RateLimiter:
             f"minimum_spacing={self._minimum_spacing}, "
             f"current_tokens={self._tokens:.2f})"
         )
+
+
+class SharedRateLimiter(RateLimiter):
+    """A token bucket whose state lives in shared memory, so that several processes enforce
+    a single global rate.
+
+    The bucket level and timestamps are stored in a `multiprocessing` array guarded by a
+    process lock. Pass the limiter to worker processes when they are started (as a `Process`
+    argument); each process then waits on the same bucket. Relies on `time.monotonic()`
+    being consistent across processes, which holds on a single host.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        fill_rate: float,
+        minimum_spacing: float = 0.0,
+        *,
+        mp_context: Any = None,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the shared rate limiter.
+
+        Args:
+            capacity: Maximum number of tokens that can accumulate (burst limit)
+            fill_rate: Number of tokens added per second (steady-state rate)
+            minimum_spacing: Minimal time in seconds between requests
+            mp_context: `multiprocessing` context used to allocate the shared state
+                (defaults to the global context)
+            **kwargs: Additional keyword arguments passed to `RateLimiter`
+        """
+        context = mp_context or multiprocessing
+        # tokens, last refill time, last request time (NaN when unset)
+        self._state = context.Array("d", 3, lock=False)
+        self._process_lock = context.Lock()
+        super().__init__(capacity, fill_rate, minimum_spacing, **kwargs)
+
+    @property  # type: ignore[override]
+    def _tokens(self) -> float:
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value: float) -> None:
+        self._state[0] = value
+
+    @property  # type: ignore[override]
+    def _last_refill_time(self) -> float:
+        return self._state[1]
+
+    @_last_refill_time.setter
+    def _last_refill_time(self, value: float) -> None:
+        self._state[1] = value
+
+    @property  # type: ignore[override]
+    def _last_request_time(self) -> Optional[float]:
+        value = self._state[2]
+        return None if math.isnan(value) else value
+
+    @_last_request_time.setter
+    def _last_request_time(self, value: Optional[float]) -> None:
+        self._state[2] = math.nan if value is None else value
+
+    def _try_acquire(self, now: float, tokens: float) -> float:
+        with self._process_lock:
+            return super()._try_acquire(now, tokens)
+
+    def _refund(self, tokens: float) -> None:
+        with self._process_lock:
+            super()._refund(tokens)
+
+    def _set_state(
+        self, *, tokens: float, last_refill_time: float, last_request_time: Optional[float]
+    ) -> None:
+        with self._process_lock:
+            super()._set_state(
+                tokens=tokens,
+                last_refill_time=last_refill_time,
+                last_request_time=last_request_time,
+            )
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        # Process-local objects are recreated on the other side
+        del state["_lock"]
+        del state["_instrumentation"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = asyncio.Lock()
+        self._instrumentation = Instrumentation()
+
+
+class BurstPolicy:
+    """Decides how much of a sliding window's quota may be spent in a short burst.
+
+    The base policy allows the whole quota at once. Subclass it and override `limits` to
+    add caps over shorter intervals.
+    """
+
+    def limits(self, quota: float, window: float) -> list[tuple[float, float]]:
+        """Return extra `(quota, interval)` caps, each enforced over a sliding `interval`.
+
+        Args:
+            quota: The limiter's quota per window
+            window: Length of the limiter's window in seconds
+        """
+        return []
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class MaxBurst(BurstPolicy):
+    """Allow at most `fraction` of the window quota within any `interval` seconds."""
+
+    def __init__(self, fraction: float = 0.25, interval: float = 5.0) -> None:
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be in (0, 1]")
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.fraction = fraction
+        self.interval = interval
+
+    def limits(self, quota: float, window: float) -> list[tuple[float, float]]:
+        return [(quota * self.fraction, self.interval)]
+
+    def __repr__(self) -> str:
+        return f"MaxBurst(fraction={self.fraction}, interval={self.interval})"
+
+
+class QuantizedBurst(MaxBurst):
+    """Spread the quota evenly over `interval`-second slices of the window.
+
+    Matches servers that enforce a per-minute limit in smaller slices, e.g. 600 RPM as
+    10 requests per second.
+    """
+
+    def __init__(self, interval: float = 1.0) -> None:
+        super().__init__(fraction=1.0, interval=interval)
+
+    def limits(self, quota: float, window: float) -> list[tuple[float, float]]:
+        return [(quota * min(1.0, self.interval / window), self.interval)]
+
+    def __repr__(self) -> str:
+        return f"QuantizedBurst(interval={self.interval})"
+
+
+class SlidingWindowRateLimiter(RateLimiter):
+    """A rate limiter that tracks actual spend over a sliding window.
+
+    Unlike the token bucket, which refills continuously and is usually paired with a
+    minimum spacing, this limiter admits a request whenever the spend over the last `window`
+    seconds plus the request's cost fits in `quota`, the way per-minute quotas are
+    accounted upstream. An idle quota can therefore be used in a burst; `burst_policy`
+    controls how much of it.
+
+    Spend is kept as a ring buffer of `[timestamp, cost]` entries that expire after
+    `window` plus `skew` seconds.
+
+    Attributes:
+        window: Length of the window in seconds
+        skew: Seconds spend is kept past the window
+        burst_policy: Caps on spending within shorter intervals
+    """
+
+    def __init__(
+        self,
+        quota: float,
+        window: float = 60.0,
+        *,
+        burst_policy: BurstPolicy | None = None,
+        skew: float = 0.0,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the sliding window rate limiter.
+
+        Args:
+            quota: Maximum spend over any `window` seconds
+            window: Length of the window in seconds
+            burst_policy: Caps on spending within shorter intervals (optional, defaults
+                to allowing the whole quota at once)
+            skew: Seconds spend is kept past the window, covering the delay between
+                admitting a request and the server receiving it (whose clock starts the
+                server's window)
+            **kwargs: Additional keyword arguments passed to `RateLimiter` (e.g. `name`,
+                `initial_tokens` or `state_file`)
+        """
+        if window <= 0:
+            raise ValueError("Window must be positive")
+        if skew < 0:
+            raise ValueError("skew cannot be negative")
+
+        self.window = window
+        self.skew = skew
+        self.burst_policy = burst_policy or BurstPolicy()
+        self._events: deque[list[float]] = deque()
+        self._spent = 0.0
+        self._burst_limits = self.burst_policy.limits(quota, window)
+        super().__init__(quota, quota / window, **kwargs)
+
+    @property  # type: ignore[override]
+    def _tokens(self) -> float:
+        self._expire(self._clock.monotonic())
+        return self._capacity - self._spent
+
+    @_tokens.setter
+    def _tokens(self, value: float) -> None:
+        # Only set at start: a partially filled quota counts as spent just now
+        self._events.clear()
+        self._spent = 0.0
+        if value < self._capacity:
+            self._record(self._clock.monotonic(), self._capacity - value)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the spend in the current window in a JSON-serializable form."""
+        now = self._clock.monotonic()
+        wall_now = self._clock.time()
+        self._expire(now)
+        return {
+            "name": self.name,
+            "capacity": self._capacity,
+            "window": self.window,
+            "events": [[wall_now - (now - timestamp), cost] for timestamp, cost in self._events],
+            "saved_at": wall_now,
+        }
+
+    def restore(self, state: dict[str, Any]) -> None:
+        """Continue from a state returned by `snapshot`; expired spend is dropped."""
+        now = self._clock.monotonic()
+        wall_now = self._clock.time()
+        self._events.clear()
+        self._spent = 0.0
+        for wall_time, cost in state["events"]:
+            self._record(now - max(0.0, wall_now - float(wall_time)), float(cost))
+        self._expire(now)
+
+    def _try_acquire(self, now: float, tokens: float) -> float:
+        self._expire(now)
+        wait_time = self._wait_for(
+            self._events, self._spent, now, tokens, self._capacity, self.window + self.skew
+        )
+
+        for quota, interval in self._burst_limits:
+            recent: list[list[float]] = []
+            for event in reversed(self._events):
+                if event[0] <= now - interval:
+                    break
+                recent.append(event)
+            recent.reverse()
+            spent = sum(cost for _, cost in recent)
+            wait_time = max(wait_time, self._wait_for(recent, spent, now, tokens, quota, interval))
+
+        if wait_time <= 0:
+            self._record(now, tokens)
+            if self._capacity - self._spent < self._capacity * 0.05:
+                self._warn_low_tokens(now)
+        return wait_time
+
+    def _refund(self, tokens: float) -> None:
+        # Take the refund off the newest entries, which belong to the unsent request or to
+        # requests admitted after it
+        while tokens > 0 and self._events:
+            event = self._events[-1]
+            refunded = min(tokens, event[1])
+            event[1] -= refunded
+            self._spent -= refunded
+            tokens -= refunded
+            if event[1] <= 0:
+                self._events.pop()
+
+    def _record(self, timestamp: float, cost: float) -> None:
+        self._events.append([timestamp, cost])
+        self._spent += cost
+
+    def _expire(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.window - self.skew:
+            self._spent -= self._events.popleft()[1]
+        if not self._events:
+            self._spent = 0.0
+
+    @staticmethod
+    def _wait_for(
+        events: Iterable[list[float]],
+        spent: float,
+        now: float,
+        cost: float,
+        quota: float,
+        interval: float,
+    ) -> float:
+        """Time until `cost` fits in `quota` over `interval`, given the events in it."""
+        # A request larger than a burst cap is let through once the interval is empty
+        excess = min(spent, spent + cost - quota)
+        if excess <= 0:
+            return 0.0
+
+        freed = 0.0
+        for timestamp, event_cost in events:
+            freed += event_cost
+            if freed >= excess:
+                return timestamp + interval - now
+        return 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"SlidingWindowRateLimiter(quota={self._capacity}, window={self.window}, "
+            f"burst_policy={self.burst_policy!r}, available={self._tokens:.2f})"
+        )
+
+
+def limiter_state_file(state_dir: str | os.PathLike[str] | None, name: str) -> Path | None:
+    """Path of the state file for the limiter `name` in `state_dir` (created if missing)."""
+    if state_dir is None:
+        return None
+    Path(state_dir).mkdir(parents=True, exist_ok=True)
+    return Path(state_dir) / f"{name}_limiter.json"
+
+
+def _save_at_exit(limiter: RateLimiter) -> None:
+    """Save the limiter's state when the interpreter exits, unless it was collected before."""
+    reference = weakref.ref(limiter)
+
+    def save() -> None:
+        limiter = reference()
+        if limiter is not None:
+            limiter.save()
+
+    atexit.register(save)
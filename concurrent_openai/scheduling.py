@@ -0,0 +1,70 @@
+import hashlib
+import json
+from typing import Any, Iterable
+
+from .models import EncodedMessage
+
+# OpenAI only caches prompts of at least 1024 tokens, and looks them up by their leading tokens
+PREFIX_CACHE_TOKENS = 1024
+
+
+def prefix_key(
+    encoded: list[EncodedMessage],
+    prefix_tokens: int = PREFIX_CACHE_TOKENS,
+    tools: list[dict[str, Any]] | None = None,
+    tool_tokens: int = 0,
+) -> str | None:
+    """
+    Hash the leading tokens of an encoded chat prompt.
+
+    Prompts with the same key start with the same `prefix_tokens` tokens of tool
+    definitions, role and text content, so they can be served from the same prompt cache
+    entry. Content without text (e.g. images) is not part of the key.
+
+    Args:
+        encoded: The prompt's messages, as returned by `encode_messages`
+        prefix_tokens: Number of leading tokens hashed
+        tools: The request's tool definitions, which precede the messages in the prompt
+        tool_tokens: Number of tokens of `tools`, as returned by `count_function_tokens`
+
+    Returns:
+        str | None: The key, or None if the prompt is too short to be cached
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = prefix_tokens
+    if tools:
+        digest.update(json.dumps(tools, sort_keys=True, default=str).encode())
+        remaining -= tool_tokens
+        if remaining <= 0:
+            return digest.hexdigest()
+    for message in encoded:
+        digest.update(str(message.message.get("role")).encode())
+        # String content is keyed by None, list content parts by their index
+        for position in sorted(
+            message.texts, key=lambda position: -1 if position is None else position
+        ):
+            tokens = message.texts[position][:remaining]
+            digest.update(b"\x00" + b"".join(token.to_bytes(4, "little") for token in tokens))
+            remaining -= len(tokens)
+            if remaining <= 0:
+                return digest.hexdigest()
+    return None
+
+
+def prefix_order(keys: Iterable[str | None]) -> list[int]:
+    """
+    Order requests so that those sharing a prefix key are sent back-to-back.
+
+    Groups are ordered by their first request and keep their input order; requests without
+    a key keep their place relative to the groups.
+
+    Args:
+        keys: The prefix key of every request, in input order
+
+    Returns:
+        list[int]: Indices of the requests, in the order they should be sent
+    """
+    groups: dict[object, list[int]] = {}
+    for index, key in enumerate(keys):
+        groups.setdefault(index if key is None else key, []).append(index)
+    return [index for group in groups.values() for index in group]
@@ -0,0 +1,391 @@
+import asyncio
+import math
+import random
+import selectors
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, Iterable, TypeVar
+
+from .clock import VirtualClock
+from .log import get_logger
+from .utils import count_message_tokens
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+LOGGER = get_logger(__name__)
+
+T = TypeVar("T")
+
+LatencyModel = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> LatencyModel:
+    """Parse a latency distribution spec into a sampler returning seconds.
+
+    Supported specs:
+        constant:<seconds>
+        uniform:<low>:<high>
+        lognormal:<median>:<sigma>
+        exponential:<mean>
+    """
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+
+    if kind == "constant":
+        (delay,) = values
+        return lambda rng: delay
+    if kind == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    if kind == "exponential":
+        (mean,) = values
+        return lambda rng: rng.expovariate(1 / mean)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """Wraps a real selector; waits with a timeout advance the clock instead of blocking."""
+
+    def __init__(self, clock: VirtualClock) -> None:
+        self._clock = clock
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, fileobj: Any, events: int, data: Any = None) -> selectors.SelectorKey:
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj: Any) -> selectors.SelectorKey:
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj: Any, events: int, data: Any = None) -> selectors.SelectorKey:
+        return self._selector.modify(fileobj, events, data)
+
+    def select(self, timeout: float | None = None) -> list[tuple[selectors.SelectorKey, int]]:
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            # No timers left: only I/O or another thread can wake the loop up
+            return self._selector.select(None)
+        self._clock.advance(timeout)
+        return []
+
+    def get_map(self) -> Any:
+        return self._selector.get_map()
+
+    def close(self) -> None:
+        self._selector.close()
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """An event loop on a `VirtualClock`.
+
+    Timers, `asyncio.sleep` and timeouts are scheduled on the clock, and whenever no
+    callback is ready the clock jumps to the next timer instead of waiting for it. Ready
+    I/O is still served, but virtual time does not wait for it: threads (e.g.
+    `run_in_executor`) and sockets run on real time while the simulation may run ahead.
+    """
+
+    def __init__(self, clock: VirtualClock | None = None) -> None:
+        self.clock = clock or VirtualClock()
+        super().__init__(_VirtualSelector(self.clock))
+
+    def time(self) -> float:
+        return self.clock.monotonic()
+
+
+def run_simulated(main: Coroutine[Any, Any, T], clock: VirtualClock | None = None) -> T:
+    """Run a coroutine to completion on a fresh `VirtualEventLoop`, like `asyncio.run`."""
+    loop = VirtualEventLoop(clock)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+
+class SimulatedAPIError(Exception):
+    """An error response of the simulated upstream, with its HTTP status code."""
+
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class UpstreamStats:
+    requests: int = 0
+    completed: int = 0
+    rate_limited: int = 0
+    injected_errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class SimulatedUpstream:
+    """A modeled OpenAI chat completions endpoint, in place of `AsyncOpenAI`.
+
+    Pass it as `ConcurrentOpenAI(client=...)`. Quotas are enforced over a sliding window,
+    like the API does, and measured on the running event loop's clock, so the upstream runs
+    on virtual time under a `VirtualEventLoop` and on real time otherwise. Rejected and
+    failed requests raise a `SimulatedAPIError` with status 429 or 500.
+
+    Attributes:
+        latency: Sampler for the time to the first token in seconds
+        seconds_per_completion_token: Generation time added per completion token
+        requests_per_minute: Enforced request quota per window (optional)
+        tokens_per_minute: Enforced token quota per window (optional)
+        error_rate: Probability of failing an admitted request with a 500
+        completion_tokens: Number of completion tokens generated per choice, at most the
+            request's `max_tokens`
+        window: Length of the quota window in seconds
+        stats: Request and token counts so far
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: LatencyModel | str = "lognormal:1.0:0.5",
+        seconds_per_completion_token: float = 0.0,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        error_rate: float = 0.0,
+        completion_tokens: int = 100,
+        window: float = 60.0,
+        prompt_tokens: Callable[[list[dict[str, Any]], str], int] = count_message_tokens,
+        seed: int = 0,
+    ) -> None:
+        """
+        Initialize a simulated upstream.
+
+        Args:
+            latency: Latency sampler, or a spec such as "lognormal:<median>:<sigma>" (see
+                `parse_latency`)
+            seconds_per_completion_token: Generation time added per completion token
+            requests_per_minute: Enforced request quota per window (optional)
+            tokens_per_minute: Enforced token quota per window (optional)
+            error_rate: Probability of failing an admitted request with a 500
+            completion_tokens: Number of completion tokens generated per choice
+            window: Length of the quota window in seconds
+            prompt_tokens: Counts the billed prompt tokens of a request's messages and model
+            seed: Seed of the latency and error sampling
+        """
+        if not 0 <= error_rate <= 1:
+            raise ValueError("error_rate must be between 0 and 1")
+
+        self.latency = parse_latency(latency) if isinstance(latency, str) else latency
+        self.seconds_per_completion_token = seconds_per_completion_token
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.error_rate = error_rate
+        self.completion_tokens = completion_tokens
+        self.window = window
+        self.stats = UpstreamStats()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+        self._prompt_tokens = prompt_tokens
+        self._rng = random.Random(seed)
+        # (admitted at, billed tokens) over the last window
+        self._admitted: deque[tuple[float, int]] = deque()
+        self._admitted_tokens = 0
+
+    async def close(self) -> None:
+        pass
+
+    async def _create_completion(
+        self, *, messages: list[dict[str, Any]], model: str, **kwargs: Any
+    ) -> "ChatCompletion":
+        from openai.types.chat import ChatCompletion, ChatCompletionMessage
+        from openai.types.chat.chat_completion import Choice
+        from openai.types.completion_usage import CompletionUsage
+
+        stats = self.stats
+        stats.requests += 1
+        now = asyncio.get_running_loop().time()
+
+        prompt_tokens = self._prompt_tokens(messages, model)
+        max_tokens = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens")
+        completion_tokens = min(self.completion_tokens, max_tokens or self.completion_tokens)
+        choices = kwargs.get("n") or 1
+        billed_tokens = prompt_tokens + completion_tokens * choices
+
+        while self._admitted and self._admitted[0][0] <= now - self.window:
+            self._admitted_tokens -= self._admitted.popleft()[1]
+        if (
+            self.requests_per_minute is not None
+            and len(self._admitted) + 1 > self.requests_per_minute
+        ) or (
+            self.tokens_per_minute is not None
+            and self._admitted_tokens + billed_tokens > self.tokens_per_minute
+        ):
+            stats.rate_limited += 1
+            raise SimulatedAPIError("Rate limit reached", status_code=429)
+        self._admitted.append((now, billed_tokens))
+        self._admitted_tokens += billed_tokens
+
+        await asyncio.sleep(
+            max(0.0, self.latency(self._rng))
+            + completion_tokens * self.seconds_per_completion_token
+        )
+        if self.error_rate and self._rng.random() < self.error_rate:
+            stats.injected_errors += 1
+            raise SimulatedAPIError("Injected server error", status_code=500)
+
+        stats.completed += 1
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens * choices
+        content = " ".join(["simulated"] * completion_tokens)
+        return ChatCompletion(
+            id=f"chatcmpl-sim-{stats.requests}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[
+                Choice(
+                    index=index,
+                    finish_reason="length" if completion_tokens == max_tokens else "stop",
+                    message=ChatCompletionMessage(role="assistant", content=content),
+                )
+                for index in range(choices)
+            ],
+            usage=CompletionUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens * choices,
+                total_tokens=billed_tokens,
+            ),
+        )
+
+
+@dataclass(slots=True)
+class SimulationReport:
+    """
+    Outcome of a `simulate` run.
+
+    `latency` holds the client's p50/p95/p99 per stage (see `LatencyStats.summary`), e.g.
+    `latency["request_limiter"]["p95"]` for the time spent queueing for the RPM quota.
+    """
+
+    requests: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    rate_limited: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_cost: float = 0.0
+    simulated_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    latency: dict[str, dict[str, float]] = field(default_factory=dict)
+
+    @property
+    def requests_per_minute(self) -> float:
+        """Completed requests per simulated minute."""
+        return self.succeeded / self.simulated_seconds * 60 if self.simulated_seconds else 0.0
+
+    @property
+    def tokens_per_minute(self) -> float:
+        """Billed tokens per simulated minute."""
+        tokens = self.prompt_tokens + self.completion_tokens
+        return tokens / self.simulated_seconds * 60 if self.simulated_seconds else 0.0
+
+    @property
+    def speedup(self) -> float:
+        """Simulated seconds per wall-clock second."""
+        return self.simulated_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+
+def simulate(
+    messages_list: Iterable[list[dict[str, Any]]],
+    upstream: SimulatedUpstream,
+    *,
+    model: str = "gpt-4o",
+    arrival_rate: float | None = None,
+    max_in_flight: int = 1000,
+    client_options: dict[str, Any] | None = None,
+    seed: int = 0,
+    **kwargs: Any,
+) -> SimulationReport:
+    """
+    Send a workload through a client and a simulated upstream on virtual time.
+
+    The client runs with its real limiters, admission queue, budgets and circuit breaker on
+    a `VirtualEventLoop`, so hours of rate-limited traffic take seconds to simulate.
+    Configure it (rate limits, concurrency, budget, breaker) with `client_options`; its
+    clock is set to the simulation's.
+
+    Without `arrival_rate` the prompts are a batch, sent like `create_many` sends them.
+    With it, they arrive one by one at exponentially distributed intervals, like live
+    traffic. Either way, prompts are pulled from `messages_list` only while fewer than
+    `max_in_flight` requests are pending, so a day of traffic does not have to fit in
+    memory.
+
+    Args:
+        messages_list: The prompts to send, e.g. a generator
+        upstream: The modeled upstream
+        model: The model to use
+        arrival_rate: Mean number of prompts arriving per second (optional, all at once)
+        max_in_flight: Maximum number of requests pending at once
+        client_options: Arguments passed to `ConcurrentOpenAI` (optional)
+        seed: Seed of the arrival times
+        **kwargs: Arguments passed to `create` for every prompt (e.g. `max_tokens`)
+
+    Returns:
+        SimulationReport: Throughput, queueing latencies and cost
+    """
+    from .client import ConcurrentOpenAI
+
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    if arrival_rate is not None and arrival_rate <= 0:
+        raise ValueError("arrival_rate must be positive")
+
+    clock = VirtualClock(epoch=time.time())
+    client = ConcurrentOpenAI(client=upstream, clock=clock, **(client_options or {}))
+    report = SimulationReport()
+    rate_limited_before = upstream.stats.rate_limited
+    rng = random.Random(seed)
+
+    async def send(messages: list[dict[str, Any]], slots: asyncio.Semaphore) -> None:
+        try:
+            response = await client.create(messages, lean=True, model=model, **kwargs)
+        finally:
+            slots.release()
+        report.succeeded += response.is_success
+        report.prompt_tokens += response.prompt_tokens
+        report.completion_tokens += response.completion_tokens
+        report.total_cost += response.total_cost
+
+    async def run() -> None:
+        slots = asyncio.Semaphore(max_in_flight)
+        tasks: set[asyncio.Task[None]] = set()
+        for messages in messages_list:
+            if arrival_rate is not None:
+                await asyncio.sleep(rng.expovariate(arrival_rate))
+            await slots.acquire()
+            report.requests += 1
+            task = asyncio.create_task(send(messages, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    wall_start = time.perf_counter()
+    run_simulated(run(), clock)
+    report.wall_seconds = time.perf_counter() - wall_start
+    report.simulated_seconds = clock.monotonic()
+    report.failed = report.requests - report.succeeded
+    report.rate_limited = upstream.stats.rate_limited - rate_limited_before
+    report.latency = client.latency_stats.summary().get(model, {})
+
+    LOGGER.info(
+        "Simulation finished",
+        requests=report.requests,
+        simulated_seconds=report.simulated_seconds,
+        wall_seconds=report.wall_seconds,
+    )
+    return report
@@ -0,0 +1,110 @@
+import math
+from array import array
+
+from .models import STAGES, RequestTimings
+
+
+class LatencyHistogram:
+    """A log-bucketed latency histogram.
+
+    Recording is O(1) and memory is bounded by the number of buckets. Percentiles are
+    reported as the upper bound of the bucket they fall in, so the relative error is at most
+    `growth_factor - 1` (5% by default).
+
+    Attributes:
+        min_value: Smallest resolvable latency in seconds; anything lower lands in bucket 0
+        max_value: Largest resolvable latency in seconds; anything higher lands in the last bucket
+        growth_factor: Ratio between the upper bounds of consecutive buckets
+    """
+
+    __slots__ = ("min_value", "max_value", "growth_factor", "_log_growth", "_counts", "count")
+
+    def __init__(
+        self, min_value: float = 1e-5, max_value: float = 3600.0, growth_factor: float = 1.05
+    ) -> None:
+        if min_value <= 0 or max_value <= min_value:
+            raise ValueError("Histogram bounds must satisfy 0 < min_value < max_value")
+        if growth_factor <= 1:
+            raise ValueError("Growth factor must be greater than 1")
+
+        self.min_value = min_value
+        self.max_value = max_value
+        self.growth_factor = growth_factor
+        self._log_growth = math.log(growth_factor)
+
+        num_buckets = math.ceil(math.log(max_value / min_value) / self._log_growth) + 1
+        self._counts = array("Q", bytes(8 * num_buckets))
+        self.count = 0
+
+    def record(self, value: float) -> None:
+        """Record a latency sample in seconds."""
+        if value <= self.min_value:
+            index = 0
+        else:
+            index = math.ceil(math.log(value / self.min_value) / self._log_growth)
+            index = min(index, len(self._counts) - 1)
+        self._counts[index] += 1
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        """Return the `q`-th percentile (0-100) in seconds, or 0.0 when empty."""
+        if not 0 <= q <= 100:
+            raise ValueError("Percentile must be between 0 and 100")
+        if not self.count:
+            return 0.0
+
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index, bucket_count in enumerate(self._counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.min_value * self.growth_factor**index
+        return self.max_value  # pragma: no cover
+
+    def __repr__(self) -> str:
+        return (
+            f"LatencyHistogram(count={self.count}, p50={self.percentile(50):.4f}, "
+            f"p99={self.percentile(99):.4f})"
+        )
+
+
+class LatencyStats:
+    """Per-model, per-stage latency histograms aggregated over many requests."""
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self) -> None:
+        self._histograms: dict[str, dict[str, LatencyHistogram]] = {}
+
+    def record(self, model: str, timings: RequestTimings) -> None:
+        """Record the stage breakdown of a single request."""
+        histograms = self._histograms.get(model)
+        if histograms is None:
+            histograms = self._histograms[model] = {stage: LatencyHistogram() for stage in STAGES}
+
+        for stage, duration in timings.completed_stages().items():
+            histograms[stage].record(duration)
+
+    def histogram(self, model: str, stage: str) -> LatencyHistogram | None:
+        """Return the histogram for a model and stage, if any requests were recorded."""
+        return self._histograms.get(model, {}).get(stage)
+
+    def summary(self) -> dict[str, dict[str, dict[str, float]]]:
+        """Return p50/p95/p99 and sample counts for every recorded model and stage.
+
+        The result is keyed by model, then stage, e.g. `summary()["gpt-4o"]["http"]["p95"]`.
+        """
+        return {
+            model: {
+                stage: {
+                    "count": histogram.count,
+                    **{f"p{q}": histogram.percentile(q) for q in self.PERCENTILES},
+                }
+                for stage, histogram in histograms.items()
+            }
+            for model, histograms in self._histograms.items()
+        }
+
+    def reset(self) -> None:
+        """Drop all recorded samples."""
+        self._histograms.clear()
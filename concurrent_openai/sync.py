@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Coroutine, TypeVar
+
+from .client import ConcurrentOpenAI
+from .log import get_logger
+from .models import CompletionResponse, ConcurrentEmbeddingResponse, ConcurrentResponse
+
+LOGGER = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class SyncConcurrentOpenAI:
+    """A blocking facade over `ConcurrentOpenAI` for scripts, sync workers and notebooks.
+
+    All requests run on one long-lived event loop in a background thread, so the HTTP
+    connection pool, concurrency limit, rate limiters and budgets are shared by every call
+    instead of being rebuilt by an `asyncio.run` per batch. Methods can be called from any
+    number of threads, and from code that already runs an event loop (e.g. Jupyter).
+
+    Attributes:
+        client: The underlying `ConcurrentOpenAI`, e.g. for `latency_stats` or `semaphore`
+    """
+
+    def __init__(self, **kwargs: Any) -> None:
+        """
+        Initialize the client and start its event loop thread.
+
+        Args:
+            **kwargs: Options passed to `ConcurrentOpenAI`
+        """
+        self.client = ConcurrentOpenAI(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="concurrent-openai-loop", daemon=True
+        )
+        self._closed = False
+        self._thread.start()
+
+    def submit(self, messages: list[dict[str, Any]], **kwargs: Any) -> Future[CompletionResponse]:
+        """Start a chat completion and return a `concurrent.futures.Future` for its result.
+
+        Accepts the same arguments as `ConcurrentOpenAI.create`. Cancelling the future
+        cancels the request.
+        """
+        return self._submit(self.client.create(messages, **kwargs))
+
+    def create(self, messages: list[dict[str, Any]], **kwargs: Any) -> CompletionResponse:
+        """Create a chat completion and wait for it. See `ConcurrentOpenAI.create`."""
+        return self._wait(self.submit(messages, **kwargs))
+
+    def create_many(
+        self, messages_list: list[list[dict[str, Any]]], **kwargs: Any
+    ) -> list[CompletionResponse]:
+        """Create multiple chat completions concurrently and wait for all of them."""
+        return self._wait(self._submit(self.client.create_many(messages_list, **kwargs)))
+
+    def create_embedding(
+        self, input: str | list[str] | list[int] | list[list[int]], **kwargs: Any
+    ) -> ConcurrentEmbeddingResponse:
+        """Create embeddings and wait for them. See `ConcurrentOpenAI.create_embedding`."""
+        return self._wait(self._submit(self.client.create_embedding(input, **kwargs)))
+
+    def create_response(
+        self, input: str | list[dict[str, Any]], **kwargs: Any
+    ) -> ConcurrentResponse:
+        """Create a Responses API response and wait for it. See `ConcurrentOpenAI.create_response`."""
+        return self._wait(self._submit(self.client.create_response(input, **kwargs)))
+
+    def close(self) -> None:
+        """Cancel pending requests, save the rate limiter state (if persisted), close the HTTP
+        client and stop the event loop thread.
+
+        The underlying `AsyncOpenAI` client is closed too, since its connections belong to
+        this client's event loop.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def __enter__(self) -> "SyncConcurrentOpenAI":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _shutdown(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.client.save_rate_limit_state()
+        await self.client.client.close()
+
+    def _submit(self, coroutine: Coroutine[Any, Any, T]) -> Future[T]:
+        if self._closed:
+            coroutine.close()
+            raise RuntimeError("SyncConcurrentOpenAI is closed")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _wait(self, future: Future[T]) -> T:
+        if threading.current_thread() is self._thread:
+            future.cancel()
+            raise RuntimeError("Blocking calls cannot be made from the client's own event loop")
+        try:
+            return future.result()
+        except BaseException:
+            # e.g. KeyboardInterrupt: don't leave the request running in the background
+            future.cancel()
+            raise
@@ -1,14 +1,16 @@
 import base64
 import math
+import os
 import struct
-from typing import Any
+from typing import TYPE_CHECKING, Any, Iterable
 
-import structlog
-import tiktoken
+from concurrent_openai.log import get_logger
+from concurrent_openai.models import EncodedMessage, ModelTokenSettings
 
-from concurrent_openai.models import ModelTokenSettings
+if TYPE_CHECKING:
+    import tiktoken
 
-LOGGER = structlog.get_logger(__name__)
+LOGGER = get_logger(__name__)
 
 
 MODEL_SETTINGS: dict[str, ModelTokenSettings] = {
@@ -49,6 +51,67 @@ def count_total_tokens(messages: list[dict], tools: list[dict] | None, model: st
     return count_message_tokens(messages, model) + count_function_tokens(tools, model)
 
 
+def count_embedding_tokens(input: str | list[str] | list[int] | list[list[int]], model: str) -> int:
+    """
+    Return the number of tokens in an embeddings input.
+
+    Args:
+        input: A string, a list of strings, or already tokenized input(s)
+        model: The embedding model to count tokens for
+
+    Returns:
+        int: Number of tokens across all inputs
+    """
+    if isinstance(input, str):
+        return len(get_encoding(model).encode(input))
+    if not input:
+        return 0
+    if isinstance(input[0], int):
+        return len(input)
+
+    encoding = get_encoding(model)
+    return sum(
+        len(item) if isinstance(item, list) else len(encoding.encode(item))  # type: ignore[arg-type]
+        for item in input
+    )
+
+
+def count_response_input_tokens(
+    input: str | list[dict[str, Any]], model: str, instructions: str | None = None
+) -> int:
+    """
+    Return the number of tokens used by a Responses API input.
+
+    Args:
+        input: A string or a list of input items (messages with string or part-list content)
+        model: The model to count tokens for
+        instructions: Optional system instructions sent with the input
+
+    Returns:
+        int: Estimated number of input tokens
+    """
+    encoding = get_encoding(model)
+    settings = get_model_settings(model)
+
+    items = [{"role": "user", "content": input}] if isinstance(input, str) else input
+    if instructions:
+        items = [{"role": "developer", "content": instructions}, *items]
+
+    num_tokens = 0
+    for item in items:
+        num_tokens += settings.tokens_per_message
+        for key, value in item.items():
+            if isinstance(value, str):
+                num_tokens += len(encoding.encode(value))
+            elif isinstance(value, list):
+                for part in value:
+                    if isinstance(part, dict) and isinstance(part.get("text"), str):
+                        num_tokens += len(encoding.encode(part["text"]))
+
+    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
+    return num_tokens
+
+
 def count_message_tokens(messages: list[dict], model: str = "gpt-3.5-turbo") -> int:
     """
     Return the number of tokens used by a list of messages.
@@ -61,19 +124,35 @@ def count_message_tokens(messages: list[dict], model: str = "gpt-3.5-turbo") ->
     Returns:
         int: Number of tokens in the messages
     """
+    num_tokens = sum(message.num_tokens for message in encode_messages(messages, model))
+    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
+    return num_tokens
+
+
+def encode_messages(messages: list[dict], model: str) -> list[EncodedMessage]:
+    """
+    Count the tokens of each message, keeping the token ids of the text content.
+
+    Args:
+        messages: List of message dictionaries with role and content
+        model: The model to count tokens for
+
+    Returns:
+        list[EncodedMessage]: One entry per message, in order
+    """
     encoding = get_encoding(model)
     settings = get_model_settings(model)
 
-    num_tokens = 0
+    encoded = []
     for message in messages:
-        num_tokens += settings.tokens_per_message
+        item = EncodedMessage(message, settings.tokens_per_message)
         for key, value in message.items():
-            num_tokens += _count_tokens_for_message_part(key, value, encoding)
+            texts = item.texts if key == "content" else None
+            item.num_tokens += _count_tokens_for_message_part(key, value, encoding, texts)
             if key == "name":
-                num_tokens += settings.tokens_per_name
-
-    num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
-    return num_tokens
+                item.num_tokens += settings.tokens_per_name
+        encoded.append(item)
+    return encoded
 
 
 def count_function_tokens(tools: list[dict] | None, model: str) -> int:
@@ -148,7 +227,9 @@ def get_model_settings(model: str) -> ModelTokenSettings:
     return MODEL_SETTINGS["gpt-4o"]
 
 
-def get_encoding(model: str) -> tiktoken.Encoding:
+def get_encoding(model: str) -> "tiktoken.Encoding":
+    import tiktoken
+
     try:
         return tiktoken.encoding_for_model(model)
     except KeyError:
@@ -156,6 +237,26 @@ def get_encoding(model: str) -> tiktoken.Encoding:
         return tiktoken.get_encoding("o200k_base")
 
 
+def warmup(models: Iterable[str], cache_dir: str | os.PathLike[str] | None = None) -> None:
+    """
+    Load the tokenizer encodings of `models` ahead of the first request.
+
+    tiktoken loads (and on first use downloads) an encoding's BPE ranks the first time it is
+    needed, which otherwise happens inside the first `create` call. With `cache_dir`, the
+    ranks are read from that directory (tiktoken's `TIKTOKEN_CACHE_DIR`), e.g. one baked
+    into a container image, so no network fetch is needed.
+
+    Args:
+        models: Models whose encodings to load
+        cache_dir: Directory of cached tiktoken BPE files (optional)
+    """
+    if cache_dir is not None:
+        os.environ["TIKTOKEN_CACHE_DIR"] = os.fspath(cache_dir)
+
+    for model in models:
+        get_encoding(model).encode("warmup")
+
+
 def get_png_dimensions(base64_str: str) -> tuple[int, int]:
     """Extract width and height from a base64-encoded PNG image.
 
@@ -184,23 +285,46 @@ def get_png_dimensions(base64_str: str) -> tuple[int, int]:
         return 0, 0
 
 
-def _count_tokens_for_message_part(key: str, value: Any, encoding: tiktoken.Encoding) -> int:
+def _count_tokens_for_message_part(
+    key: str,
+    value: Any,
+    encoding: "tiktoken.Encoding",
+    texts: dict[int | None, list[int]] | None = None,
+) -> int:
     if isinstance(value, str):
-        return len(encoding.encode(value))
+        tokens = encoding.encode(value)
+        if texts is not None:
+            texts[None] = tokens
+        return len(tokens)
     elif isinstance(value, list):
-        return sum(_count_tokens_for_list_item(item, encoding) for item in value)
+        return sum(
+            _count_tokens_for_list_item(item, encoding, index, texts)
+            for index, item in enumerate(value)
+        )
     else:
         LOGGER.error(f"Could not encode unsupported message key type: {type(key)}")
         return 0
 
 
-def _count_tokens_for_list_item(item: dict[str, Any], encoding: tiktoken.Encoding) -> int:
+def _count_tokens_for_list_item(
+    item: dict[str, Any],
+    encoding: "tiktoken.Encoding",
+    index: int | None = None,
+    texts: dict[int | None, list[int]] | None = None,
+) -> int:
     num_tokens = len(encoding.encode(item["type"]))
     if item["type"] == "text":
-        num_tokens += len(encoding.encode(item["text"]))
+        tokens = encoding.encode(item["text"])
+        if texts is not None:
+            texts[index] = tokens
+        num_tokens += len(tokens)
     elif item["type"] == "image_url":
         width, height = get_png_dimensions(item["image_url"]["url"])
         num_tokens += _count_image_tokens(width, height)
+    elif item["type"] == "function":
+        # A tool call in an assistant message
+        num_tokens += len(encoding.encode(item["function"]["name"]))
+        num_tokens += len(encoding.encode(item["function"]["arguments"]))
     else:
         LOGGER.error(f"Could not encode unsupported message value type: {type(item)}")
     return num_tokens
@@ -1,8 +1,13 @@
 import base64
 import json
 from pathlib import Path
+from unittest.mock import AsyncMock
 
 import pytest
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.completion_usage import CompletionUsage
 
 
 @pytest.fixture
@@ -28,3 +33,38 @@ def base64_sunglasses_image(data_dir: Path) -> str:
         image = f.read()
     base64_image = base64.b64encode(image).decode("utf-8")
     return f"data:image/png;base64,{base64_image}"
+
+
+@pytest.fixture
+def mocked_chat_completion() -> ChatCompletion:
+    return ChatCompletion(
+        id="chatcmpl-99XUGZR68HIAcvljfTyb5FYAxxtJH",
+        choices=[
+            Choice(
+                finish_reason="stop",
+                index=0,
+                logprobs=None,
+                message=ChatCompletionMessage(
+                    content="Hello! How can I assist you today?",
+                    role="assistant",
+                    function_call=None,
+                    tool_calls=None,
+                ),
+            )
+        ],
+        created=1712060704,
+        model="gpt-4-0613",
+        object="chat.completion",
+        system_fingerprint=None,
+        usage=CompletionUsage(completion_tokens=9, prompt_tokens=10, total_tokens=19),
+    )
+
+
+@pytest.fixture
+def mocked_client(mocked_chat_completion) -> AsyncMock:
+    """An `AsyncOpenAI` mock whose chat completions always return `mocked_chat_completion`."""
+    mock_client = AsyncMock(spec=AsyncOpenAI)
+    mock_client.chat = AsyncMock()
+    mock_client.chat.completions = AsyncMock()
+    mock_client.chat.completions.create = AsyncMock(return_value=mocked_chat_completion)
+    return mock_client
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from concurrent_openai.admission import AdmissionQueue
+from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.exceptions import LoadShedError
+
+
+@pytest.mark.asyncio
+async def test_sheds_when_queue_is_full():
+    queue = AdmissionQueue(asyncio.Semaphore(1), max_waiters=1)
+    await queue.acquire()
+
+    waiter = asyncio.create_task(queue.acquire())
+    await asyncio.sleep(0)
+    assert queue.waiters == 1
+
+    with pytest.raises(LoadShedError):
+        await queue.acquire()
+
+    queue.release()
+    await waiter
+    assert queue.waiters == 0
+
+
+@pytest.mark.asyncio
+async def test_sheds_after_max_wait():
+    queue = AdmissionQueue(asyncio.Semaphore(1), max_wait=0.01)
+    await queue.acquire()
+
+    with pytest.raises(LoadShedError):
+        await queue.acquire()
+    assert queue.waiters == 0
+
+    # The slot is still usable afterwards
+    queue.release()
+    await asyncio.wait_for(queue.acquire(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_client_sheds_excess_load(mocked_client, mocked_chat_completion):
+    async def slow_response(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return mocked_chat_completion
+
+    mocked_client.chat.completions.create.side_effect = slow_response
+    client = ConcurrentOpenAI(
+        client=mocked_client, max_concurrent_requests=2, max_queued_requests=2
+    )
+
+    responses = await client.create_many([[{"role": "user", "content": "Hi"}]] * 10)
+
+    assert sum(response.is_success for response in responses) == 4
+    assert [r.error_type for r in responses if not r.is_success] == ["LoadShedError"] * 6
+    assert mocked_client.chat.completions.create.call_count == 4
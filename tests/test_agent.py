@@ -0,0 +1,180 @@
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_message_tool_call import (
+    ChatCompletionMessageToolCall,
+    Function,
+)
+from openai.types.completion_usage import CompletionUsage
+
+from concurrent_openai.agent import AgentRunner
+from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.utils import count_total_tokens, encode_messages
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": f"Look up the {name}",
+            "parameters": {
+                "type": "object",
+                "properties": {"city": {"type": "string", "description": "City name"}},
+            },
+        },
+    }
+    for name in ("weather", "time")
+]
+
+
+def completion(content=None, tool_calls=()):
+    return ChatCompletion(
+        id="chatcmpl-agent",
+        choices=[
+            Choice(
+                finish_reason="tool_calls" if tool_calls else "stop",
+                index=0,
+                message=ChatCompletionMessage(
+                    role="assistant",
+                    content=content,
+                    tool_calls=[
+                        ChatCompletionMessageToolCall(
+                            id=f"call_{i}",
+                            type="function",
+                            function=Function(name=name, arguments=json.dumps(arguments)),
+                        )
+                        for i, (name, arguments) in enumerate(tool_calls)
+                    ]
+                    or None,
+                ),
+            )
+        ],
+        created=0,
+        model="gpt-4o",
+        object="chat.completion",
+        usage=CompletionUsage(prompt_tokens=20, completion_tokens=5, total_tokens=25),
+    )
+
+
+async def slow_weather(city):
+    await asyncio.sleep(0.1)
+    return {"city": city, "forecast": "sunny"}
+
+
+def slow_time(city):
+    time.sleep(0.1)
+    return f"12:00 in {city}"
+
+
+@pytest.mark.asyncio
+async def test_agent_runs_tools_concurrently_and_counts_incrementally(mocked_client):
+    mocked_client.chat.completions.create.side_effect = [
+        completion(tool_calls=[("weather", {"city": "Rome"}), ("time", {"city": "Rome"})]),
+        completion(content="Sunny, and it is noon."),
+    ]
+    client = ConcurrentOpenAI(client=mocked_client, token_safety_margin=0)
+    runner = AgentRunner(
+        client, TOOLS, {"weather": slow_weather, "time": slow_time}, model="gpt-4o"
+    )
+    initial = [{"role": "user", "content": "Weather and time in Rome?"}]
+
+    encoded_sizes = []
+
+    def spy(messages, model):
+        encoded_sizes.append(len(messages))
+        return encode_messages(messages, model)
+
+    with patch("concurrent_openai.agent.encode_messages", side_effect=spy):
+        start = time.monotonic()
+        result = await runner.run(initial)
+        elapsed = time.monotonic() - start
+
+    assert result.stop_reason == "completed"
+    assert result.content == "Sunny, and it is noon."
+    assert (result.turns, result.tool_calls, result.tool_errors) == (2, 2, 0)
+    assert elapsed < 0.19
+    assert initial == [{"role": "user", "content": "Weather and time in Rome?"}]
+
+    assert [m["role"] for m in result.messages] == [
+        "user",
+        "assistant",
+        "tool",
+        "tool",
+        "assistant",
+    ]
+    assert result.messages[1]["tool_calls"][0]["function"]["name"] == "weather"
+    assert json.loads(result.messages[2]["content"]) == {"city": "Rome", "forecast": "sunny"}
+    assert result.messages[3] == {
+        "role": "tool",
+        "tool_call_id": "call_1",
+        "content": "12:00 in Rome",
+    }
+
+    # Only new messages are encoded, yet the estimate matches a full recount
+    assert encoded_sizes == [1, 1, 2, 1]
+    second_prompt = mocked_client.chat.completions.create.call_args_list[1].kwargs["messages"]
+    assert result.responses[1].estimated_total_tokens == count_total_tokens(
+        second_prompt, TOOLS, "gpt-4o"
+    )
+    assert result.total_cost == pytest.approx(sum(r.total_cost for r in result.responses))
+
+
+@pytest.mark.asyncio
+async def test_tool_failures_are_reported_to_the_model(mocked_client):
+    async def broken(city):
+        raise RuntimeError("service down")
+
+    async def hanging(city):
+        await asyncio.sleep(10)
+
+    mocked_client.chat.completions.create.side_effect = [
+        completion(
+            tool_calls=[
+                ("weather", {"city": "Oslo"}),
+                ("time", {"city": "Oslo"}),
+                ("stock_price", {"ticker": "X"}),
+            ]
+        ),
+        completion(content="Sorry, the tools failed."),
+    ]
+    client = ConcurrentOpenAI(client=mocked_client)
+    runner = AgentRunner(
+        client, TOOLS, {"weather": broken, "time": hanging}, model="gpt-4o", tool_timeout=0.05
+    )
+
+    result = await runner.run([{"role": "user", "content": "Weather in Oslo?"}])
+
+    assert result.stop_reason == "completed"
+    assert result.tool_errors == 3
+    contents = [m["content"] for m in result.messages if m["role"] == "tool"]
+    assert contents == [
+        "Error: RuntimeError: service down",
+        "Error: tool 'time' timed out after 0.05s",
+        "Error: unknown tool 'stock_price'",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_agent_stop_conditions(mocked_client):
+    looping = completion(tool_calls=[("weather", {"city": "Paris"})])
+    mocked_client.chat.completions.create.return_value = looping
+    client = ConcurrentOpenAI(client=mocked_client)
+
+    runner = AgentRunner(client, TOOLS, {"weather": slow_weather}, model="gpt-4o", max_turns=3)
+    result = await runner.run([{"role": "user", "content": "Weather in Paris?"}])
+    assert (result.stop_reason, result.turns, result.tool_calls) == ("max_turns", 3, 3)
+
+    runner = AgentRunner(
+        client, TOOLS, {"weather": slow_weather}, model="gpt-4o", stop=lambda response: True
+    )
+    result = await runner.run([{"role": "user", "content": "Weather in Paris?"}])
+    assert (result.stop_reason, result.turns, result.tool_calls) == ("stopped", 1, 0)
+
+    mocked_client.chat.completions.create.side_effect = RuntimeError("boom")
+    result = await runner.run([{"role": "user", "content": "Weather in Paris?"}])
+    assert (result.stop_reason, result.error) == ("error", "boom")
@@ -0,0 +1,318 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import openai
+import pytest
+from openai import AsyncOpenAI
+from openai.types import CreateEmbeddingResponse, Embedding
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.completion_usage import CompletionUsage
+from openai.types.create_embedding_response import Usage
+
+from concurrent_openai.batching import EmbeddingBatcher
+from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.models import LeanCompletionResponse
+from concurrent_openai.rate_limiter import RateLimiter
+
+
+def embedding_response(texts: list[str]) -> CreateEmbeddingResponse:
+    tokens = sum(len(text) for text in texts)
+    return CreateEmbeddingResponse(
+        data=[
+            Embedding(embedding=[float(len(text)), float(i)], index=i, object="embedding")
+            for i, text in enumerate(texts)
+        ],
+        model="text-embedding-3-small",
+        object="list",
+        usage=Usage(prompt_tokens=tokens, total_tokens=tokens),
+    )
+
+
+@pytest.fixture
+def embeddings_client() -> AsyncMock:
+    mock_client = AsyncMock(spec=AsyncOpenAI)
+    mock_client.embeddings = AsyncMock()
+
+    async def create(input, model, **kwargs):
+        return embedding_response(input if isinstance(input, list) else [input])
+
+    mock_client.embeddings.create = AsyncMock(side_effect=create)
+    return mock_client
+
+
+@pytest.mark.asyncio
+async def test_batches_concurrent_calls(embeddings_client):
+    client = ConcurrentOpenAI(client=embeddings_client, requests_per_minute=600)
+    texts = [f"text number {i}" for i in range(10)]
+
+    async with EmbeddingBatcher(client) as batcher:
+        responses = await batcher.embed_many(texts)
+
+    # All ten texts went out as a single array input
+    assert embeddings_client.embeddings.create.call_count == 1
+    assert embeddings_client.embeddings.create.call_args.kwargs["input"] == texts
+
+    for i, (text, response) in enumerate(zip(texts, responses)):
+        assert response.is_success
+        assert response.embedding == [float(len(text)), float(i)]
+    assert sum(response.prompt_tokens for response in responses) == pytest.approx(
+        sum(len(text) for text in texts), abs=len(texts)
+    )
+
+
+@pytest.mark.asyncio
+async def test_respects_item_limit(embeddings_client):
+    client = ConcurrentOpenAI(client=embeddings_client)
+
+    batcher = EmbeddingBatcher(client, max_items=4)
+    responses = await batcher.embed_many([f"text {i}" for i in range(10)])
+
+    assert embeddings_client.embeddings.create.call_count == 3
+    assert [
+        len(call.kwargs["input"]) for call in embeddings_client.embeddings.create.call_args_list
+    ] == [4, 4, 2]
+    assert [response.embedding[1] for response in responses] == [0, 1, 2, 3, 0, 1, 2, 3, 0, 1]
+
+
+@pytest.mark.asyncio
+async def test_respects_token_limit(embeddings_client):
+    client = ConcurrentOpenAI(client=embeddings_client)
+    batcher = EmbeddingBatcher(client, max_tokens=batcher_tokens("aaaa bbbb cccc", client))
+
+    await batcher.embed_many(["aaaa bbbb cccc"] * 3)
+
+    assert embeddings_client.embeddings.create.call_count == 3
+
+
+def batcher_tokens(text: str, client: ConcurrentOpenAI) -> int:
+    return len(EmbeddingBatcher(client)._encoding.encode(text))
+
+
+@pytest.mark.asyncio
+async def test_window_flushes_partial_batch(embeddings_client):
+    client = ConcurrentOpenAI(client=embeddings_client)
+    batcher = EmbeddingBatcher(client, max_wait=0.01)
+
+    response = await asyncio.wait_for(batcher.embed("lonely text"), timeout=1)
+
+    assert response.is_success
+    assert embeddings_client.embeddings.create.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_fan_out(embeddings_client):
+    embeddings_client.embeddings.create.side_effect = RuntimeError("boom")
+    client = ConcurrentOpenAI(client=embeddings_client)
+
+    responses = await EmbeddingBatcher(client).embed_many(["a", "b"])
+
+    assert all(response.error == "boom" for response in responses)
+    assert all(response.embedding is None for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_batches_fit_in_token_bucket(embeddings_client):
+    client = ConcurrentOpenAI(client=embeddings_client, token_safety_margin=100)
+    # A small bucket that refills almost instantly, so the test does not wait
+    client.token_limiter = RateLimiter(capacity=1000, fill_rate=1e6)
+    text = " ".join(["word"] * 50)
+    tokens = batcher_tokens(text, client)
+
+    responses = await EmbeddingBatcher(client).embed_many([text] * 30)
+
+    assert all(response.is_success for response in responses)
+    batch_sizes = [
+        len(call.kwargs["input"]) for call in embeddings_client.embeddings.create.call_args_list
+    ]
+    assert sum(batch_sizes) == 30
+    assert max(batch_sizes) * tokens <= 1000 - 100
+
+
+@pytest.mark.asyncio
+async def test_invalid_inputs_fail_alone(embeddings_client):
+    async def create(input, model, **kwargs):
+        if "bad" in input:
+            raise openai.BadRequestError(
+                "Invalid input",
+                response=MagicMock(status_code=400, headers={}),
+                body=None,
+            )
+        return embedding_response(input)
+
+    embeddings_client.embeddings.create.side_effect = create
+    client = ConcurrentOpenAI(client=embeddings_client)
+
+    responses = await EmbeddingBatcher(client).embed_many(
+        ["good 0", "", "good 1", "bad", "good 2", "x" * 50_000]
+    )
+
+    assert [response.is_success for response in responses] == [
+        True,
+        False,
+        True,
+        False,
+        True,
+        False,
+    ]
+    assert responses[1].error_type == "InvalidInput"
+    assert responses[3].error_type == "BadRequestError"
+    assert responses[5].error_type == "InvalidInput"
+    assert [responses[i].embedding[0] for i in (0, 2, 4)] == [6.0, 6.0, 6.0]
+
+
+@pytest.mark.asyncio
+async def test_missing_embeddings_do_not_hang(embeddings_client):
+    async def create(input, model, **kwargs):
+        return embedding_response(input[:-1])
+
+    embeddings_client.embeddings.create.side_effect = create
+    client = ConcurrentOpenAI(client=embeddings_client)
+
+    responses = await asyncio.wait_for(
+        EmbeddingBatcher(client).embed_many(["a", "b", "c"]), timeout=1
+    )
+
+    assert all(response.error_type == "MismatchedEmbeddings" for response in responses)
+
+
+def chat_completion(choices: list[str], prompt_tokens: int = 10) -> ChatCompletion:
+    completion_tokens = sum(len(content.split()) for content in choices)
+    return ChatCompletion(
+        id="chatcmpl-coalesced",
+        object="chat.completion",
+        created=0,
+        model="gpt-4o",
+        choices=[
+            Choice(
+                index=i,
+                finish_reason="stop",
+                message=ChatCompletionMessage(role="assistant", content=content),
+            )
+            for i, content in enumerate(choices)
+        ],
+        usage=CompletionUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
+    )
+
+
+@pytest.fixture
+def chat_client() -> AsyncMock:
+    mock_client = AsyncMock(spec=AsyncOpenAI)
+    mock_client.chat = AsyncMock()
+    mock_client.chat.completions = AsyncMock()
+
+    async def create(messages, model, n=1, **kwargs):
+        return chat_completion([f"answer {i}" for i in range(n)])
+
+    mock_client.chat.completions.create = AsyncMock(side_effect=create)
+    return mock_client
+
+
+@pytest.mark.asyncio
+async def test_coalesces_identical_requests(chat_client):
+    client = ConcurrentOpenAI(
+        client=chat_client,
+        coalesce_window=0.01,
+        input_token_cost=1.0,
+        output_token_cost=2.0,
+        requests_per_minute=600,
+    )
+    messages = [{"role": "user", "content": "Is 17 prime?"}]
+
+    responses = await asyncio.gather(
+        *(client.create(messages, model="gpt-4o", temperature=1.0) for _ in range(4))
+    )
+
+    assert chat_client.chat.completions.create.call_count == 1
+    assert chat_client.chat.completions.create.call_args.kwargs["n"] == 4
+    assert [response.content for response in responses] == [f"answer {i}" for i in range(4)]
+    assert all(response.openai_response.choices[0].index == 0 for response in responses)
+
+    # The prompt is billed once and split between the callers
+    assert sum(response.prompt_tokens for response in responses) == 10
+    assert sum(response.completion_tokens for response in responses) == 8
+    assert sum(response.total_cost for response in responses) == pytest.approx(10 + 8 * 2)
+
+
+@pytest.mark.asyncio
+async def test_coalescer_keeps_different_requests_apart(chat_client):
+    client = ConcurrentOpenAI(client=chat_client, coalesce_window=0.01)
+    messages = [{"role": "user", "content": "Is 17 prime?"}]
+
+    responses = await asyncio.gather(
+        client.create(messages, temperature=1.0),
+        client.create(messages, temperature=0.5),
+        client.create([{"role": "user", "content": "Is 18 prime?"}], temperature=1.0),
+        client.create(messages, n=2),
+    )
+
+    assert chat_client.chat.completions.create.call_count == 4
+    assert sorted(
+        call.kwargs.get("n", 1) for call in chat_client.chat.completions.create.call_args_list
+    ) == [1, 1, 1, 2]
+    assert all(response.is_success for response in responses)
+
+
+@pytest.mark.asyncio
+async def test_coalescer_holds_merged_requests_until_done(chat_client):
+    """The merged request is referenced while in flight, so it cannot be garbage-collected."""
+    release = asyncio.Event()
+
+    async def create(messages, model, n=1, **kwargs):
+        await release.wait()
+        return chat_completion([f"answer {i}" for i in range(n)])
+
+    chat_client.chat.completions.create = AsyncMock(side_effect=create)
+    client = ConcurrentOpenAI(client=chat_client, coalesce_window=10.0, max_coalesced_choices=2)
+    messages = [{"role": "user", "content": "Is 17 prime?"}]
+
+    calls = asyncio.gather(*(client.create(messages) for _ in range(2)))
+    await asyncio.sleep(0.01)
+    assert len(client.coalescer._tasks) == 1
+
+    release.set()
+    responses = await calls
+    assert [response.content for response in responses] == ["answer 0", "answer 1"]
+    assert not client.coalescer._tasks
+
+
+@pytest.mark.asyncio
+async def test_coalescer_skips_requests_with_deadlines(chat_client):
+    client = ConcurrentOpenAI(client=chat_client, coalesce_window=0.01)
+    messages = [{"role": "user", "content": "Is 17 prime?"}]
+
+    await asyncio.gather(*(client.create(messages, timeout=10.0) for _ in range(2)))
+
+    assert chat_client.chat.completions.create.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_coalescer_respects_max_choices(chat_client):
+    client = ConcurrentOpenAI(client=chat_client, coalesce_window=10.0, max_coalesced_choices=3)
+    messages = [{"role": "user", "content": "Is 17 prime?"}]
+
+    # A full group is sent right away without waiting for the window
+    responses = await asyncio.wait_for(
+        asyncio.gather(*(client.create(messages, lean=True) for _ in range(3))), timeout=1.0
+    )
+
+    assert [call.kwargs["n"] for call in chat_client.chat.completions.create.call_args_list] == [3]
+    assert all(isinstance(response, LeanCompletionResponse) for response in responses)
+    assert [response.content for response in responses] == ["answer 0", "answer 1", "answer 2"]
+
+
+@pytest.mark.asyncio
+async def test_coalesced_errors_reach_every_caller(chat_client):
+    chat_client.chat.completions.create = AsyncMock(side_effect=Exception("upstream down"))
+    client = ConcurrentOpenAI(client=chat_client, coalesce_window=0.01)
+    messages = [{"role": "user", "content": "Is 17 prime?"}]
+
+    responses = await asyncio.gather(*(client.create(messages) for _ in range(3)))
+
+    assert chat_client.chat.completions.create.call_count == 1
+    assert all(response.error == "upstream down" for response in responses)
+    assert all(response.error_type == "Exception" for response in responses)
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from concurrent_openai.budget import Budget
+from concurrent_openai.exceptions import BudgetExceededError
+from concurrent_openai.pricing import MODEL_PRICING, get_model_pricing
+
+
+@pytest.mark.asyncio
+async def test_reserve_and_reconcile():
+    budget = Budget(1.0)
+
+    await budget.reserve(0.4)
+    await budget.reserve(0.4)
+    assert budget.reserved == pytest.approx(0.8)
+    assert budget.remaining == pytest.approx(0.2)
+
+    budget.reconcile(0.4, 0.1)
+    budget.release(0.4)
+    assert budget.spent == pytest.approx(0.1)
+    assert budget.reserved == pytest.approx(0.0)
+    assert budget.remaining == pytest.approx(0.9)
+
+
+@pytest.mark.asyncio
+async def test_raise_when_exhausted():
+    budget = Budget(1.0, name="tenant-a")
+    await budget.reserve(0.8)
+
+    with pytest.raises(BudgetExceededError, match="tenant-a"):
+        await budget.reserve(0.3)
+
+    # The failed reservation does not consume anything
+    assert budget.reserved == pytest.approx(0.8)
+
+
+@pytest.mark.asyncio
+async def test_wait_when_exhausted():
+    budget = Budget(1.0, on_exhausted="wait")
+    await budget.reserve(0.8)
+
+    waiter = asyncio.create_task(budget.reserve(0.5))
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    # Reconciling at a lower actual cost frees enough room for the queued request
+    budget.reconcile(0.8, 0.2)
+    await asyncio.wait_for(waiter, timeout=1)
+    assert budget.reserved == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+async def test_wait_raises_when_request_can_never_fit():
+    budget = Budget(1.0, on_exhausted="wait")
+    await budget.reserve(0.5)
+    budget.reconcile(0.5, 0.9)
+
+    with pytest.raises(BudgetExceededError):
+        await asyncio.wait_for(budget.reserve(0.2), timeout=1)
+
+
+def test_invalid_budget():
+    with pytest.raises(ValueError):
+        Budget(0)
+    with pytest.raises(ValueError):
+        Budget(1.0, on_exhausted="ignore")  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize(
+    "model, prefix",
+    [
+        ("gpt-4o", "gpt-4o"),
+        ("gpt-4o-2024-08-06", "gpt-4o"),
+        ("gpt-4o-mini-2024-07-18", "gpt-4o-mini"),
+        ("gpt-4-turbo-2024-04-09", "gpt-4-turbo"),
+        ("gpt-4-0613", "gpt-4"),
+        ("gpt-4-32k-0613", "gpt-4-32k"),
+        ("gpt-4.1-nano", "gpt-4.1-nano"),
+        ("gpt-4.5-preview", "gpt-4.5-preview"),
+        ("o1-pro-2025-03-19", "o1-pro"),
+        ("o3-pro", "o3-pro"),
+        ("chatgpt-4o-latest", "chatgpt-4o-latest"),
+    ],
+)
+def test_get_model_pricing(model, prefix):
+    assert get_model_pricing(model) == MODEL_PRICING[prefix]
+
+
+@pytest.mark.parametrize(
+    "model", ["my-fine-tuned-model", "gpt-4o-search-preview", "o3-deep-research", "gpt-4-0613x"]
+)
+def test_get_model_pricing_unknown_model(model):
+    """Variants are not priced like the model their name starts with."""
+    assert get_model_pricing(model) is None
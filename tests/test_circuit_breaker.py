@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock
+
+import openai
+import pytest
+
+from concurrent_openai.circuit_breaker import CircuitBreaker, is_upstream_failure
+from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.exceptions import CircuitOpenError
+
+KEY = ("chat.completions", "gpt-4o")
+
+
+def test_opens_on_error_rate():
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, window_size=4, minimum_requests=4)
+
+    for failed in (False, True, False):
+        breaker.acquire(KEY)
+        (breaker.record_failure if failed else breaker.record_success)(
+            KEY, *(() if failed else (0.1,))
+        )
+    assert breaker.state(KEY) == "closed"
+
+    breaker.acquire(KEY)
+    breaker.record_failure(KEY)
+    assert breaker.state(KEY) == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire(KEY)
+
+    # Other endpoints and models have their own circuit
+    assert breaker.acquire(("chat.completions", "gpt-4o-mini")) is False
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(latency_threshold=1.0, window_size=2, minimum_requests=2)
+
+    for _ in range(2):
+        breaker.acquire(KEY)
+        breaker.record_success(KEY, latency=5.0)
+
+    assert breaker.state(KEY) == "open"
+
+
+def test_half_open_probe():
+    breaker = CircuitBreaker(window_size=1, minimum_requests=1, open_duration=0.0)
+    breaker.acquire(KEY)
+    breaker.record_failure(KEY)
+    assert breaker.state(KEY) == "half_open"
+
+    # A single probe is let through; a failed probe re-opens the circuit
+    assert breaker.acquire(KEY) is True
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire(KEY)
+    breaker.record_failure(KEY, probe=True)
+    assert breaker._circuits[KEY].state == "open"
+
+    # A probe that never reached the upstream frees its slot
+    assert breaker.acquire(KEY) is True
+    breaker.release(KEY, probe=True)
+
+    # A successful probe closes the circuit
+    assert breaker.acquire(KEY) is True
+    breaker.record_success(KEY, latency=0.1, probe=True)
+    assert breaker.state(KEY) == "closed"
+    assert breaker.acquire(KEY) is False
+
+
+def test_is_upstream_failure():
+    assert is_upstream_failure(RuntimeError("connection reset"))
+    assert is_upstream_failure(MagicMock(status_code=429))
+    assert is_upstream_failure(MagicMock(status_code=503))
+    assert not is_upstream_failure(MagicMock(status_code=400))
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        CircuitBreaker(failure_rate_threshold=0)
+    with pytest.raises(ValueError):
+        CircuitBreaker(window_size=5, minimum_requests=10)
+
+
+@pytest.mark.asyncio
+async def test_client_fails_fast_while_open(mocked_client):
+    mocked_client.chat.completions.create.side_effect = RuntimeError("upstream down")
+    breaker = CircuitBreaker(window_size=3, minimum_requests=3, open_duration=60.0)
+    client = ConcurrentOpenAI(
+        client=mocked_client, max_concurrent_requests=1, circuit_breaker=breaker
+    )
+
+    responses = await client.create_many([[{"role": "user", "content": "Hi"}]] * 6)
+
+    assert [response.error_type for response in responses] == ["RuntimeError"] * 3 + [
+        "CircuitOpenError"
+    ] * 3
+    assert mocked_client.chat.completions.create.call_count == 3
+    assert breaker.state(("chat.completions", "gpt-3.5-turbo")) == "open"
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_open_the_circuit(mocked_client):
+    mocked_client.chat.completions.create.side_effect = openai.BadRequestError(
+        "Invalid request", response=MagicMock(status_code=400, headers={}), body=None
+    )
+    breaker = CircuitBreaker(window_size=2, minimum_requests=2)
+    client = ConcurrentOpenAI(client=mocked_client, circuit_breaker=breaker)
+
+    await client.create_many([[{"role": "user", "content": "Hi"}]] * 4)
+
+    assert breaker.state(("chat.completions", "gpt-3.5-turbo")) == "closed"
+    assert mocked_client.chat.completions.create.call_count == 4
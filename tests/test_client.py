@@ -5,40 +5,30 @@ from unittest.mock import AsyncMock, patch
 import pytest
 from dotenv import load_dotenv
 from openai import AsyncAzureOpenAI, AsyncOpenAI
-from openai.types.chat import ChatCompletion, ChatCompletionMessage
-from openai.types.chat.chat_completion import Choice
-from openai.types.completion_usage import CompletionUsage
+from openai.types import CreateEmbeddingResponse, Embedding
+from openai.types.completion_usage import PromptTokensDetails
+from openai.types.create_embedding_response import Usage
+from openai.types.responses import (
+    Response,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import (
+    InputTokensDetails,
+    OutputTokensDetails,
+)
 
+from concurrent_openai.budget import Budget
 from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.instrumentation import InMemoryInstrumentation
+from concurrent_openai.models import LeanCompletionResponse, UsageTable
+from concurrent_openai.pricing import MODEL_PRICING
+from concurrent_openai.rate_limiter import MaxBurst, SlidingWindowRateLimiter
 
 load_dotenv()
 
 
-@pytest.fixture
-def mocked_chat_completion() -> ChatCompletion:
-    return ChatCompletion(
-        id="chatcmpl-99XUGZR68HIAcvljfTyb5FYAxxtJH",
-        choices=[
-            Choice(
-                finish_reason="stop",
-                index=0,
-                logprobs=None,
-                message=ChatCompletionMessage(
-                    content="Hello! How can I assist you today?",
-                    role="assistant",
-                    function_call=None,
-                    tool_calls=None,
-                ),
-            )
-        ],
-        created=1712060704,
-        model="gpt-4-0613",
-        object="chat.completion",
-        system_fingerprint=None,
-        usage=CompletionUsage(completion_tokens=9, prompt_tokens=10, total_tokens=19),
-    )
-
-
 @pytest.mark.asyncio
 @pytest.mark.parametrize("semaphore_value", [1, 2, 3])
 async def test_concurrent_requests(semaphore_value, mocked_chat_completion):
@@ -94,6 +84,333 @@ async def test_concurrent_requests(semaphore_value, mocked_chat_completion):
         )
 
 
+@pytest.mark.asyncio
+async def test_lean_mode(mocked_client):
+    """Lean mode keeps only content, finish reason, usage and cost."""
+    client = ConcurrentOpenAI(client=mocked_client, input_token_cost=0.5, output_token_cost=1.0)
+
+    responses = await client.create_many(
+        messages_list=[[{"role": "user", "content": "Hi"}]] * 3, lean=True
+    )
+
+    assert all(isinstance(response, LeanCompletionResponse) for response in responses)
+    response = responses[0]
+    assert response.is_success
+    assert response.content == "Hello! How can I assist you today?"
+    assert response.finish_reason == "stop"
+    assert response.prompt_tokens == 10
+    assert response.completion_tokens == 9
+    assert response.total_cost == pytest.approx(10 * 0.5 + 9 * 1.0)
+    assert not hasattr(response, "__dict__")
+
+    table = UsageTable.from_responses(responses)
+    assert len(table) == 3
+    assert table.total_prompt_tokens == 30
+    assert table.total_completion_tokens == 27
+    assert table.total_cost == pytest.approx(3 * (10 * 0.5 + 9 * 1.0))
+    assert table.error_count == 0
+
+
+@pytest.mark.asyncio
+async def test_lean_mode_error(mocked_client):
+    mocked_client.chat.completions.create.side_effect = RuntimeError("boom")
+    client = ConcurrentOpenAI(client=mocked_client)
+
+    response = await client.create(messages=[{"role": "user", "content": "Hi"}], lean=True)
+
+    assert isinstance(response, LeanCompletionResponse)
+    assert not response.is_success
+    assert response.error == "boom"
+    assert response.content is None
+
+
+@pytest.mark.asyncio
+async def test_response_timings(mocked_client, mocked_chat_completion):
+    """Every response carries a per-stage breakdown, aggregated per model on the client."""
+
+    async def delayed_response(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return mocked_chat_completion
+
+    mocked_client.chat.completions.create.side_effect = delayed_response
+    client = ConcurrentOpenAI(client=mocked_client, requests_per_minute=600)
+
+    response = await client.create(messages=[{"role": "user", "content": "Hi"}], model="gpt-4o")
+
+    assert response.timings is not None
+    breakdown = response.timings.breakdown()
+    assert breakdown["http"] >= 0.045
+    assert breakdown["total"] >= breakdown["http"]
+
+    summary = client.latency_stats.summary()
+    assert summary["gpt-4o"]["http"]["count"] == 1
+    assert summary["gpt-4o"]["http"]["p50"] == pytest.approx(breakdown["http"], rel=0.05)
+
+
+@pytest.mark.asyncio
+async def test_instrumentation(mocked_client):
+    instrumentation = InMemoryInstrumentation()
+    client = ConcurrentOpenAI(
+        client=mocked_client,
+        tokens_per_minute=10_000,
+        input_token_cost=0.5,
+        output_token_cost=1.0,
+        instrumentation=instrumentation,
+    )
+
+    await client.create(messages=[{"role": "user", "content": "Hi"}], model="gpt-4o")
+    mocked_client.chat.completions.create.side_effect = RuntimeError("boom")
+    await client.create(messages=[{"role": "user", "content": "Hi"}], model="gpt-4o")
+
+    assert instrumentation.counter("requests", model="gpt-4o", status="success") == 1
+    assert instrumentation.counter("requests", model="gpt-4o", status="error") == 1
+    assert instrumentation.counter("errors", model="gpt-4o", error_type="RuntimeError") == 1
+    assert instrumentation.counter("actual_tokens", model="gpt-4o") == 19
+    assert instrumentation.counter("estimated_tokens", model="gpt-4o") > 0
+    assert instrumentation.counter("cost_usd", model="gpt-4o") == pytest.approx(14.0)
+    assert instrumentation.gauge("in_flight_requests") == 0
+    assert instrumentation.gauge("limiter_tokens", limiter="tokens") is not None
+    assert len(instrumentation.spans) == 2
+
+
+@pytest.mark.asyncio
+async def test_costs_from_price_table(mocked_client):
+    """Without explicit per-token costs the built-in price table is used."""
+    client = ConcurrentOpenAI(client=mocked_client, output_token_cost=1.0)
+
+    response = await client.create(messages=[{"role": "user", "content": "Hi"}], model="gpt-4o")
+
+    assert response.input_cost == pytest.approx(10 * 2.5 / 1_000_000)
+    # An explicit cost overrides the table even when given on its own
+    assert response.output_cost == pytest.approx(9 * 1.0)
+
+
+@pytest.mark.asyncio
+async def test_budget_admission(mocked_client):
+    """Requests are admitted on worst-case cost and reconciled against actual usage."""
+    budget = Budget(1.0)
+    client = ConcurrentOpenAI(
+        client=mocked_client,
+        token_safety_margin=0,
+        input_token_cost=0.001,
+        output_token_cost=0.01,
+        budget=budget,
+    )
+
+    response = await client.create(
+        messages=[{"role": "user", "content": "Hi"}], model="gpt-4o", max_tokens=50
+    )
+    assert response.is_success
+    assert budget.spent == pytest.approx(10 * 0.001 + 9 * 0.01)
+    assert budget.reserved == 0
+
+    # Worst case (50 completion tokens at 0.01 each) no longer fits in the remaining budget
+    tenant_budget = Budget(0.3, name="tenant")
+    response = await client.create(
+        messages=[{"role": "user", "content": "Hi"}],
+        model="gpt-4o",
+        max_tokens=50,
+        budget=tenant_budget,
+    )
+    assert not response.is_success
+    assert response.error_type == "BudgetExceededError"
+    assert mocked_client.chat.completions.create.call_count == 1
+    # The client-wide reservation is released when the tenant budget refuses the request
+    assert budget.reserved == 0
+
+
+@pytest.mark.asyncio
+async def test_budget_released_on_error(mocked_client):
+    mocked_client.chat.completions.create.side_effect = RuntimeError("boom")
+    budget = Budget(1.0)
+    client = ConcurrentOpenAI(
+        client=mocked_client, input_token_cost=0.001, output_token_cost=0.01, budget=budget
+    )
+
+    response = await client.create(messages=[{"role": "user", "content": "Hi"}], max_tokens=10)
+
+    assert not response.is_success
+    assert budget.spent == 0
+    assert budget.reserved == 0
+
+
+@pytest.mark.asyncio
+async def test_budget_default_max_completion_tokens_per_budget(mocked_client):
+    """Without max_tokens each budget reserves with its own default completion length."""
+    client = ConcurrentOpenAI(
+        client=mocked_client,
+        token_safety_margin=0,
+        input_token_cost=0.0,
+        output_token_cost=0.001,
+        budget=Budget(100.0),
+    )
+    tenant_budget = Budget(1.0, default_max_completion_tokens=100)
+
+    response = await client.create(
+        messages=[{"role": "user", "content": "Hi"}], budget=tenant_budget
+    )
+
+    assert response.is_success
+    assert tenant_budget.spent == pytest.approx(9 * 0.001)
+
+
+@pytest.mark.asyncio
+async def test_budget_with_unknown_pricing(mocked_client):
+    """A budget on a model without known pricing fails the request, not the whole batch."""
+    client = ConcurrentOpenAI(client=mocked_client, budget=Budget(1.0))
+
+    responses = await client.create_many(
+        [[{"role": "user", "content": "Hi"}]] * 2, model="ft:my-fine-tuned-model"
+    )
+
+    assert [response.error_type for response in responses] == ["UnknownPricingError"] * 2
+    mocked_client.chat.completions.create.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_budget_with_partial_pricing_of_unknown_model(mocked_client):
+    """An input price alone does not make the output of an unknown model free."""
+    client = ConcurrentOpenAI(client=mocked_client, budget=Budget(1.0), input_token_cost=0.001)
+
+    assert client.get_pricing("ft:my-fine-tuned-model") is None
+    response = await client.create(
+        messages=[{"role": "user", "content": "Hi"}], model="ft:my-fine-tuned-model"
+    )
+
+    assert response.error_type == "UnknownPricingError"
+    mocked_client.chat.completions.create.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cached_prompt_tokens_are_priced_separately(mocked_client, mocked_chat_completion):
+    mocked_chat_completion.usage.prompt_tokens_details = PromptTokensDetails(cached_tokens=4)
+    client = ConcurrentOpenAI(client=mocked_client)
+
+    response = await client.create(messages=[{"role": "user", "content": "Hi"}], model="gpt-4o")
+
+    pricing = MODEL_PRICING["gpt-4o"]
+    assert response.input_cost == pytest.approx(6 * pricing.input + 4 * pricing.cached_input)
+    assert response.cached_tokens == 4
+
+    lean = await client.create(
+        messages=[{"role": "user", "content": "Hi"}], model="gpt-4o", lean=True
+    )
+    assert lean.cached_tokens == 4
+    assert lean.input_cost == pytest.approx(response.input_cost)
+    assert UsageTable.from_responses([response, lean]).total_cached_tokens == 8
+
+
+@pytest.mark.asyncio
+async def test_create_many_prefix_order(mocked_client):
+    sent = []
+
+    async def record(messages, **kwargs):
+        sent.append(messages[-1]["content"])
+        return mocked_client.chat.completions.create.return_value
+
+    mocked_client.chat.completions.create.side_effect = record
+    client = ConcurrentOpenAI(client=mocked_client, max_concurrent_requests=1)
+    preambles = {"a": "Summarize the contract. " * 600, "b": "Translate the manual. " * 600}
+    groups = ["a", "b", "a", "b", "a"]
+    messages_list = [
+        [
+            {"role": "system", "content": preambles[group]},
+            {"role": "user", "content": f"{group}{i}"},
+        ]
+        for i, group in enumerate(groups)
+    ]
+
+    responses = await client.create_many(messages_list, model="gpt-4o", order="prefix")
+
+    assert sent == ["a0", "a2", "a4", "b1", "b3"]
+    assert len(responses) == 5 and all(response.is_success for response in responses)
+    # The estimates match those of input order
+    in_order = await client.create_many(messages_list, model="gpt-4o")
+    assert [r.estimated_total_tokens for r in responses] == [
+        r.estimated_total_tokens for r in in_order
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tools_are_sent(mocked_client):
+    client = ConcurrentOpenAI(client=mocked_client)
+    tools = [
+        {
+            "type": "function",
+            "function": {
+                "name": "get_time",
+                "description": "Get current time",
+                "parameters": {"type": "object", "properties": {}},
+            },
+        }
+    ]
+
+    await client.create(messages=[{"role": "user", "content": "Hi"}], tools=tools)
+
+    assert mocked_client.chat.completions.create.call_args.kwargs["tools"] == tools
+
+
+@pytest.mark.asyncio
+async def test_create_embedding(mocked_client):
+    mocked_client.embeddings = AsyncMock()
+    mocked_client.embeddings.create = AsyncMock(
+        return_value=CreateEmbeddingResponse(
+            data=[
+                Embedding(embedding=[0.3], index=1, object="embedding"),
+                Embedding(embedding=[0.1], index=0, object="embedding"),
+            ],
+            model="text-embedding-3-small",
+            object="list",
+            usage=Usage(prompt_tokens=4, total_tokens=4),
+        )
+    )
+    client = ConcurrentOpenAI(client=mocked_client, tokens_per_minute=10_000)
+
+    response = await client.create_embedding(["first", "second"])
+
+    assert response.is_success
+    assert response.embeddings == [[0.1], [0.3]]
+    assert response.prompt_tokens == 4
+    assert response.input_cost == pytest.approx(4 * 0.02 / 1_000_000)
+    assert client.token_limiter.tokens < 10_000
+
+
+@pytest.mark.asyncio
+async def test_create_response(mocked_client):
+    mocked_client.responses = AsyncMock()
+    mocked_client.responses.create = AsyncMock(
+        return_value=Response(
+            id="resp_1",
+            created_at=0,
+            model="gpt-4o",
+            object="response",
+            output=[
+                ResponseOutputMessage(
+                    id="msg_1",
+                    role="assistant",
+                    status="completed",
+                    type="message",
+                    content=[ResponseOutputText(type="output_text", text="Hi!", annotations=[])],
+                )
+            ],
+            parallel_tool_calls=False,
+            tool_choice="auto",
+            tools=[],
+            usage=ResponseUsage.model_construct(input_tokens=8, output_tokens=2, total_tokens=10),
+        )
+    )
+    client = ConcurrentOpenAI(client=mocked_client, input_token_cost=0.5, output_token_cost=1.0)
+
+    response = await client.create_response("Say hi", model="gpt-4o", instructions="Be brief")
+
+    assert response.is_success
+    assert response.content == "Hi!"
+    assert response.prompt_tokens == 8
+    assert response.completion_tokens == 2
+    assert response.total_cost == pytest.approx(8 * 0.5 + 2 * 1.0)
+    assert mocked_client.responses.create.call_args.kwargs["instructions"] == "Be brief"
+
+
 @pytest.mark.skipif(
     not os.getenv("ENABLE_COSTLY_TESTS") == "1", reason="ENABLE_COSTLY_TESTS is not '1'"
 )
@@ -177,3 +494,43 @@ async def test_azure_client_integration():
     assert response.openai_response.usage is not None
     assert response.openai_response.usage.prompt_tokens > 0
     assert response.openai_response.usage.completion_tokens > 0
+
+
+def test_env_file_is_only_loaded_on_request(mocked_client):
+    with patch("dotenv.load_dotenv") as load_dotenv_mock:
+        ConcurrentOpenAI(client=mocked_client)
+        load_dotenv_mock.assert_not_called()
+
+        ConcurrentOpenAI(client=mocked_client, load_env=True)
+        load_dotenv_mock.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_state_survives_restart(mocked_client, tmp_path):
+    options = {"requests_per_minute": 100, "rate_limit_state_dir": tmp_path}
+    client = ConcurrentOpenAI(client=mocked_client, **options)
+    await client.create(messages=[{"role": "user", "content": "Hi"}])
+    client.save_rate_limit_state()
+
+    restarted = ConcurrentOpenAI(client=mocked_client, **options)
+    assert 99 <= restarted.request_limiter.tokens < 100
+
+    cold = ConcurrentOpenAI(
+        client=mocked_client, requests_per_minute=100, rate_limit_initial_fill=0.25
+    )
+    assert cold.request_limiter.tokens == 25
+
+
+def test_sliding_window_rate_limit_algorithm(mocked_client):
+    client = ConcurrentOpenAI(
+        client=mocked_client,
+        requests_per_minute=100,
+        rate_limit_algorithm="sliding_window",
+        burst_policy=MaxBurst(0.5, interval=10),
+    )
+
+    assert isinstance(client.request_limiter, SlidingWindowRateLimiter)
+    assert client.request_limiter.window == 60
+    assert client.request_limiter.minimum_spacing == 0
+    with pytest.raises(ValueError):
+        ConcurrentOpenAI(client=mocked_client, requests_per_minute=1, rate_limit_algorithm="x")
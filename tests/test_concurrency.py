@@ -0,0 +1,161 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import openai
+import pytest
+
+from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.clock import VirtualClock
+from concurrent_openai.concurrency import (
+    AdaptiveConcurrencyLimiter,
+    ConcurrencyLimiter,
+    is_overload,
+)
+from concurrent_openai.instrumentation import CONCURRENCY_LIMIT, InMemoryInstrumentation
+
+
+@pytest.mark.asyncio
+async def test_limits_in_flight():
+    limiter = ConcurrencyLimiter(2)
+    await limiter.acquire()
+    await limiter.acquire()
+    assert limiter.locked()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.waiters == 1
+
+    limiter.release()
+    await waiter
+    assert limiter.in_flight == 2
+    assert limiter.waiters == 0
+
+
+@pytest.mark.asyncio
+async def test_resize_at_runtime():
+    limiter = ConcurrencyLimiter(1)
+    await limiter.acquire()
+    waiters = [asyncio.create_task(limiter.acquire()) for _ in range(3)]
+    await asyncio.sleep(0)
+
+    # Growing the limit lets waiting callers through right away
+    limiter.resize(3)
+    await asyncio.sleep(0)
+    assert limiter.in_flight == 3
+    assert limiter.waiters == 1
+
+    # Shrinking takes effect as requests complete
+    limiter.resize(1)
+    limiter.release()
+    limiter.release()
+    await asyncio.sleep(0)
+    assert limiter.in_flight == 1
+    assert not waiters[2].done()
+
+    limiter.release()
+    await asyncio.wait_for(waiters[2], timeout=1)
+
+    with pytest.raises(ValueError):
+        limiter.resize(0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    limiter = ConcurrencyLimiter(1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    limiter.release()
+
+    assert limiter.in_flight == 0
+    assert limiter.waiters == 0
+    assert not limiter.locked()
+
+
+def saturate(limiter: AdaptiveConcurrencyLimiter) -> None:
+    """Pretend every slot is in use, so the limiter is allowed to grow."""
+    limiter._in_flight = limiter.limit
+
+
+def test_adaptive_grows_while_latency_is_flat():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8)
+    for _ in range(200):
+        saturate(limiter)
+        limiter.record(0.1)
+
+    assert limiter.limit == 8
+    assert limiter.baseline_latency == pytest.approx(0.1)
+
+
+def test_adaptive_does_not_grow_when_idle():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+    for _ in range(100):
+        limiter.record(0.1)
+
+    assert limiter.limit == 4
+
+
+def test_adaptive_backs_off_on_overload():
+    instrumentation = InMemoryInstrumentation()
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=20, instrumentation=instrumentation)
+    limiter.record(0.1)
+
+    limiter.record(0.1, overloaded=True)
+    assert limiter.limit == 14
+    # Failures of requests sent before the decrease do not back off again
+    limiter.record(0.1, overloaded=True)
+    assert limiter.limit == 14
+    assert instrumentation.gauge(CONCURRENCY_LIMIT, limiter="concurrency") == 14
+
+
+def test_adaptive_backs_off_on_first_overload_at_clock_start():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=20, clock=VirtualClock())
+
+    limiter.record(0.5, overloaded=True)
+    assert limiter.limit == 14
+
+
+def test_adaptive_backs_off_on_latency_rise():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=20, latency_tolerance=2.0)
+    for _ in range(10):
+        limiter.record(0.1)
+
+    limiter.record(0.5)
+    assert limiter.limit == 14
+
+
+def test_adaptive_respects_bounds():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=4)
+    limiter.record(0.1, overloaded=True)
+    assert limiter.limit == 2
+
+    with pytest.raises(ValueError):
+        limiter.resize(5)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(initial_limit=10, max_limit=5)
+
+
+def test_is_overload():
+    assert is_overload(MagicMock(status_code=429))
+    assert is_overload(MagicMock(status_code=503))
+    assert not is_overload(MagicMock(status_code=400))
+    assert not is_overload(RuntimeError("boom"))
+
+
+@pytest.mark.asyncio
+async def test_client_feeds_back_rate_limit_errors(mocked_client):
+    mocked_client.chat.completions.create.side_effect = openai.RateLimitError(
+        "Rate limit reached", response=MagicMock(status_code=429, headers={}), body=None
+    )
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10)
+    client = ConcurrentOpenAI(client=mocked_client, max_concurrent_requests=limiter)
+
+    response = await client.create(messages=[{"role": "user", "content": "Hi"}])
+
+    assert response.error_type == "RateLimitError"
+    assert limiter.limit == 7
+    assert client.semaphore is limiter
@@ -0,0 +1,143 @@
+from unittest.mock import patch
+
+import pytest
+
+from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.context import fit_messages, get_context_window
+from concurrent_openai.exceptions import ContextWindowExceededError
+from concurrent_openai.utils import (
+    count_message_tokens,
+    count_total_tokens,
+    encode_messages,
+)
+
+CONVERSATION = [
+    {"role": "system", "content": "You are a helpful assistant."},
+    {"role": "user", "content": "What is the capital of France? " * 20},
+    {"role": "assistant", "content": "Paris."},
+    {"role": "user", "content": [{"type": "text", "text": "And of Italy? " * 80}]},
+    {"role": "assistant", "content": "Rome."},
+    {"role": "user", "content": "Thanks!"},
+]
+
+
+@pytest.fixture
+def small_window():
+    """Give gpt-4o a context window just below the size of `CONVERSATION`."""
+    window = count_total_tokens(CONVERSATION, None, "gpt-4o") - 10
+    with patch("concurrent_openai.context.get_context_window", return_value=window):
+        yield window
+
+
+def test_get_context_window():
+    assert get_context_window("gpt-4o") == 128_000
+    assert get_context_window("gpt-4o-2024-08-06") == 128_000
+    assert get_context_window("gpt-4") == 8_192
+    assert get_context_window("gpt-4-turbo-2024-04-09") == 128_000
+    assert get_context_window("gpt-4-1106-preview") == 128_000
+    assert get_context_window("gpt-4.1-mini") == 1_047_576
+    assert get_context_window("my-azure-deployment") is None
+
+
+def test_encode_messages_matches_count():
+    encoded = encode_messages(CONVERSATION, "gpt-4o")
+
+    assert sum(m.num_tokens for m in encoded) + 3 == count_message_tokens(CONVERSATION, "gpt-4o")
+    assert set(encoded[1].texts) == {None}
+    assert set(encoded[3].texts) == {0}
+
+
+def test_fitting_prompt_is_unchanged():
+    messages, tokens = fit_messages(CONVERSATION, None, "gpt-4o")
+
+    assert messages is CONVERSATION
+    assert tokens == count_total_tokens(CONVERSATION, None, "gpt-4o")
+
+
+def test_reject(small_window):
+    with pytest.raises(ContextWindowExceededError, match="does not fit"):
+        fit_messages(CONVERSATION, None, "gpt-4o")
+
+
+def test_max_output_tokens_are_reserved():
+    window = count_total_tokens(CONVERSATION, None, "gpt-4o") + 10
+    with patch("concurrent_openai.context.get_context_window", return_value=window):
+        fit_messages(CONVERSATION, None, "gpt-4o", max_output_tokens=10)
+        with pytest.raises(ContextWindowExceededError, match="reserved for output"):
+            fit_messages(CONVERSATION, None, "gpt-4o", max_output_tokens=11)
+
+
+def test_drop_oldest(small_window):
+    messages, tokens = fit_messages(CONVERSATION, None, "gpt-4o", policy="drop_oldest")
+
+    # The system prompt is kept and the oldest turn is dropped
+    assert messages == [CONVERSATION[0], *CONVERSATION[2:]]
+    assert tokens == count_total_tokens(messages, None, "gpt-4o")
+    assert tokens <= small_window
+
+
+def test_drop_oldest_drops_tool_results_with_their_call():
+    conversation = [
+        {"role": "assistant", "content": "", "tool_calls": []},
+        {"role": "tool", "content": "42 " * 50, "tool_call_id": "call_1"},
+        {"role": "user", "content": "Thanks!"},
+    ]
+    window = count_total_tokens(conversation, None, "gpt-4o") - 1
+    with patch("concurrent_openai.context.get_context_window", return_value=window):
+        messages, _ = fit_messages(conversation, None, "gpt-4o", policy="drop_oldest")
+
+    assert messages == [conversation[2]]
+
+
+def test_drop_oldest_keeps_the_last_message():
+    conversation = [CONVERSATION[0], CONVERSATION[1]]
+    window = count_total_tokens(conversation, None, "gpt-4o") - 1
+    with patch("concurrent_openai.context.get_context_window", return_value=window):
+        with pytest.raises(ContextWindowExceededError):
+            fit_messages(conversation, None, "gpt-4o", policy="drop_oldest")
+
+
+def test_truncate_longest(small_window):
+    messages, tokens = fit_messages(CONVERSATION, None, "gpt-4o", policy="truncate_longest")
+
+    # Only the longest text part is cut, the caller's messages are left alone
+    longest = CONVERSATION[3]["content"][0]["text"]
+    truncated = messages[3]["content"][0]["text"]
+    assert longest.startswith(truncated) and len(truncated) < len(longest)
+    assert [m for i, m in enumerate(messages) if i != 3] == [
+        m for i, m in enumerate(CONVERSATION) if i != 3
+    ]
+    assert CONVERSATION[3]["content"][0]["text"] == longest
+    assert tokens == small_window
+
+
+def test_truncate_longest_fails_without_text():
+    window = 20  # less than the messages without any text
+    with patch("concurrent_openai.context.get_context_window", return_value=window):
+        with pytest.raises(ContextWindowExceededError):
+            fit_messages(CONVERSATION, None, "gpt-4o", policy="truncate_longest")
+
+
+@pytest.mark.asyncio
+async def test_client_rejects_before_sending(mocked_client, small_window):
+    client = ConcurrentOpenAI(client=mocked_client, requests_per_minute=60)
+
+    response = await client.create(messages=CONVERSATION, model="gpt-4o")
+
+    assert response.error_type == "ContextWindowExceededError"
+    mocked_client.chat.completions.create.assert_not_called()
+    assert client.request_limiter.tokens == 60
+
+
+@pytest.mark.asyncio
+async def test_client_sends_trimmed_prompt(mocked_client, small_window):
+    client = ConcurrentOpenAI(client=mocked_client, context_policy="drop_oldest")
+
+    response = await client.create(messages=CONVERSATION, model="gpt-4o")
+
+    assert response.error is None
+    sent = mocked_client.chat.completions.create.call_args.kwargs["messages"]
+    assert sent == [CONVERSATION[0], *CONVERSATION[2:]]
+    assert response.estimated_total_tokens == (
+        count_total_tokens(sent, None, "gpt-4o") + client.token_safety_margin
+    )
@@ -0,0 +1,186 @@
+import asyncio
+import json
+
+import pytest
+
+from concurrent_openai.client import ConcurrentOpenAI
+from concurrent_openai.datasets import (
+    JsonlSink,
+    ParquetSink,
+    process_dataset,
+    read_arrow,
+    read_jsonl,
+    read_parquet,
+    result_row,
+)
+from concurrent_openai.models import LeanCompletionResponse
+
+
+def write_prompts(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            row = {"id": f"q{i}", "messages": [{"role": "user", "content": f"Question {i}"}]}
+            f.write(json.dumps(row) + "\n")
+
+
+class RecordingSink:
+    def __init__(self):
+        self.groups = []
+
+    def write(self, rows):
+        self.groups.append(rows)
+
+    def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_jsonl_round_trip(mocked_client, tmp_path):
+    write_prompts(tmp_path / "prompts.jsonl", 5)
+    client = ConcurrentOpenAI(client=mocked_client, input_token_cost=0.5, output_token_cost=1.0)
+
+    with JsonlSink(tmp_path / "results.jsonl") as sink:
+        summary = await process_dataset(
+            client,
+            read_jsonl(tmp_path / "prompts.jsonl"),
+            sink,
+            passthrough_columns=["id"],
+            model="gpt-4o",
+        )
+
+    assert (summary.rows, summary.succeeded, summary.failed) == (5, 5, 0)
+    assert summary.prompt_tokens == 50
+    assert summary.total_cost == pytest.approx(5 * (10 * 0.5 + 9 * 1.0))
+
+    results = sorted(read_jsonl(tmp_path / "results.jsonl"), key=lambda row: row["row"])
+    assert [row["id"] for row in results] == [f"q{i}" for i in range(5)]
+    assert results[0]["content"] == "Hello! How can I assist you today?"
+    assert results[0]["completion_tokens"] == 9
+    assert results[0]["error"] is None
+    assert results[0]["http_seconds"] >= 0
+    assert mocked_client.chat.completions.create.call_args.kwargs["model"] == "gpt-4o"
+
+
+@pytest.mark.asyncio
+async def test_rows_are_read_lazily_and_written_in_groups(mocked_client):
+    in_flight = max_in_flight = 0
+    consumed = 0
+
+    async def slow_completion(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return mocked_client.chat.completions.create.return_value
+
+    def rows():
+        nonlocal consumed
+        for i in range(25):
+            consumed += 1
+            # Never more than max_in_flight rows ahead of the written ones
+            assert consumed - sum(len(group) for group in sink.groups) <= 4 + 10
+            yield {"messages": [{"role": "user", "content": f"Question {i}"}]}
+
+    mocked_client.chat.completions.create.side_effect = slow_completion
+    client = ConcurrentOpenAI(client=mocked_client)
+    sink = RecordingSink()
+
+    summary = await process_dataset(client, rows(), sink, max_in_flight=4, row_group_size=10)
+
+    assert summary.rows == 25
+    assert max_in_flight <= 4
+    assert [len(group) for group in sink.groups] == [10, 10, 5]
+    assert sorted(row["row"] for group in sink.groups for row in group) == list(range(25))
+
+
+@pytest.mark.asyncio
+async def test_invalid_rows_fail_individually(mocked_client):
+    client = ConcurrentOpenAI(client=mocked_client)
+    sink = RecordingSink()
+    rows = [
+        {"messages": json.dumps([{"role": "user", "content": "Hi"}])},
+        {"messages": "not json"},
+        {"prompt": "wrong column"},
+        {"messages": ["not a message"]},
+    ]
+
+    summary = await process_dataset(client, rows, sink)
+
+    results = sorted(sink.groups[0], key=lambda row: row["row"])
+    assert (summary.succeeded, summary.failed) == (1, 3)
+    assert results[0]["error"] is None
+    assert [row["error_type"] for row in results[1:]] == [
+        "InvalidRow",
+        "InvalidRow",
+        "AttributeError",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_parquet_round_trip(mocked_client, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.Table.from_pylist(
+        [
+            {"id": i, "messages": [{"role": "user", "content": f"Question {i}", "name": None}]}
+            for i in range(7)
+        ]
+    )
+    pq.write_table(table, tmp_path / "prompts.parquet")
+    client = ConcurrentOpenAI(client=mocked_client)
+
+    with ParquetSink(tmp_path / "results.parquet") as sink:
+        await process_dataset(
+            client,
+            read_parquet(tmp_path / "prompts.parquet"),
+            sink,
+            passthrough_columns=["id"],
+            row_group_size=3,
+        )
+
+    results = pq.ParquetFile(tmp_path / "results.parquet")
+    assert results.metadata.num_row_groups == 3
+    output = results.read().to_pylist()
+    assert sorted(row["id"] for row in output) == list(range(7))
+    assert all(row["prompt_tokens"] == 10 for row in output)
+    assert "name" not in mocked_client.chat.completions.create.call_args.kwargs["messages"][0]
+    assert len(list(read_arrow(table, batch_size=2))) == 7
+
+
+@pytest.mark.asyncio
+async def test_lean_argument_is_accepted(mocked_client):
+    client = ConcurrentOpenAI(client=mocked_client)
+    sink = RecordingSink()
+
+    rows = [{"messages": [{"role": "user", "content": "Hi"}]}] * 2
+    summary = await process_dataset(client, rows, sink, lean=False)
+
+    assert summary.succeeded == 2
+
+
+def test_parquet_sink_widens_null_columns(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    result = result_row(0, LeanCompletionResponse(content="ok"))
+
+    with ParquetSink(tmp_path / "results.parquet") as sink:
+        sink.write([{"id": None, **result}, {"id": None, **result}])
+        sink.write([{"id": "q2", **result}])
+        sink.write([{"id": None, **result}, {"id": "q4", **result}])
+
+    table = pq.read_table(tmp_path / "results.parquet")
+    assert table.schema.field("id").type == pa.string()
+    assert table.column("id").to_pylist() == [None, None, "q2", None, "q4"]
+
+
+def test_parquet_sink_takes_a_passthrough_schema(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    result = result_row(0, LeanCompletionResponse(content="ok"))
+
+    with ParquetSink(tmp_path / "results.parquet", schema=pa.schema([("id", pa.int64())])) as sink:
+        sink.write([{"id": None, **result}])
+        sink.write([{"id": 7, **result}])
+
+    assert pq.read_table(tmp_path / "results.parquet").column("id").to_pylist() == [None, 7]
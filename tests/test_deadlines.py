@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from concurrent_openai.client import ConcurrentOpenAI
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+
+
+@pytest.mark.asyncio
+async def test_timeout_covers_the_api_call(mocked_client, mocked_chat_completion):
+    async def slow_response(*args, **kwargs):
+        await asyncio.sleep(1.0)
+        return mocked_chat_completion
+
+    mocked_client.chat.completions.create.side_effect = slow_response
+    client = ConcurrentOpenAI(client=mocked_client)
+
+    start = time.monotonic()
+    response = await client.create(MESSAGES, timeout=0.05)
+
+    assert time.monotonic() - start < 0.5
+    assert response.error_type == "DeadlineExceededError"
+    assert client._in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_unreachable_deadline_is_rejected_before_sending(mocked_client):
+    client = ConcurrentOpenAI(client=mocked_client, requests_per_minute=60)
+    await client.create(MESSAGES)
+
+    # The next request slot is a second away
+    start = time.monotonic()
+    response = await client.create(MESSAGES, deadline=time.monotonic() + 0.2)
+
+    assert time.monotonic() - start < 0.1
+    assert response.error_type == "DeadlineExceededError"
+    assert mocked_client.chat.completions.create.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline(mocked_client):
+    client = ConcurrentOpenAI(client=mocked_client)
+
+    response = await client.create(MESSAGES, deadline=time.monotonic() - 1)
+
+    assert response.error_type == "DeadlineExceededError"
+    mocked_client.chat.completions.create.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_deadline_while_waiting_for_a_slot(mocked_client, mocked_chat_completion):
+    async def slow_response(*args, **kwargs):
+        await asyncio.sleep(0.2)
+        return mocked_chat_completion
+
+    mocked_client.chat.completions.create.side_effect = slow_response
+    client = ConcurrentOpenAI(client=mocked_client, max_concurrent_requests=1)
+
+    first, second = await asyncio.gather(
+        client.create(MESSAGES), client.create(MESSAGES, timeout=0.05)
+    )
+
+    assert first.is_success
+    assert second.error_type == "DeadlineExceededError"
+    assert mocked_client.chat.completions.create.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_cancellation_refunds_limiter_tokens(mocked_client):
+    client = ConcurrentOpenAI(client=mocked_client, requests_per_minute=600, tokens_per_minute=600)
+    # Drain the token bucket so the request takes a request token, then waits for tokens
+    await client.token_limiter.acquire(600)
+    request_tokens = client.request_limiter.tokens
+
+    task = asyncio.create_task(client.create(MESSAGES))
+    await asyncio.sleep(0.05)
+    assert client.token_limiter.waiters == 1
+    assert client.request_limiter.tokens == pytest.approx(request_tokens - 1, abs=0.1)
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert client.request_limiter.tokens == pytest.approx(request_tokens, abs=0.1)
+    assert client.token_limiter.waiters == 0
+    mocked_client.chat.completions.create.assert_not_called()
@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.completion_usage import CompletionUsage
+
+from concurrent_openai.budget import Budget
+from concurrent_openai.executor import ShardedExecutor
+from concurrent_openai.instrumentation import Instrumentation
+from concurrent_openai.rate_limiter import SharedRateLimiter
+
+
+def echo_client_factory():
+    """Module-level client factory, importable by spawned worker processes."""
+
+    async def create(messages, model, **kwargs):
+        await asyncio.sleep(0.01)
+        return ChatCompletion(
+            id="chatcmpl-echo",
+            choices=[
+                Choice(
+                    finish_reason="stop",
+                    index=0,
+                    message=ChatCompletionMessage(
+                        role="assistant", content=messages[-1]["content"]
+                    ),
+                )
+            ],
+            created=0,
+            model=model,
+            object="chat.completion",
+            usage=CompletionUsage(completion_tokens=1, prompt_tokens=5, total_tokens=6),
+        )
+
+    client = AsyncMock()
+    client.chat.completions.create = create
+    return client
+
+
+@pytest.mark.asyncio
+async def test_shared_rate_limiter_state():
+    limiter = SharedRateLimiter(capacity=10, fill_rate=1)
+    await limiter.acquire(4)
+    assert limiter.tokens == pytest.approx(6, abs=0.01)
+    assert limiter._last_request_time is not None
+
+    # The pickled copy (as sent to a worker) shares the same bucket
+    copy = SharedRateLimiter.__new__(SharedRateLimiter)
+    copy.__setstate__(limiter.__getstate__())
+    await copy.acquire(6)
+    assert limiter.tokens == pytest.approx(0, abs=0.01)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ordered", [True, False])
+async def test_sharded_create_many(ordered):
+    messages_list = [[{"role": "user", "content": f"message {i}"}] for i in range(20)]
+
+    async with ShardedExecutor(
+        processes=2, client_factory=echo_client_factory, max_concurrent_requests=4
+    ) as executor:
+        results = [item async for item in executor.stream(messages_list, ordered=ordered)]
+        responses = await executor.create_many(messages_list, lean=True)
+
+    indices = [index for index, _ in results]
+    assert sorted(indices) == list(range(20))
+    if ordered:
+        assert indices == list(range(20))
+    assert all(response.content == f"message {index}" for index, response in results)
+
+    assert [response.content for response in responses] == [f"message {i}" for i in range(20)]
+
+
+@pytest.mark.asyncio
+async def test_sharded_global_rate_limit():
+    """The RPM budget is enforced across all workers, not per worker."""
+    messages_list = [[{"role": "user", "content": f"message {i}"}] for i in range(6)]
+
+    async with ShardedExecutor(
+        processes=3, client_factory=echo_client_factory, requests_per_minute=600
+    ) as executor:
+        # Warm up the workers so process start-up does not count
+        await executor.create_many(messages_list[:3])
+        start = time.monotonic()
+        responses = await executor.create_many(messages_list)
+        elapsed = time.monotonic() - start
+
+    assert all(response.is_success for response in responses)
+    # 600 RPM with minimum spacing allows one request every 0.1s globally
+    assert elapsed >= 0.5
+
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_drops_queued_requests():
+    """Breaking out of a stream stops feeding and drops requests no worker has started."""
+    messages_list = [[{"role": "user", "content": f"message {i}"}] for i in range(50)]
+
+    async with ShardedExecutor(
+        processes=1,
+        client_factory=echo_client_factory,
+        max_concurrent_requests=1,
+        requests_per_minute=120,
+    ) as executor:
+        stream = executor.stream(messages_list)
+        async for _ in stream:
+            break
+        await stream.aclose()
+        assert executor._task_queue.empty()
+
+        # Results of the requests still running are skipped by the next stream
+        responses = await executor.create_many(messages_list[:2])
+
+    assert [response.content for response in responses] == ["message 0", "message 1"]
+
+
+def crashing_client_factory():
+    """Module-level client factory whose worker process dies on start."""
+    os._exit(3)
+
+
+@pytest.mark.asyncio
+async def test_sharded_executor_recovers_from_dead_workers():
+    executor = ShardedExecutor(processes=2, client_factory=crashing_client_factory)
+    messages_list = [[{"role": "user", "content": "message"}]] * 4
+
+    for _ in range(2):
+        # Every call starts fresh workers instead of hanging on the dead ones
+        with pytest.raises(RuntimeError, match="exited unexpectedly"):
+            await asyncio.wait_for(executor.create_many(messages_list), timeout=30)
+        assert executor._workers == []
+
+
+def test_sharded_executor_rejects_per_process_options():
+    with pytest.raises(ValueError, match="budget"):
+        ShardedExecutor(budget=Budget(1.0))
+    with pytest.raises(ValueError, match="instrumentation"):
+        ShardedExecutor(instrumentation=Instrumentation())
@@ -0,0 +1,67 @@
+import pytest
+
+from concurrent_openai.instrumentation import (
+    InMemoryInstrumentation,
+    Instrumentation,
+    OpenTelemetryInstrumentation,
+    PrometheusInstrumentation,
+)
+
+
+def test_noop_instrumentation():
+    instrumentation = Instrumentation()
+    instrumentation.increment("requests", model="gpt-4o")
+    instrumentation.set_gauge("in_flight_requests", 3)
+    instrumentation.observe("request_latency_seconds", 0.5, stage="http")
+    with instrumentation.span("concurrent_openai.create", model="gpt-4o"):
+        pass
+
+
+def test_in_memory_instrumentation():
+    instrumentation = InMemoryInstrumentation()
+    instrumentation.increment("requests", model="gpt-4o", status="success")
+    instrumentation.increment("requests", 2, status="success", model="gpt-4o")
+    instrumentation.set_gauge("limiter_tokens", 10, limiter="tokens")
+    instrumentation.set_gauge("limiter_tokens", 5, limiter="tokens")
+    with instrumentation.span("concurrent_openai.create", model="gpt-4o"):
+        pass
+
+    assert instrumentation.counter("requests", model="gpt-4o", status="success") == 3
+    assert instrumentation.counter("requests", model="gpt-4o", status="error") == 0
+    assert instrumentation.gauge("limiter_tokens", limiter="tokens") == 5
+    assert instrumentation.spans == [("concurrent_openai.create", {"model": "gpt-4o"})]
+
+
+def test_prometheus_instrumentation():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    instrumentation = PrometheusInstrumentation(registry=registry)
+
+    instrumentation.increment("requests", model="gpt-4o", status="success")
+    instrumentation.set_gauge("in_flight_requests", 2)
+    instrumentation.observe("limiter_wait_seconds", 0.25, limiter="tokens")
+
+    assert (
+        registry.get_sample_value(
+            "concurrent_openai_requests_total", {"model": "gpt-4o", "status": "success"}
+        )
+        == 1
+    )
+    assert registry.get_sample_value("concurrent_openai_in_flight_requests") == 2
+    assert (
+        registry.get_sample_value(
+            "concurrent_openai_limiter_wait_seconds_sum", {"limiter": "tokens"}
+        )
+        == 0.25
+    )
+
+
+def test_opentelemetry_instrumentation():
+    pytest.importorskip("opentelemetry")
+    instrumentation = OpenTelemetryInstrumentation()
+
+    instrumentation.increment("requests", model="gpt-4o", status="success")
+    instrumentation.set_gauge("in_flight_requests", 2)
+    instrumentation.observe("limiter_wait_seconds", 0.25, limiter="tokens")
+    with instrumentation.span("concurrent_openai.create", model="gpt-4o"):
+        pass
@@ -0,0 +1,60 @@
+import openai
+import pytest
+from openai import AsyncOpenAI
+
+from benchmarks.mock_server import MockOpenAIServer, parse_latency
+from benchmarks.run import measure_result_memory
+
+MESSAGES = [{"role": "user", "content": "Hello there"}]
+
+
+@pytest.mark.asyncio
+async def test_mock_server_enforces_quota():
+    async with MockOpenAIServer(latency="constant:0", requests_per_minute=2) as server:
+        openai_client = AsyncOpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+
+        raw = await openai_client.chat.completions.with_raw_response.create(
+            messages=MESSAGES, model="gpt-4o", n=2, max_tokens=4
+        )
+        completion = raw.parse()
+        assert [choice.index for choice in completion.choices] == [0, 1]
+        assert completion.usage.completion_tokens == 8
+        assert raw.headers["x-ratelimit-limit-requests"] == "2"
+        assert raw.headers["x-ratelimit-remaining-requests"] == "1"
+
+        await openai_client.chat.completions.create(messages=MESSAGES, model="gpt-4o")
+        with pytest.raises(openai.RateLimitError) as exc_info:
+            await openai_client.chat.completions.create(messages=MESSAGES, model="gpt-4o")
+        assert exc_info.value.response.headers["x-ratelimit-remaining-requests"] == "0"
+        assert "retry-after" in exc_info.value.response.headers
+
+        stats = await openai_client.get("/stats", cast_to=object)
+        await openai_client.close()
+
+    assert stats["requests"] == 3
+    assert stats["completed"] == 2
+    assert stats["rate_limited"] == 1
+    assert sum(stats["requests_per_window"].values()) == 2
+
+
+@pytest.mark.asyncio
+async def test_mock_server_injects_errors():
+    async with MockOpenAIServer(latency="constant:0", error_rate=1.0) as server:
+        openai_client = AsyncOpenAI(base_url=server.base_url, api_key="test", max_retries=0)
+        with pytest.raises(openai.RateLimitError):
+            await openai_client.chat.completions.create(messages=MESSAGES, model="gpt-4o")
+        await openai_client.close()
+
+    assert server.stats.injected_errors == 1
+    assert server.stats.completed == 0
+
+
+def test_parse_latency():
+    assert parse_latency("constant:0.25")(None) == 0.25
+    with pytest.raises(ValueError):
+        parse_latency("gaussian:1:2")
+
+
+def test_lean_results_use_less_memory():
+    memory = measure_result_memory(count=1000)
+    assert 0 < memory["lean_bytes"] < memory["full_bytes"]
@@ -1,9 +1,17 @@
 import asyncio
 import time
+from unittest.mock import patch
 
 import pytest
 
-from concurrent_openai.rate_limiter import RateLimiter
+from concurrent_openai.exceptions import DeadlineExceededError
+from concurrent_openai.instrumentation import InMemoryInstrumentation
+from concurrent_openai.rate_limiter import (
+    MaxBurst,
+    QuantizedBurst,
+    RateLimiter,
+    SlidingWindowRateLimiter,
+)
 
 
 def truncate(value: float, decimals: int = 3) -> float:
@@ -151,3 +159,206 @@ async def test_parallel_acquisitions():
 
     # Third task should wait ~2 seconds
     assert results_sorted[2][1] == pytest.approx(2.0, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_instrumentation():
+    """The limiter reports its bucket level, waiters and wait times."""
+    instrumentation = InMemoryInstrumentation()
+    limiter = RateLimiter(capacity=2, fill_rate=20, name="tokens", instrumentation=instrumentation)
+
+    await asyncio.gather(*(limiter.acquire(1) for _ in range(3)))
+
+    assert instrumentation.gauge("limiter_waiters", limiter="tokens") == 0
+    assert instrumentation.gauge("limiter_tokens", limiter="tokens") == pytest.approx(0, abs=0.1)
+    waits = instrumentation.observations["limiter_wait_seconds", (("limiter", "tokens"),)]
+    assert len(waits) == 3
+    assert max(waits) == pytest.approx(0.05, abs=0.02)
+    assert limiter.waiters == 0
+
+
+@pytest.mark.asyncio
+async def test_low_tokens_warning_is_throttled():
+    """The low-bucket warning is logged at most once per interval."""
+    limiter = RateLimiter(capacity=100, fill_rate=1, low_tokens_warning_interval=60)
+
+    with patch("concurrent_openai.rate_limiter.LOGGER") as logger:
+        for _ in range(99):
+            await limiter.acquire(1)
+
+    assert logger.warning.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_deadline_rejects_early():
+    limiter = RateLimiter(capacity=10, fill_rate=1)
+    await limiter.acquire(10)
+
+    # 5 tokens need ~5s of refill, which is past the deadline: rejected without sleeping
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        await limiter.acquire(5, deadline=time.monotonic() + 1.0)
+    assert time.monotonic() - start < 0.1
+    assert limiter.waiters == 0
+
+    # A reachable deadline waits as usual
+    await limiter.acquire(0.05, deadline=time.monotonic() + 1.0)
+
+
+@pytest.mark.asyncio
+async def test_release_refunds_tokens():
+    limiter = RateLimiter(capacity=10, fill_rate=0.001)
+    await limiter.acquire(6)
+    assert limiter.tokens == pytest.approx(4, abs=0.01)
+
+    limiter.release(6)
+    assert limiter.tokens == pytest.approx(10, abs=0.01)
+
+    # Refunds never overfill the bucket
+    limiter.release(5)
+    assert limiter.tokens == pytest.approx(10)
+
+
+@pytest.mark.asyncio
+async def test_cold_start():
+    limiter = RateLimiter(capacity=10, fill_rate=100, initial_tokens=0)
+    assert limiter.tokens == 0
+
+    start = time.monotonic()
+    await limiter.acquire(5)
+    assert time.monotonic() - start >= 0.04
+
+    with pytest.raises(ValueError):
+        RateLimiter(capacity=10, fill_rate=1, initial_tokens=11)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_and_restore():
+    limiter = RateLimiter(capacity=100, fill_rate=1, minimum_spacing=5)
+    await limiter.acquire(60)
+
+    restored = RateLimiter(capacity=100, fill_rate=1, minimum_spacing=5)
+    restored.restore(limiter.snapshot())
+
+    assert restored.tokens == pytest.approx(40, abs=0.1)
+    # The spacing since the last request carries over as well
+    assert restored._calculate_wait_time(time.monotonic(), 1) == pytest.approx(5, abs=0.1)
+
+
+def test_restore_refills_for_the_downtime():
+    limiter = RateLimiter(capacity=100, fill_rate=1)
+    state = {**limiter.snapshot(), "tokens": 10}
+    state["last_refill_at"] -= 30
+    state["saved_at"] -= 30
+
+    limiter.restore(state)
+    assert limiter.tokens == pytest.approx(40, abs=0.1)
+
+    # A bucket persisted with a larger capacity is capped at the new one
+    limiter = RateLimiter(capacity=20, fill_rate=1)
+    limiter.restore({**state, "capacity": 100})
+    assert limiter.tokens == 20
+
+
+@pytest.mark.asyncio
+async def test_state_file(tmp_path):
+    path = tmp_path / "tokens.json"
+    limiter = RateLimiter(capacity=100, fill_rate=0.01, state_file=path, save_interval=0)
+    await limiter.acquire(70)
+    assert path.exists()
+
+    # A new process continues where the previous one stopped instead of starting full
+    restarted = RateLimiter(capacity=100, fill_rate=0.01, state_file=path)
+    assert restarted.tokens == pytest.approx(30, abs=0.1)
+
+
+def test_unreadable_state_file_is_ignored(tmp_path):
+    path = tmp_path / "tokens.json"
+    path.write_text("not json")
+
+    limiter = RateLimiter(capacity=100, fill_rate=1, initial_tokens=50, state_file=path)
+
+    assert limiter.tokens == 50
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_allows_bursts_up_to_the_quota():
+    limiter = SlidingWindowRateLimiter(10, window=0.2)
+
+    start = time.monotonic()
+    for _ in range(10):
+        await limiter.acquire(1)
+    assert time.monotonic() - start < 0.05
+    assert limiter.tokens == 0
+
+    # The next request waits until the oldest spend leaves the window
+    await limiter.acquire(1)
+    assert time.monotonic() - start >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_waits_for_enough_spend_to_expire():
+    limiter = SlidingWindowRateLimiter(10, window=0.3)
+    await limiter.acquire(6)
+    await asyncio.sleep(0.1)
+    await limiter.acquire(4)
+
+    start = time.monotonic()
+    await limiter.acquire(5)
+    # Only the first request has to expire, not the whole window
+    assert 0.15 <= time.monotonic() - start < 0.28
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_skew_keeps_spend_past_the_window():
+    limiter = SlidingWindowRateLimiter(1, window=0.1, skew=0.1)
+    await limiter.acquire(1)
+
+    start = time.monotonic()
+    await limiter.acquire(1)
+    assert time.monotonic() - start >= 0.19
+
+
+@pytest.mark.asyncio
+async def test_max_burst_policy():
+    limiter = SlidingWindowRateLimiter(100, window=10, burst_policy=MaxBurst(0.1, interval=0.1))
+
+    await limiter.acquire(10)
+    start = time.monotonic()
+    await limiter.acquire(1)
+    assert time.monotonic() - start >= 0.09
+
+    # A request larger than the burst cap goes through once the interval is quiet
+    await asyncio.sleep(0.1)
+    await limiter.acquire(20)
+
+
+def test_quantized_burst_policy():
+    assert QuantizedBurst(1.0).limits(600, 60) == [(10, 1.0)]
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_release_and_cold_start():
+    limiter = SlidingWindowRateLimiter(10, window=60, initial_tokens=4)
+    assert limiter.tokens == pytest.approx(4)
+
+    await limiter.acquire(4)
+    limiter.release(3)
+    assert limiter.tokens == pytest.approx(3)
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_snapshot_and_restore(tmp_path):
+    path = tmp_path / "requests.json"
+    limiter = SlidingWindowRateLimiter(10, window=60, state_file=path)
+    await limiter.acquire(7)
+    limiter.save()
+
+    restarted = SlidingWindowRateLimiter(10, window=60, state_file=path)
+    assert restarted.tokens == pytest.approx(3)
+
+    # Spend older than the window is dropped
+    state = limiter.snapshot()
+    state["events"] = [[t - 61, cost] for t, cost in state["events"]]
+    restarted.restore(state)
+    assert restarted.tokens == 10
@@ -0,0 +1,52 @@
+from concurrent_openai.scheduling import prefix_key, prefix_order
+from concurrent_openai.utils import encode_messages
+
+
+def encode(system: str, user: str) -> list:
+    return encode_messages(
+        [{"role": "system", "content": system}, {"role": "user", "content": user}], "gpt-4o"
+    )
+
+
+def test_prefix_key_depends_only_on_leading_tokens():
+    preamble = "You are a meticulous reviewer. " * 300
+
+    key = prefix_key(encode(preamble, "first question"))
+    assert key is not None
+    assert prefix_key(encode(preamble, "second question")) == key
+    assert prefix_key(encode("Be brief. " + preamble, "first question")) != key
+
+
+def test_prefix_key_none_for_short_prompts():
+    assert prefix_key(encode("Be brief.", "Hi")) is None
+    assert prefix_key(encode("Be brief.", "Hi"), prefix_tokens=2) is not None
+
+
+def test_prefix_key_includes_roles_and_parts():
+    text = "Same words everywhere. " * 10
+    as_string = encode_messages([{"role": "user", "content": text}], "gpt-4o")
+    as_parts = encode_messages(
+        [{"role": "user", "content": [{"type": "text", "text": text}]}], "gpt-4o"
+    )
+    as_system = encode_messages([{"role": "system", "content": text}], "gpt-4o")
+
+    assert prefix_key(as_string, prefix_tokens=8) == prefix_key(as_parts, prefix_tokens=8)
+    assert prefix_key(as_string, prefix_tokens=8) != prefix_key(as_system, prefix_tokens=8)
+
+
+def test_prefix_key_includes_tools():
+    preamble = "You are a meticulous reviewer. " * 300
+    weather = [{"type": "function", "function": {"name": "get_weather", "parameters": {}}}]
+    time = [{"type": "function", "function": {"name": "get_time", "parameters": {}}}]
+
+    key = prefix_key(encode(preamble, "question"), tools=weather, tool_tokens=20)
+    assert key == prefix_key(encode(preamble, "question"), tools=weather, tool_tokens=20)
+    assert key != prefix_key(encode(preamble, "question"), tools=time, tool_tokens=20)
+    assert key != prefix_key(encode(preamble, "question"))
+    # Tool tokens count towards the cached prefix
+    assert prefix_key(encode("Be brief.", "Hi"), tools=weather, tool_tokens=1020) is not None
+
+
+def test_prefix_order_groups_by_first_appearance():
+    assert prefix_order(["a", "b", None, "a", "c", "b", None]) == [0, 3, 1, 5, 2, 4, 6]
+    assert prefix_order([]) == []
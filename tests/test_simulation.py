@@ -0,0 +1,151 @@
+import asyncio
+import time
+
+import pytest
+
+from concurrent_openai.clock import VirtualClock
+from concurrent_openai.models import STAGES
+from concurrent_openai.rate_limiter import RateLimiter, SlidingWindowRateLimiter
+from concurrent_openai.simulation import (
+    SimulatedAPIError,
+    SimulatedUpstream,
+    run_simulated,
+    simulate,
+)
+
+
+def prompts(count):
+    return ([{"role": "user", "content": f"Question {i}"}] for i in range(count))
+
+
+def test_virtual_loop_sleeps_without_waiting():
+    clock = VirtualClock()
+
+    async def main():
+        await asyncio.gather(asyncio.sleep(3600), asyncio.sleep(60))
+        return asyncio.get_running_loop().time()
+
+    wall_start = time.perf_counter()
+    assert run_simulated(main(), clock) == 3600
+    assert time.perf_counter() - wall_start < 1
+    assert clock.monotonic() == 3600
+
+
+def test_virtual_loop_timeouts_fire_on_virtual_time():
+    async def main():
+        with pytest.raises(TimeoutError):
+            async with asyncio.timeout(30):
+                await asyncio.sleep(3600)
+        return asyncio.get_running_loop().time()
+
+    assert run_simulated(main()) == pytest.approx(30)
+
+
+def test_virtual_clock_cannot_go_back():
+    clock = VirtualClock(start=5, epoch=1000)
+    clock.advance(2.5)
+    assert clock.monotonic() == 7.5
+    assert clock.time() == 1007.5
+    with pytest.raises(ValueError):
+        clock.advance(-1)
+
+
+def test_rate_limiter_on_virtual_clock():
+    clock = VirtualClock()
+    limiter = RateLimiter(capacity=10, fill_rate=10 / 60, clock=clock)
+
+    async def main():
+        for _ in range(30):
+            await limiter.acquire()
+
+    run_simulated(main(), clock)
+    # 10 from the full bucket, then one every 6 seconds
+    assert clock.monotonic() == pytest.approx(120, abs=0.01)
+
+
+def test_sliding_window_limiter_on_virtual_clock():
+    clock = VirtualClock()
+    limiter = SlidingWindowRateLimiter(10, 60, clock=clock)
+
+    async def main():
+        await asyncio.gather(*(limiter.acquire() for _ in range(25)))
+
+    run_simulated(main(), clock)
+    assert clock.monotonic() == pytest.approx(120, abs=0.01)
+
+
+def test_simulate_a_rate_limited_hour_in_seconds():
+    upstream = SimulatedUpstream(
+        latency="lognormal:2.0:0.5", requests_per_minute=100, completion_tokens=20
+    )
+    report = simulate(
+        prompts(3000),
+        upstream,
+        client_options={"requests_per_minute": 100, "max_concurrent_requests": 50},
+        max_tokens=50,
+    )
+
+    assert report.requests == report.succeeded == 3000
+    assert report.rate_limited == 0
+    assert report.simulated_seconds > 25 * 60
+    assert report.wall_seconds < 30
+    assert report.requests_per_minute == pytest.approx(100, rel=0.1)
+    assert report.completion_tokens == 3000 * 20
+    assert report.total_cost > 0
+    # Requests queue for the RPM quota, not for the upstream
+    assert report.latency["request_limiter"]["p95"] > report.latency["http"]["p95"]
+
+
+def test_simulate_records_every_stage_of_every_request():
+    """Requests admitted at virtual time 0 are recorded like any other."""
+    upstream = SimulatedUpstream(latency="constant:1")
+    report = simulate(
+        prompts(120), upstream, max_in_flight=120, client_options={"requests_per_minute": 60}
+    )
+
+    assert report.succeeded == 120
+    assert {stage: latency["count"] for stage, latency in report.latency.items()} == {
+        stage: 120 for stage in STAGES
+    }
+    # Most requests queue for the RPM quota from the first instant on
+    assert report.latency["request_limiter"]["p95"] > 60
+
+
+def test_simulate_live_traffic():
+    upstream = SimulatedUpstream(latency="constant:1")
+    report = simulate(prompts(600), upstream, arrival_rate=1.0, seed=1)
+
+    assert report.succeeded == 600
+    assert report.simulated_seconds == pytest.approx(600, rel=0.15)
+    assert report.latency["http"]["p50"] == pytest.approx(1, rel=0.05)
+    # Arrivals are spread out, so nothing queues for a concurrency slot
+    assert report.latency["semaphore"]["p99"] < 0.001
+
+
+def test_simulated_upstream_enforces_its_quota():
+    upstream = SimulatedUpstream(latency="constant:1", requests_per_minute=10)
+    report = simulate(prompts(30), upstream)
+
+    assert report.succeeded == 10
+    assert report.rate_limited == report.failed == 20
+    assert upstream.stats.completed == 10
+
+
+def test_simulated_upstream_errors():
+    upstream = SimulatedUpstream(latency="constant:0.5", error_rate=1.0)
+    report = simulate(prompts(5), upstream)
+
+    assert report.failed == 5
+    assert upstream.stats.injected_errors == 5
+
+
+@pytest.mark.asyncio
+async def test_simulated_upstream_raises_status_errors():
+    upstream = SimulatedUpstream(latency="constant:0", requests_per_minute=1)
+    messages = [{"role": "user", "content": "Hi"}]
+
+    completion = await upstream.chat.completions.create(messages=messages, model="gpt-4o")
+    assert completion.usage.completion_tokens == 100
+    with pytest.raises(SimulatedAPIError) as exc_info:
+        await upstream.chat.completions.create(messages=messages, model="gpt-4o")
+    assert exc_info.value.status_code == 429
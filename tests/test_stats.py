@@ -0,0 +1,112 @@
+import pytest
+
+from concurrent_openai.models import STAGES, RequestTimings
+from concurrent_openai.stats import LatencyHistogram, LatencyStats
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for i in range(1, 101):
+        histogram.record(i / 100)
+
+    assert histogram.count == 100
+    # Percentiles are bucket upper bounds, accurate to the growth factor
+    assert histogram.percentile(50) == pytest.approx(0.50, rel=0.05)
+    assert histogram.percentile(95) == pytest.approx(0.95, rel=0.05)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.05)
+
+
+def test_histogram_empty_and_out_of_range():
+    histogram = LatencyHistogram(min_value=0.001, max_value=1.0)
+    assert histogram.percentile(50) == 0.0
+
+    histogram.record(0.0)
+    histogram.record(10.0)
+    assert histogram.percentile(1) == pytest.approx(0.001)
+    assert histogram.percentile(100) >= 1.0
+
+    with pytest.raises(ValueError):
+        histogram.percentile(101)
+
+
+def test_request_timings_breakdown():
+    timings = RequestTimings(
+        started=10.0,
+        semaphore_acquired=10.5,
+        tokens_counted=10.6,
+        budget_admitted=10.6,
+        request_limiter_acquired=11.0,
+        token_limiter_acquired=12.0,
+        response_received=14.0,
+    )
+    assert timings.breakdown() == pytest.approx(
+        {
+            "semaphore": 0.5,
+            "token_counting": 0.1,
+            "budget": 0.0,
+            "request_limiter": 0.4,
+            "token_limiter": 1.0,
+            "http": 2.0,
+            "total": 4.0,
+        }
+    )
+
+    # Stages that were never reached report zero
+    partial = RequestTimings(started=10.0, semaphore_acquired=10.5)
+    assert partial.http == 0.0
+    assert partial.total == pytest.approx(0.5)
+
+
+def test_request_timings_at_clock_start():
+    """0.0 is a timestamp like any other, e.g. the start of a virtual clock."""
+    timings = RequestTimings(
+        started=0.0,
+        semaphore_acquired=0.0,
+        tokens_counted=0.0,
+        budget_admitted=0.0,
+        request_limiter_acquired=30.0,
+        token_limiter_acquired=30.0,
+        response_received=31.0,
+    )
+    stages = timings.completed_stages()
+    assert list(stages) == list(STAGES)
+    assert stages["request_limiter"] == 30.0
+    assert stages["total"] == 31.0
+
+
+def test_latency_stats_summary():
+    stats = LatencyStats()
+    for i in range(10):
+        stats.record(
+            "gpt-4o",
+            RequestTimings(
+                started=1.0,
+                semaphore_acquired=1.0,
+                tokens_counted=1.0,
+                budget_admitted=1.0,
+                request_limiter_acquired=1.0,
+                token_limiter_acquired=1.0,
+                response_received=1.0 + (i + 1) / 10,
+            ),
+        )
+
+    summary = stats.summary()
+    assert summary["gpt-4o"]["http"]["count"] == 10
+    assert summary["gpt-4o"]["http"]["p50"] == pytest.approx(0.5, rel=0.05)
+    assert summary["gpt-4o"]["http"]["p99"] == pytest.approx(1.0, rel=0.05)
+    assert stats.histogram("gpt-4o", "http") is not None
+    assert stats.histogram("gpt-3.5-turbo", "http") is None
+
+
+def test_latency_stats_skips_unreached_stages():
+    stats = LatencyStats()
+    # Refused at budget admission: never reached the limiters or the API
+    refused = RequestTimings(started=10.0, semaphore_acquired=10.0, tokens_counted=10.01)
+    for _ in range(5):
+        stats.record("gpt-4o", refused)
+
+    assert stats.histogram("gpt-4o", "token_counting").count == 5
+    assert stats.histogram("gpt-4o", "total").count == 5
+    assert stats.histogram("gpt-4o", "budget").count == 0
+    assert stats.histogram("gpt-4o", "http").count == 0
+    assert stats.summary()["gpt-4o"]["http"]["p50"] == 0.0
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from concurrent_openai.sync import SyncConcurrentOpenAI
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+@pytest.fixture
+def sync_client(mocked_client):
+    with SyncConcurrentOpenAI(client=mocked_client) as client:
+        yield client
+
+
+def test_create(sync_client, mocked_client):
+    response = sync_client.create(MESSAGES, model="gpt-4o")
+
+    assert response.content == "Hello! How can I assist you today?"
+    mocked_client.chat.completions.create.assert_called_once()
+
+
+def test_create_many(sync_client):
+    responses = sync_client.create_many([MESSAGES] * 3, model="gpt-4o")
+
+    assert [r.is_success for r in responses] == [True] * 3
+
+
+def test_calls_share_one_event_loop(sync_client):
+    loops = set()
+
+    async def record_loop(*args, **kwargs):
+        loops.add(asyncio.get_running_loop())
+        return await create(*args, **kwargs)
+
+    chat = sync_client.client.client.chat.completions
+    create = chat.create
+    chat.create = record_loop
+
+    sync_client.create(MESSAGES)
+    sync_client.create(MESSAGES)
+
+    assert len(loops) == 1
+
+
+def test_submit_from_many_threads(sync_client, mocked_client):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = list(pool.map(lambda _: sync_client.submit(MESSAGES), range(16)))
+
+    assert all(future.result(timeout=5).is_success for future in futures)
+    assert mocked_client.chat.completions.create.call_count == 16
+
+
+def test_cancel_submitted_request(sync_client, mocked_client):
+    started = threading.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.sleep(60)
+
+    mocked_client.chat.completions.create.side_effect = hang
+    future = sync_client.submit(MESSAGES)
+    assert started.wait(timeout=5)
+
+    future.cancel()
+
+    assert future.cancelled()
+
+
+def test_works_inside_a_running_event_loop(sync_client):
+    async def notebook_cell():
+        return sync_client.create(MESSAGES)
+
+    assert asyncio.run(notebook_cell()).is_success
+
+
+def test_close(mocked_client):
+    client = SyncConcurrentOpenAI(client=mocked_client)
+    client.close()
+    client.close()
+
+    mocked_client.close.assert_awaited_once()
+    assert not client._thread.is_alive()
+    with pytest.raises(RuntimeError, match="closed"):
+        client.create(MESSAGES)
@@ -1,11 +1,21 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
 import pytest
 
 from concurrent_openai.utils import (
     _count_image_tokens,
+    count_embedding_tokens,
     count_function_tokens,
     count_message_tokens,
+    count_response_input_tokens,
     count_total_tokens,
+    get_encoding,
     get_png_dimensions,
+    warmup,
 )
 
 
@@ -173,3 +183,58 @@ def test_count_total_tokens_with_functions(conversation1):
 )
 def test_count_function_tokens(tools, model, expected_tokens):
     assert count_function_tokens(tools, model) == expected_tokens
+
+
+def test_count_embedding_tokens():
+    model = "text-embedding-3-small"
+    assert count_embedding_tokens([1, 2, 3], model) == 3
+    assert count_embedding_tokens([[1, 2, 3], [4]], model) == 4
+    assert count_embedding_tokens([], model) == 0
+    assert count_embedding_tokens(["hello", "world"], model) == 2 * count_embedding_tokens(
+        "hello", model
+    )
+
+
+def test_count_response_input_tokens(conversation1):
+    # A string input counts like a single user message
+    assert count_response_input_tokens("Hello there", "gpt-4o") == count_message_tokens(
+        [{"role": "user", "content": "Hello there"}], "gpt-4o"
+    )
+    assert count_response_input_tokens(conversation1, "gpt-4o") == count_message_tokens(
+        conversation1, "gpt-4o"
+    )
+    assert count_response_input_tokens(
+        "Hello there", "gpt-4o", instructions="Be brief"
+    ) == count_message_tokens(
+        [{"role": "developer", "content": "Be brief"}, {"role": "user", "content": "Hello there"}],
+        "gpt-4o",
+    )
+
+
+def test_warmup_loads_encodings(tmp_path, monkeypatch):
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+    with patch("concurrent_openai.utils.get_encoding", wraps=get_encoding) as loaded:
+        warmup(["gpt-4o", "text-embedding-3-small"], cache_dir=tmp_path)
+
+    assert [call.args for call in loaded.call_args_list] == [
+        ("gpt-4o",),
+        ("text-embedding-3-small",),
+    ]
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == str(tmp_path)
+
+
+def test_import_is_lazy():
+    code = (
+        "import sys, concurrent_openai; "
+        "print(sorted(m for m in ('openai', 'tiktoken', 'structlog', 'dotenv') if m in sys.modules))"
+    )
+    root = Path(__file__).parent.parent
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "PYTHONPATH": str(root)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout.strip() == "[]"